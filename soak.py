@@ -0,0 +1,175 @@
+import argparse
+import ctypes
+import gc
+import io
+import os
+import resource
+import sys
+import time
+
+import streamlit as st
+import streamlit.logger
+from matplotlib.figure import Figure
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+# Six layers, two cohesive: every section runs, the distribution over all
+# 720 arrangements included, and each rerun stays well under a second
+SAMPLE_CSV = """name,phi,gamma,thickness,cohesion
+Fill,30,18,1.5,0
+Sand,34,19,2.0,0
+Clay,22,17.5,1.0,12
+Gravel,38,20.5,1.5,0
+Silt,27,18,1.0,4
+Sand 2,32,19.5,2.0,0
+"""
+# Optional sections switched on for the whole run
+SECTIONS = ("soil parameters", "force distribution", "total force against overturning moment",
+            "cantilever sheet pile", "excavation stage", "seismic coefficients")
+ENGINES = ("Dynamic programming (exact)", "Branch & bound (exact)")
+# More distinct surcharges than the profile renderer caches, so its cache
+# keeps evicting
+SURCHARGES = 40
+# Reruns with the same inputs: the first submits a background job, the rest
+# (once it has finished) render its results and downloads
+HOLD = 4
+# Input changes before switching engines
+ENGINE_PERIOD = 25
+
+
+class _Upload(io.StringIO):
+    name = "layers.csv"
+
+
+def rss_mb():
+    # Resident set size now (Linux), or the peak where /proc is missing
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def release_free_memory():
+    # Hand freed heap pages back to the OS (glibc malloc_trim) so RSS follows
+    # live memory rather than whatever the allocator happens to keep
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def live_figures():
+    # Matplotlib figures still reachable (or uncollected) after a rerun
+    gc.collect()
+    return sum(isinstance(obj, Figure) for obj in gc.get_objects())
+
+
+def _widget(widgets, label):
+    return next(widget for widget in widgets if label in widget.label)
+
+
+def _wait_for_job(at, timeout):
+    # Block until the session's background job (if any) has finished, so the
+    # next rerun takes the finished-job path
+    if "optimization_job" not in at.session_state:
+        return
+    job = at.session_state["optimization_job"]
+    stop = time.monotonic() + timeout
+    while not job.done():
+        if time.monotonic() > stop:
+            raise RuntimeError(f"Background job still running after {timeout} s")
+        time.sleep(0.05)
+
+
+def _shows_results(at):
+    return any(metric.label == "Optimized Force" for metric in at.metric)
+
+
+def rss_slope(samples):
+    # Least-squares slope of RSS (MB) against the rerun number, so growth is
+    # judged over every sample rather than a first and a last few
+    x = [k for k, _, _ in samples]
+    y = [rss for _, rss, _ in samples]
+    mean_x = sum(x) / len(x)
+    mean_y = sum(y) / len(y)
+    spread = sum((xi - mean_x) ** 2 for xi in x)
+    return sum((xi - mean_x) * (yi - mean_y) for xi, yi in zip(x, y)) / spread
+
+
+def soak(reruns=2000, every=50, warmup=None, timeout=60, report=print):
+    # Rerun the app `reruns` times in this process with every section on,
+    # cycling the inputs every HOLD reruns so caches and session state keep
+    # turning over, and waiting for each background job so its results are
+    # rendered too. Any exception or error message fails the run, as does an
+    # engine that never shows results. Returns [(rerun, RSS in MB, live
+    # figures)] sampled every `every` reruns after the warm-up.
+    # AppTest cannot upload files, so the uploader returns the sample table
+    st.file_uploader = lambda *args, **kwargs: _Upload(SAMPLE_CSV)
+    # The warm-up covers a full engine cycle, so every code path has run once
+    cycle = HOLD * ENGINE_PERIOD * len(ENGINES)
+    warmup = max(every, cycle, reruns // 10) if warmup is None else warmup
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    at.run()
+    for toggle in at.toggle:
+        if any(section in toggle.label for section in SECTIONS):
+            toggle.set_value(True)
+
+    samples = []
+    shown = dict.fromkeys(ENGINES, 0)
+    for k in range(1, reruns + 1):
+        step, held = divmod(k - 1, HOLD)
+        engine = ENGINES[step // ENGINE_PERIOD % len(ENGINES)]
+        if held == 0:
+            _widget(at.number_input, "Surcharge").set_value(2.5 * (step % SURCHARGES))
+            _widget(at.text_input, "Groundwater").set_value("" if step % 2 else "3.0")
+            _widget(at.selectbox, "Search Engine").select(engine)
+        at.run()
+        failures = [element.value for element in list(at.exception) + list(at.error)]
+        if failures:
+            raise RuntimeError(f"Rerun {k} failed: {failures[0]}")
+        shown[engine] += _shows_results(at)
+        _wait_for_job(at, timeout)
+        if k >= warmup and (k - warmup) % every == 0:
+            figures = live_figures()
+            release_free_memory()
+            samples.append((k, rss_mb(), figures))
+            report(f"{k},{samples[-1][1]:.1f},{samples[-1][2]}")
+    missing = [engine for engine in ENGINES if not shown[engine]]
+    if reruns >= cycle and missing:
+        raise RuntimeError(f"No results were shown with {', '.join(missing)}")
+    return samples
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rerun the Streamlit app thousands of times in one process and "
+                                                 "check that its memory stays flat")
+    parser.add_argument("--reruns", type=int, default=2000)
+    parser.add_argument("--every", type=int, default=50, help="reruns between RSS samples")
+    parser.add_argument("--warmup", type=int,
+                        help="reruns before the first sample (a tenth, and at least one engine cycle, by default)")
+    parser.add_argument("--max-slope", type=float, default=0.002,
+                        help="allowed RSS growth after the warm-up (MB per rerun)")
+    args = parser.parse_args(argv)
+    streamlit.logger.set_log_level("error")
+
+    print("rerun,rss_mb,live_figures")
+    samples = soak(args.reruns, args.every, args.warmup)
+    if len(samples) < 3:
+        parser.error("Too few reruns for three samples after the warm-up")
+    slope = rss_slope(samples)
+    reruns = samples[-1][0] - samples[0][0]
+    figures = samples[-1][2]
+    print(f"RSS slope {slope * 1024:+.2f} kB per rerun ({slope * reruns:+.1f} MB over {reruns} reruns after "
+          f"the warm-up, limit {args.max_slope * 1024:g} kB per rerun); {figures} figures alive")
+    if slope > args.max_slope or figures:
+        print("FAIL: memory is not flat")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
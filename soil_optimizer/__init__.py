@@ -0,0 +1,43 @@
+import importlib
+
+from .model import GAMMA_W, SoilLayer, calculate_pressure_profile, rankine_ka, total_force
+from .coefficients import AtRest, CoefficientModel, Coulomb, MononobeOkabe, Rankine, coefficient_model
+from .engine import ForceModel, analytic_force
+from .constraints import LayerConstraints
+from .dp import DISK_DP_MAX_LAYERS, DP_MAX_LAYERS, DiskSubsetDP, SubsetDP
+from .search import (ENGINES, RelaxedBound, Search, SearchResult, SearchStats, branch_and_bound, optimize_layers,
+                     search_layers)
+from .warmstart import SolutionIndex
+from .pareto import ParetoFront, ParetoPoint, pareto_front
+from .jobs import JobPool, OptimizationJob
+from .incremental import IncrementalOptimizer
+from .reduction import ReducedProfile, reduce_layers
+
+# ------------------- Command Line Modules -------------------
+# Modules with a main() for `python -m soil_optimizer.<module>` are imported
+# on first use, so running one does not import it twice
+_LAZY = {
+    "loader": ("LayerTableError", "iter_sites", "layers_from_frame", "load_layers", "read_table"),
+    "distribution": ("ForceHistogram", "force_distribution"),
+    "alignment": ("Alignment",),
+    "export": ("export_alignment", "export_profiles", "export_results", "write_batches"),
+    "embedment": ("EmbeddedWall", "solve_embedment"),
+    "staging": ("StageProfile", "minimize_stage_force", "stage_forces"),
+    "sensitivity": ("ForceGradient", "force_gradient", "layer_gradient", "thickness_gradient"),
+    "allocation": ("Allocation", "allocate_thickness", "optimize_allocation"),
+    "seismic": ("ScenarioOptimum", "SeismicScenarios", "scenario_coefficients"),
+    "catalog": ("MaterialCatalog", "select_layers"),
+}
+_LAZY_NAMES = {name: module for module, names in _LAZY.items() for name in names}
+
+
+def __getattr__(name):
+    if name not in _LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_LAZY_NAMES[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
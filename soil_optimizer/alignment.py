@@ -0,0 +1,176 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from .dp import DP_MAX_LAYERS, popcounts
+from .engine import ForceModel
+from .loader import layer_arrays
+from .coefficients import RANKINE, add_coefficient_arguments, coefficients_from_args
+from .model import GAMMA_W, SoilLayer
+
+# Subset-DP states (sets × sections) held in memory at once when optimizing
+# many sections together
+DP_BATCH_STATES = 1 << 22
+
+
+# ------------------- Wall Sections -------------------
+# Every section of an alignment shares the layer list but may have its own
+# φ, γ, thickness and GWT. All sections live in one flattened ForceModel whose
+# water table is at 0: depths are measured from each section's own GWT, so the
+# vectorized layer formulas serve every section at once.
+class Alignment:
+    def __init__(self, phi, gamma, thickness, gwt_depth=None, names=None, cohesion=0.0, surcharge=0.0,
+                 coefficients=None, water=False):
+        # phi / gamma / thickness / cohesion broadcast to (sections, layers);
+        # gwt_depth is None, a scalar or one depth per section (nan = no GWT)
+        # and surcharge a scalar or one value per section
+        phi, gamma, thickness, cohesion = np.broadcast_arrays(*(np.atleast_2d(np.asarray(a, dtype=float))
+                                                                for a in (phi, gamma, thickness, cohesion)))
+        self.sections, self.n = phi.shape
+        self.phi, self.gamma, self.thickness = phi.copy(), gamma.copy(), thickness.copy()
+        self.cohesion = cohesion.copy()
+        gwt = np.full(self.sections, np.inf) if gwt_depth is None else np.asarray(gwt_depth, dtype=float)
+        self.gwt = np.where(np.isnan(gwt), np.inf, np.broadcast_to(gwt, (self.sections,))).astype(float)
+        self.surcharge = np.broadcast_to(np.asarray(surcharge, dtype=float), (self.sections,)).copy()
+        self.names = list(names) if names is not None else [f"Layer {i + 1}" for i in range(self.n)]
+        coefficients = RANKINE if coefficients is None else coefficients
+        self.model = ForceModel.from_arrays(self.gamma.ravel(), self.thickness.ravel(),
+                                            coefficients(self.phi).ravel(), 0.0, cohesion=self.cohesion.ravel(),
+                                            coefficients=coefficients, water=water)
+
+    @classmethod
+    def from_layers(cls, layers, thickness=None, gwt_depth=None, surcharge=0.0, coefficients=None, water=False):
+        # Shared materials, with per-section thicknesses and/or GWT depths
+        phi = [layer.phi for layer in layers]
+        gamma = [layer.gamma for layer in layers]
+        thickness = [layer.thickness for layer in layers] if thickness is None else thickness
+        return cls(phi, gamma, thickness, gwt_depth, [layer.name for layer in layers],
+                   [layer.cohesion for layer in layers], surcharge, coefficients, water)
+
+    @classmethod
+    def from_frame(cls, df, section_column="section", gwt_column="gwt", coefficients=None, water=False):
+        # Long table with one row per (section, layer), layers listed in the
+        # same order for every section; an optional gwt column, read from the
+        # first row of each section. Each section is validated against its GWT.
+        sections = df[section_column].to_numpy()
+        starts = np.flatnonzero(np.r_[True, sections[1:] != sections[:-1]])
+        lengths = np.diff(np.r_[starts, len(df)])
+        gwt = None
+        if gwt_column in df.columns:
+            gwt = pd.to_numeric(df[gwt_column], errors="coerce").to_numpy(dtype=float)[starts]
+        names, phi, gamma, thickness, cohesion = layer_arrays(df, None if gwt is None else np.repeat(gwt, lengths))
+        n = len(df) // len(starts)
+        if len(starts) * n != len(df) or np.any(lengths != n):
+            raise ValueError("Every section must list the same number of layers, with its rows together")
+        return cls(phi.reshape(-1, n), gamma.reshape(-1, n), thickness.reshape(-1, n), gwt, names[:n],
+                   cohesion.reshape(-1, n), coefficients=coefficients, water=water)
+
+    def section_layers(self, s, order=None):
+        order = range(self.n) if order is None else order
+        return [SoilLayer(self.phi[s, i], self.gamma[s, i], self.thickness[s, i], self.names[i], self.cohesion[s, i])
+                for i in order]
+
+    def _flat(self, sections, orders):
+        return sections[:, None] * self.n + orders
+
+    def forces(self, orders=None):
+        # Total force of every section for one ordering per section (an
+        # (sections, layers) array) or one ordering shared by all of them
+        orders = np.arange(self.n) if orders is None else np.asarray(orders, dtype=np.intp)
+        orders = np.broadcast_to(orders, (self.sections, self.n))
+        rows = np.arange(self.sections)
+        return self.model.batch_forces(self._flat(rows, orders), start=(-self.gwt, self.surcharge, 0.0))
+
+    def distinct(self):
+        # Representative section for each distinct (φ, γ, h, c', GWT, q) set, and
+        # the representative of every section; repeated sections are solved once
+        key = np.column_stack([self.phi, self.gamma, self.thickness, self.cohesion, self.gwt, self.surcharge])
+        _, first, inverse = np.unique(key, axis=0, return_index=True, return_inverse=True)
+        return first, inverse.ravel()
+
+    def optimize(self):
+        # Least-force ordering of every section by a subset DP vectorized over
+        # the section axis, in batches that bound the table size
+        if self.n > DP_MAX_LAYERS:
+            raise ValueError(f"Alignment optimization is limited to {DP_MAX_LAYERS} layers, got {self.n}")
+        first, inverse = self.distinct()
+        orders = np.zeros((len(first), self.n), dtype=np.intp)
+        forces = np.zeros(len(first))
+        batch = max(1, DP_BATCH_STATES >> self.n)
+        for start in range(0, len(first), batch):
+            rows = first[start:start + batch]
+            orders[start:start + batch], forces[start:start + batch] = self._solve(rows)
+        return orders[inverse], forces[inverse]
+
+    def _solve(self, rows):
+        n, size = self.n, 1 << self.n
+        masks = np.arange(size)
+        counts = popcounts(size)
+        levels = [masks[counts == c] for c in range(n + 1)]
+        gwt = self.gwt[rows]
+
+        depth = np.zeros((size, len(rows)))
+        total_stress = np.zeros((size, len(rows)))
+        for i in range(n):
+            has = ((masks >> i) & 1).astype(bool)
+            depth[has] += self.thickness[rows, i]
+            total_stress[has] += self.gamma[rows, i] * self.thickness[rows, i]
+        stress = self.surcharge[rows] + total_stress - GAMMA_W * np.maximum(depth - gwt, 0.0)
+        del total_stress
+
+        cost = np.full((size, len(rows)), np.inf)
+        cost[0] = 0.0
+        parent = np.full((size, len(rows)), -1, dtype=np.int8)
+        for c in range(n):
+            for i in range(n):
+                sources = levels[c][(levels[c] >> i) & 1 == 0]
+                f, _ = self.model.layer_forces(rows * n + i, depth[sources] - gwt, stress[sources])
+                candidate = cost[sources] + f
+                targets = sources | (1 << i)
+                better = candidate < cost[targets]
+                cost[targets] = np.where(better, candidate, cost[targets])
+                parent[targets] = np.where(better, i, parent[targets])
+
+        # Walk the parents back from the full set, all sections at once
+        orders = np.zeros((len(rows), n), dtype=np.intp)
+        state = np.full(len(rows), size - 1)
+        columns = np.arange(len(rows))
+        for position in range(n - 1, -1, -1):
+            i = parent[state, columns].astype(np.intp)
+            orders[:, position] = i
+            state ^= 1 << i
+        return orders, cost[size - 1]
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.alignment",
+                                     description="Optimize the layer order of every section along an alignment")
+    parser.add_argument("csv", help="one row per (section, layer) with an optional gwt column")
+    parser.add_argument("--section-column", default="section")
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    parser.add_argument("--output", help="write the results to a Parquet (or .arrow) file instead of printing them")
+    add_coefficient_arguments(parser)
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.csv)
+    alignment = Alignment.from_frame(df, args.section_column, coefficients=coefficients_from_args(args),
+                                     water=args.water)
+    given = alignment.forces()
+    orders, forces = alignment.optimize()
+    sections = df[args.section_column].to_numpy()[::alignment.n]
+    if args.output:
+        from .export import export_alignment
+
+        rows = export_alignment(args.output, alignment, orders, forces, sections)
+        print(f"Wrote {rows} sections to {args.output}")
+        return
+    print("section,original_force,optimized_force,ordering")
+    for s in range(alignment.sections):
+        ordering = " > ".join(str(alignment.names[i]) for i in orders[s])
+        print(f"{sections[s]},{given[s]:.4f},{forces[s]:.4f},{ordering}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import argparse
+
+import numpy as np
+
+from .coefficients import add_coefficient_arguments, coefficients_from_args
+from .engine import ForceModel
+from .loader import load_layers
+from .model import SoilLayer
+from .search import search_layers
+from .sensitivity import thickness_gradient
+
+# Stop when the projected gradient step moves the thicknesses by less than
+# this fraction of the wall height
+ALLOCATION_TOL = 1e-10
+MAX_ITERATIONS = 500
+# Armijo sufficient-decrease constant of the line search
+ARMIJO = 1e-4
+
+
+# ------------------- Feasible Thicknesses -------------------
+def _bounds(n, height, lower, upper):
+    lower = np.broadcast_to(np.asarray(0.0 if lower is None else lower, dtype=float), (n,)).copy()
+    upper = np.broadcast_to(np.asarray(height if upper is None else upper, dtype=float), (n,)).copy()
+    upper = np.minimum(upper, height)
+    if np.any(lower < 0) or np.any(upper < lower):
+        raise ValueError("Thickness bounds must satisfy 0 ≤ lower ≤ upper")
+    if lower.sum() > height + 1e-9 or upper.sum() < height - 1e-9:
+        raise ValueError(f"No thicknesses within the bounds add up to {height:g} m "
+                         f"(bounds allow {lower.sum():g} to {upper.sum():g} m)")
+    return lower, upper
+
+
+def _project(x, lower, upper, total):
+    # Nearest point to x with lower ≤ h ≤ upper and Σh = total. It is
+    # clip(x − τ) for one shift τ. Σ clip(x − τ) falls piecewise linearly as
+    # τ grows: a coordinate starts moving at x − upper and stops at
+    # x − lower, so one sweep over those breakpoints finds τ.
+    x, lower, upper = x.tolist(), lower.tolist(), upper.tolist()
+    events = sorted([(xi - hi, 1) for xi, hi in zip(x, upper)] + [(xi - lo, -1) for xi, lo in zip(x, lower)])
+    tau = events[0][0]
+    remaining = sum(upper) - total
+    moving = 0
+    for point, change in events:
+        if moving and moving * (point - tau) >= remaining:
+            tau += remaining / moving
+            break
+        remaining -= moving * (point - tau)
+        tau = point
+        moving += change
+    return np.array([min(max(xi - tau, lo), hi) for xi, lo, hi in zip(x, lower, upper)])
+
+
+# ------------------- Fixed Ordering -------------------
+class Allocation:
+    # Thicknesses (indexed like the layer list) for one ordering, the force
+    # they give and how the optimizer got there
+    def __init__(self, order, thickness, force, iterations, converged):
+        self.order = order
+        self.thickness = thickness
+        self.force = force
+        self.iterations = iterations
+        self.converged = converged
+
+    def layers_for(self, layers):
+        # The allocated profile top to bottom; layers given no thickness are left out
+        return [SoilLayer(layers[i].phi, layers[i].gamma, float(self.thickness[i]), layers[i].name,
+                          getattr(layers[i], "cohesion", 0.0))
+                for i in self.order.tolist() if self.thickness[i] > 0]
+
+
+def _descend(model, order, x, lower, upper, height, tol, max_iterations):
+    # Projected gradient descent from x (thicknesses by position) with a
+    # Barzilai-Borwein step and Armijo backtracking along the projection.
+    # Returns (thicknesses, force, iterations, converged).
+    f, g = thickness_gradient(model, order, x)
+    step = height / max(float(np.abs(g).max()), 1e-12)
+    for iteration in range(1, max_iterations + 1):
+        while True:
+            y = _project(x - step * g, lower, upper, height)
+            f_y, g_y = thickness_gradient(model, order, y)
+            if f_y <= f + ARMIJO * float(g @ (y - x)) or step < 1e-14:
+                break
+            step *= 0.5
+        s = y - x
+        if float(np.abs(s).max()) <= tol * height:
+            return y, f_y, iteration, True
+        curvature = float(s @ (g_y - g))
+        step = float(s @ s) / curvature if curvature > 0 else 2 * step
+        x, f, g = y, f_y, g_y
+    return x, f, max_iterations, False
+
+
+def allocate_thickness(model, order=None, height=None, lower=None, upper=None, start=None, multistart=True,
+                       tol=ALLOCATION_TOL, max_iterations=MAX_ITERATIONS):
+    # Thicknesses for the layers of `model` in `order` (all layers as listed
+    # by default) that add up to `height` (the current total by default) with
+    # lower ≤ h ≤ upper (per layer or scalars) and give the least force.
+    # ∂F/∂h comes from the analytic gradient, so an iteration is one O(n)
+    # pass. F is piecewise quadratic in the thicknesses but not convex, and
+    # optima often sit on the bounds, so unless `multistart` is off the
+    # descent is also started leaning on each layer in turn and the best
+    # result is kept.
+    order = np.arange(model.n) if order is None else np.asarray(order, dtype=np.intp)
+    height = float(model.thickness.sum()) if height is None else float(height)
+    lower, upper = (bound[order] for bound in _bounds(model.n, height, lower, upper))
+    x = model.thickness[order] if start is None else np.asarray(start, dtype=float)[order]
+    starts = [_project(np.asarray(x, dtype=float), lower, upper, height)]
+    if multistart:
+        starts += [_project(lower + height * np.eye(len(order))[p], lower, upper, height) for p in range(len(order))]
+
+    best = None
+    iterations = 0
+    for x in starts:
+        result = _descend(model, order, x, lower, upper, height, tol, max_iterations)
+        iterations += result[2]
+        if best is None or result[1] < best[1]:
+            best = result
+    thickness = np.zeros(model.n)
+    thickness[order] = best[0]
+    return Allocation(order, thickness, best[1], iterations, best[3])
+
+
+# ------------------- With Ordering Search -------------------
+def optimize_allocation(layers, gwt_depth, height=None, lower=None, upper=None, engine="auto", rounds=10,
+                        surcharge=0.0, coefficients=None, water=False, deadline=None):
+    # Ordering and thicknesses together: alternately search the best ordering
+    # for the current thicknesses (warm-started from the last ordering) and
+    # reallocate the thicknesses for that ordering, until the ordering settles
+    # or the force stops falling. Each round can only lower the force; the
+    # result is a local optimum of the joint problem.
+    layers = list(layers)
+    model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+    height = float(model.thickness.sum()) if height is None else float(height)
+    lower, upper = _bounds(model.n, height, lower, upper)
+    thickness = _project(model.thickness, lower, upper, height)
+    best = None
+    order = None
+    for _ in range(rounds):
+        trial = [SoilLayer(layer.phi, layer.gamma, float(h), layer.name, getattr(layer, "cohesion", 0.0))
+                 for layer, h in zip(layers, thickness)]
+        result = search_layers(trial, gwt_depth, engine=engine, deadline=deadline, initial=order,
+                               surcharge=surcharge, coefficients=coefficients, water=water)
+        index = {id(layer): i for i, layer in enumerate(trial)}
+        searched = [index[id(layer)] for layer in result.ordering]
+        allocation = allocate_thickness(model, searched, height, lower, upper, start=thickness)
+        if best is not None and allocation.force >= best.force - 1e-9 * max(abs(best.force), 1.0):
+            break
+        best = allocation
+        thickness = allocation.thickness
+        if searched == order:
+            break
+        order = searched
+    return best
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.allocation",
+                                     description="Choose how many metres of each material to place, and in what "
+                                                 "order, to build a wall of given height with the least force")
+    parser.add_argument("csv")
+    parser.add_argument("--height", type=float, help="wall height (m); the total of the thicknesses by default")
+    parser.add_argument("--min", type=float, default=0.0, help="least thickness of every material (m)")
+    parser.add_argument("--max", type=float, help="greatest thickness of every material (m)")
+    parser.add_argument("--fixed-order", action="store_true", help="keep the layers in the order given")
+    parser.add_argument("--gwt", type=float)
+    parser.add_argument("--surcharge", type=float, default=0.0)
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    add_coefficient_arguments(parser)
+    args = parser.parse_args(argv)
+
+    layers = load_layers(args.csv, args.gwt)
+    coefficients = coefficients_from_args(args)
+    model = ForceModel(layers, args.gwt, args.surcharge, coefficients, args.water)
+    try:
+        if args.fixed_order:
+            allocation = allocate_thickness(model, height=args.height, lower=args.min, upper=args.max)
+        else:
+            allocation = optimize_allocation(layers, args.gwt, args.height, args.min, args.max,
+                                             surcharge=args.surcharge, coefficients=coefficients, water=args.water)
+    except ValueError as e:
+        parser.error(str(e))
+    print("layer,thickness")
+    for layer in allocation.layers_for(layers):
+        print(f"{layer.name},{layer.thickness:.4f}")
+    print(f"Force: {allocation.force:.4f} kN/m")
+    if args.height is None:
+        print(f"As given: {model.force(range(model.n)):.4f} kN/m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import math
+import os
+
+import numpy as np
+
+from .coefficients import RANKINE, add_coefficient_arguments, coefficients_from_args
+from .engine import ForceModel
+from .loader import layer_arrays, read_table
+from .model import SoilLayer
+from .search import BOUND_TOL, PROGRESS_INTERVAL, Search
+
+CATALOG_COLUMNS = ("name", "phi", "gamma", "thickness")
+# Largest number of thickness grid steps the selection bounds are built for
+MAX_GRID_STEPS = 5000
+
+
+# ------------------- Material Catalog -------------------
+class MaterialCatalog:
+    # Candidate fill materials as column arrays. Saved catalogs are a directory
+    # with one .npy file per column, opened memory-mapped so only the pages
+    # the search touches are read.
+    def __init__(self, names, phi, gamma, thickness):
+        self.names = names
+        self.phi = phi
+        self.gamma = gamma
+        self.thickness = thickness
+
+    @classmethod
+    def from_frame(cls, df):
+        # Fill materials are cohesionless; a cohesion column is ignored
+        return cls(*layer_arrays(df)[:4])
+
+    @classmethod
+    def open(cls, path):
+        columns = {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r") for col in CATALOG_COLUMNS}
+        return cls(columns['name'], columns['phi'], columns['gamma'], columns['thickness'])
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for col, values in zip(CATALOG_COLUMNS, (self.names, self.phi, self.gamma, self.thickness)):
+            np.save(os.path.join(path, f"{col}.npy"), np.asarray(values))
+
+    def __len__(self):
+        return len(self.phi)
+
+    def __getitem__(self, i):
+        return SoilLayer(float(self.phi[i]), float(self.gamma[i]), float(self.thickness[i]), str(self.names[i]))
+
+    def force_model(self, gwt_depth, coefficients=None, water=False):
+        coefficients = RANKINE if coefficients is None else coefficients
+        return ForceModel.from_arrays(self.gamma, self.thickness, coefficients(self.phi), gwt_depth, layers=self,
+                                      coefficients=coefficients, water=water)
+
+
+# ------------------- Selection Bounds -------------------
+def _grid(thickness, height, resolution):
+    # Express thicknesses and the wall height as whole grid steps so "the
+    # chosen layers add up to the wall height" is exact
+    if resolution is None:
+        mm = np.rint(np.append(thickness, height) * 1000).astype(np.int64)
+        resolution = int(np.gcd.reduce(mm[mm > 0])) / 1000
+    units = np.rint(np.asarray(thickness) / resolution).astype(np.intp)
+    target = int(round(height / resolution))
+    if np.any(np.abs(units * resolution - thickness) > 1e-6) or abs(target * resolution - height) > 1e-6:
+        raise ValueError(f"Thicknesses and wall height must be multiples of {resolution} m")
+    if target > MAX_GRID_STEPS:
+        raise ValueError(f"Wall height needs {target} grid steps of {resolution} m "
+                         f"(limit {MAX_GRID_STEPS}); round the catalog thicknesses")
+    return units, target, resolution
+
+
+def _bound_tables(model, units, target, resolution, count):
+    # Cheapest way to fill the wall from grid depth d down to the base, with r
+    # more layers, materials allowed to repeat. A layer's force is C + Ka·h·σ
+    # and it adds Δ to the stress, so filling costs at least A + B·σ with
+    # A, B minimized separately. Rows are r = 0..count (one row if count is None).
+    steps = np.arange(target + 1)
+    idx = np.arange(model.n)[None, :]
+    c, delta = model.layer_forces(idx, steps[:, None] * resolution, 0.0)
+    kh = model.ka * model.thickness
+    nxt = steps[:, None] + units[None, :]
+    fits = nxt <= target
+    nxt = np.minimum(nxt, target)
+
+    def step(a_next, b_next):
+        reachable = fits & np.isfinite(a_next[nxt])
+        with np.errstate(invalid="ignore"):
+            a = np.where(reachable, c + a_next[nxt] + b_next[nxt] * delta, np.inf).min(axis=1, initial=np.inf)
+        b = np.where(reachable, kh + b_next[nxt], np.inf).min(axis=1, initial=np.inf)
+        return a, b
+
+    a0 = np.full(target + 1, np.inf)
+    a0[target] = 0.0
+    b0 = np.where(np.isfinite(a0), 0.0, np.inf)
+    if count is not None:
+        rows_a, rows_b = [a0], [b0]
+        for _ in range(count):
+            a, b = step(rows_a[-1], rows_b[-1])
+            rows_a.append(a)
+            rows_b.append(b)
+        return np.array(rows_a), np.array(rows_b)
+
+    # Any number of layers: every layer is at least one step thick, so fill
+    # from the base upwards
+    a, b = a0.copy(), b0.copy()
+    for d in range(target - 1, -1, -1):
+        ok = fits[d] & np.isfinite(a[nxt[d]])
+        if ok.any():
+            with np.errstate(invalid="ignore"):
+                a[d] = np.min(np.where(ok, c[d] + a[nxt[d]] + b[nxt[d]] * delta[d], np.inf))
+            b[d] = np.min(np.where(ok, kh + b[nxt[d]], np.inf))
+    return a[None, :], b[None, :]
+
+
+# ------------------- Catalog Selection -------------------
+def select_layers(catalog, height, gwt_depth, count=None, resolution=None, deadline=None,
+                  on_improvement=None, progress=None, cancel=None, coefficients=None, water=False):
+    # Choose catalog materials (each at most once, `count` of them if given)
+    # whose thicknesses add up to `height`, and their order, to minimize the
+    # total force. Branch and bound over the catalog, pruned with the
+    # A + B·σ fill bounds; anytime like search_layers.
+    model = catalog.force_model(gwt_depth, coefficients, water)
+    units, target, resolution = _grid(model.thickness, height, resolution)
+    table_a, table_b = _bound_tables(model, units, target, resolution, count)
+    search = Search(model, "catalog", deadline, on_improvement, progress, cancel, total=0)
+    stats = search.stats
+
+    def row(remaining):
+        return remaining if count is not None else 0
+
+    root = count if count is not None else 0
+    root_bound = float(table_a[row(root), 0])
+    if not np.isfinite(root_bound):
+        raise ValueError(f"No selection of catalog materials adds up to {height} m")
+
+    # (bound, prefix, grid depth, depth, stress, force)
+    stack = [(root_bound, (), 0, 0.0, 0.0, 0.0)]
+    while stack:
+        if stats.nodes % PROGRESS_INTERVAL == 0 and stats.nodes and search.should_stop():
+            return search.result(min([search.best_force] + [node[0] for node in stack]))
+
+        bound, prefix, d, depth, stress, force = stack.pop()
+        stats.nodes += 1
+        if search.best_force is not None and bound >= search.best_force - BOUND_TOL * abs(search.best_force):
+            continue
+
+        remaining = None if count is None else count - len(prefix) - 1
+        free = np.ones(model.n, dtype=bool)
+        free[list(prefix)] = False
+        candidates = np.flatnonzero(free & (d + units <= target))
+        if len(candidates) == 0:
+            continue
+
+        f, child_stress = model.layer_forces(candidates, depth, stress)
+        child_d = d + units[candidates]
+        child_force = force + f
+        r = row(remaining)
+        child_bound = child_force + table_a[r, child_d] + table_b[r, child_d] * child_stress
+
+        done = (child_d == target) & (remaining in (None, 0))
+        if done.any():
+            k = int(np.argmin(np.where(done, child_force, np.inf)))
+            stats.evaluated += int(done.sum())
+            search.offer(prefix + (int(candidates[k]),), float(child_force[k]))
+
+        keep = ~done & np.isfinite(child_bound)
+        if search.best_force is not None:
+            keep &= child_bound < search.best_force - BOUND_TOL * abs(search.best_force)
+        for k in np.flatnonzero(keep)[np.argsort(-child_bound[keep], kind="stable")]:
+            j = int(candidates[k])
+            stack.append((float(child_bound[k]), prefix + (j,), int(child_d[k]),
+                          depth + model._thickness[j], float(child_stress[k]), float(child_force[k])))
+
+    if search.best_force is None:
+        raise ValueError(f"No selection of distinct catalog materials adds up to {height} m")
+    return search.result(search.best_force)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.catalog",
+                                     description="Choose and order catalog materials for a wall height")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="convert a CSV catalog to a memory-mapped column directory")
+    build.add_argument("csv")
+    build.add_argument("path")
+
+    select = commands.add_parser("select", help="pick the layers with the least total force")
+    select.add_argument("path")
+    select.add_argument("--height", type=float, required=True)
+    select.add_argument("--layers", type=int)
+    select.add_argument("--gwt", type=float)
+    select.add_argument("--resolution", type=float)
+    select.add_argument("--time-limit", type=float)
+    select.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    add_coefficient_arguments(select)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        MaterialCatalog.from_frame(read_table(args.csv)).save(args.path)
+        return
+
+    result = select_layers(MaterialCatalog.open(args.path), args.height, args.gwt, args.layers,
+                           args.resolution, args.time_limit, coefficients=coefficients_from_args(args),
+                           water=args.water)
+    for position, layer in enumerate(result.ordering or (), 1):
+        print(f"{position:3d}. {layer.name}  φ={layer.phi}°  γ={layer.gamma} kN/m³  h={layer.thickness} m")
+    if result.force is not None:
+        print(f"Total force: {result.force:.2f} kN/m"
+              + (f" (within {result.gap:.2%} of optimal)" if result.interrupted and result.gap is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
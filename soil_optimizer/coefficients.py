@@ -0,0 +1,226 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .model import rankine_ka
+
+# Distinct friction angles remembered per coefficient model before its cache
+# starts afresh
+CACHE_SIZE = 4096
+# Step (degrees) of the central difference for models without a closed-form dK/dφ
+DERIVATIVE_STEP = 1e-4
+
+
+# ------------------- Coefficient Models -------------------
+# A coefficient model maps friction angles to the earth-pressure coefficient K
+# that multiplies the vertical effective stress. Models are called on whole
+# arrays of φ; each distinct φ is evaluated once and cached, so K is computed
+# once per layer and shared by every ordering the engines try.
+class CoefficientModel(ABC):
+    name = "coefficient"
+
+    def __init__(self):
+        self._cache = {}
+
+    def params(self):
+        return ()
+
+    def key(self):
+        # Identifies the model and its parameters (e.g. for cache keys)
+        return (self.name,) + self.params()
+
+    def __eq__(self, other):
+        return isinstance(other, CoefficientModel) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __reduce__(self):
+        # Pickle (and hash for caching) by parameters, not by cache contents
+        return self.__class__, self.params()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.params()}"
+
+    @abstractmethod
+    def compute(self, phi):
+        # K for an array of φ (degrees); subclasses implement the formula
+        pass
+
+    def derivative(self, phi):
+        # dK/dφ per degree; a central difference unless a model has it in closed form
+        phi = np.asarray(phi, dtype=float)
+        return (self.compute(phi + DERIVATIVE_STEP) - self.compute(phi - DERIVATIVE_STEP)) / (2 * DERIVATIVE_STEP)
+
+    def __call__(self, phi):
+        phi = np.asarray(phi, dtype=float)
+        values, inverse = np.unique(phi, return_inverse=True)
+        if len(values) > CACHE_SIZE:
+            # e.g. a large material catalog: evaluate directly
+            return self.compute(phi)
+        values = values.tolist()
+        # A full cache is replaced rather than cleared, so a model shared by
+        # worker threads never loses entries another call is reading
+        cache = self._cache
+        missing = [v for v in values if v not in cache]
+        if len(cache) + len(missing) > CACHE_SIZE:
+            cache = self._cache = {}
+            missing = values
+        if missing:
+            cache.update(zip(missing, self.compute(np.array(missing)).tolist()))
+        k = np.array([cache[v] for v in values], dtype=float)
+        return k[inverse].reshape(phi.shape)
+
+
+class Rankine(CoefficientModel):
+    # Smooth vertical wall, level backfill: Ka = tan²(45° − φ/2)
+    name = "rankine"
+
+    def compute(self, phi):
+        return rankine_ka(phi)
+
+    def derivative(self, phi):
+        # d tan²x/dφ = −tan x·sec² x per radian, with x = 45° − φ/2
+        x = np.radians(45 - np.asarray(phi, dtype=float) / 2)
+        return -np.tan(x) / np.cos(x) ** 2 * np.pi / 180
+
+
+class Coulomb(CoefficientModel):
+    # Coulomb active wedge with wall friction δ, a wall back battered `batter`
+    # degrees from the vertical (positive leaning over the backfill) and a
+    # backfill sloping up at β. δ is either fixed in degrees or, with
+    # `delta_ratio`, a fraction of each layer's φ (e.g. 2/3).
+    name = "coulomb"
+
+    def __init__(self, delta=0.0, batter=0.0, beta=0.0, delta_ratio=None):
+        super().__init__()
+        self.delta = float(delta)
+        self.batter = float(batter)
+        self.beta = float(beta)
+        self.delta_ratio = None if delta_ratio is None else float(delta_ratio)
+
+    def params(self):
+        return (self.delta, self.batter, self.beta, self.delta_ratio)
+
+    def compute(self, phi):
+        delta = np.radians(phi * self.delta_ratio if self.delta_ratio is not None else np.full_like(phi, self.delta))
+        theta = np.radians(self.batter)
+        beta = np.radians(self.beta)
+        phi_r = np.radians(phi)
+        if np.any(phi_r < beta):
+            raise ValueError(f"Coulomb coefficients need every φ to be at least the backfill slope β = {self.beta:g}°")
+        root = np.sqrt(np.sin(phi_r + delta) * np.sin(phi_r - beta) / (np.cos(delta + theta) * np.cos(theta - beta)))
+        return np.cos(phi_r - theta) ** 2 / (np.cos(theta) ** 2 * np.cos(delta + theta) * (1 + root) ** 2)
+
+
+def mononobe_okabe(phi, kh, kv=0.0, delta=0.0, batter=0.0, beta=0.0):
+    # Pseudo-static active coefficient (1 − kv)·K_AE, broadcasting φ, kh and
+    # kv (e.g. layers along one axis, scenarios along another). The seismic
+    # inertia tilts gravity by ψ = atan(kh / (1 − kv)); with kh = kv = 0 this
+    # is Coulomb's Ka. Angles in degrees, δ may be an array like φ.
+    phi, kh, kv, delta = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (phi, kh, kv, delta)))
+    psi = np.arctan2(kh, 1 - kv)
+    phi_r = np.radians(phi)
+    delta = np.radians(delta)
+    theta = np.radians(batter)
+    beta = np.radians(beta)
+    if np.any(phi_r - beta - psi < -1e-12):
+        raise ValueError("Mononobe-Okabe coefficients need φ ≥ β + atan(kh / (1 − kv)) for every layer; "
+                         "the backfill would fail under this acceleration")
+    root = np.sqrt(np.sin(phi_r + delta) * np.maximum(np.sin(phi_r - beta - psi), 0.0) /
+                   (np.cos(delta + theta + psi) * np.cos(beta - theta)))
+    k_ae = np.cos(phi_r - theta - psi) ** 2 / (np.cos(psi) * np.cos(theta) ** 2 * np.cos(delta + theta + psi) *
+                                               (1 + root) ** 2)
+    return (1 - kv) * k_ae
+
+
+class MononobeOkabe(CoefficientModel):
+    # Seismic active thrust for horizontal and vertical seismic coefficients
+    # kh, kv (kv positive upwards), on the same wall as Coulomb. The dynamic
+    # thrust is spread like the static one, in proportion to σv'.
+    name = "mononobe-okabe"
+
+    def __init__(self, kh=0.0, kv=0.0, delta=0.0, batter=0.0, beta=0.0, delta_ratio=None):
+        super().__init__()
+        self.kh = float(kh)
+        self.kv = float(kv)
+        self.delta = float(delta)
+        self.batter = float(batter)
+        self.beta = float(beta)
+        self.delta_ratio = None if delta_ratio is None else float(delta_ratio)
+
+    def params(self):
+        return (self.kh, self.kv, self.delta, self.batter, self.beta, self.delta_ratio)
+
+    def compute(self, phi):
+        delta = phi * self.delta_ratio if self.delta_ratio is not None else self.delta
+        return mononobe_okabe(phi, self.kh, self.kv, delta, self.batter, self.beta)
+
+
+class AtRest(CoefficientModel):
+    # Wall that cannot yield: Jaky's K0 = 1 − sin φ, raised by OCR^sin φ for
+    # overconsolidated backfill
+    name = "at-rest"
+
+    def __init__(self, ocr=1.0):
+        super().__init__()
+        self.ocr = float(ocr)
+
+    def params(self):
+        return (self.ocr,)
+
+    def compute(self, phi):
+        s = np.sin(np.radians(phi))
+        return (1 - s) * self.ocr ** s
+
+    def derivative(self, phi):
+        phi_r = np.radians(np.asarray(phi, dtype=float))
+        s = np.sin(phi_r)
+        return np.cos(phi_r) * self.ocr ** s * ((1 - s) * np.log(self.ocr) - 1) * np.pi / 180
+
+
+COEFFICIENT_MODELS = {model.name: model for model in (Rankine, Coulomb, AtRest, MononobeOkabe)}
+RANKINE = Rankine()
+
+
+def coefficient_model(name="rankine", **params):
+    if name not in COEFFICIENT_MODELS:
+        raise ValueError(f"Unknown coefficient model '{name}', expected one of {', '.join(COEFFICIENT_MODELS)}")
+    return COEFFICIENT_MODELS[name](**params)
+
+
+# ------------------- Command Line -------------------
+def add_coefficient_arguments(parser):
+    parser.add_argument("--coefficients", choices=list(COEFFICIENT_MODELS), default="rankine")
+    parser.add_argument("--delta", type=float, default=0.0, help="Coulomb wall friction δ (degrees)")
+    parser.add_argument("--delta-ratio", type=float, help="Coulomb wall friction as a fraction of φ")
+    parser.add_argument("--batter", type=float, default=0.0, help="Coulomb wall batter from vertical (degrees)")
+    parser.add_argument("--beta", type=float, default=0.0, help="Coulomb backfill slope β (degrees)")
+    parser.add_argument("--ocr", type=float, default=1.0, help="at-rest overconsolidation ratio")
+    parser.add_argument("--kh", type=float, default=0.0, help="Mononobe-Okabe horizontal seismic coefficient")
+    parser.add_argument("--kv", type=float, default=0.0, help="Mononobe-Okabe vertical seismic coefficient (up)")
+
+
+def coefficients_from_args(args):
+    if args.coefficients == "coulomb":
+        return Coulomb(args.delta, args.batter, args.beta, args.delta_ratio)
+    if args.coefficients == "at-rest":
+        return AtRest(args.ocr)
+    if args.coefficients == "mononobe-okabe":
+        return MononobeOkabe(args.kh, args.kv, args.delta, args.batter, args.beta, args.delta_ratio)
+    return RANKINE
+
+
+def coefficient_argv(args):
+    # The parsed options above as arguments again, e.g. for worker commands
+    if args.coefficients == "coulomb":
+        argv = ["--coefficients", "coulomb", "--delta", repr(args.delta), "--batter", repr(args.batter),
+                "--beta", repr(args.beta)]
+        return argv + (["--delta-ratio", repr(args.delta_ratio)] if args.delta_ratio is not None else [])
+    if args.coefficients == "at-rest":
+        return ["--coefficients", "at-rest", "--ocr", repr(args.ocr)]
+    if args.coefficients == "mononobe-okabe":
+        argv = ["--coefficients", "mononobe-okabe", "--kh", repr(args.kh), "--kv", repr(args.kv), "--delta",
+                repr(args.delta), "--batter", repr(args.batter), "--beta", repr(args.beta)]
+        return argv + (["--delta-ratio", repr(args.delta_ratio)] if args.delta_ratio is not None else [])
+    return []
@@ -0,0 +1,147 @@
+import numpy as np
+
+
+# ------------------- Placement Constraints -------------------
+# Orderings are built from the top down, so every constraint is checked as
+# "may layer i go next below the set `mask` of already placed layers?". The
+# search engines use this to skip whole subtrees / DP states instead of
+# filtering finished permutations.
+class LayerConstraints:
+    def __init__(self, n, pinned=None, above=None, blocks=None):
+        # pinned  -- {layer: position}, 0 is the surface, -1 the bottom
+        # above   -- [(upper, lower), ...], upper must lie somewhere above lower
+        # blocks  -- [[layer, ...], ...], each group stays contiguous
+        self.n = n
+        self.position_of = [None] * n
+        self.pinned_at = {}
+        for i, position in (pinned or {}).items():
+            self._check_layer(i)
+            if not -n <= position < n:
+                raise ValueError(f"Position {position} is outside a stack of {n} layers")
+            position %= n
+            if position in self.pinned_at and self.pinned_at[position] != i:
+                raise ValueError(f"Two layers are pinned at position {position}")
+            self.position_of[i] = position
+            self.pinned_at[position] = i
+
+        self.pred_mask = [0] * n
+        self.above = []
+        for upper, lower in above or []:
+            self._check_layer(upper)
+            self._check_layer(lower)
+            if upper == lower:
+                raise ValueError("A layer cannot be above itself")
+            self.pred_mask[lower] |= 1 << upper
+            self.above.append((upper, lower))
+
+        self.block_masks = []
+        grouped = 0
+        for block in blocks or []:
+            mask = 0
+            for i in block:
+                self._check_layer(i)
+                mask |= 1 << i
+            if mask & grouped:
+                raise ValueError("A layer can only belong to one block")
+            grouped |= mask
+            if bin(mask).count("1") > 1:
+                self.block_masks.append(mask)
+
+    @classmethod
+    def from_names(cls, layers, pinned=None, above=None, blocks=None):
+        names = [str(layer.name) for layer in layers]
+        if len(set(names)) != len(names):
+            raise ValueError("Layer names must be unique to use constraints")
+
+        def index(name):
+            if str(name) not in names:
+                raise ValueError(f"Unknown layer '{name}' in constraints")
+            return names.index(str(name))
+
+        return cls(len(layers),
+                   pinned={index(name): position for name, position in (pinned or {}).items()},
+                   above=[(index(upper), index(lower)) for upper, lower in above or []],
+                   blocks=[[index(name) for name in block] for block in blocks or []])
+
+    def _check_layer(self, i):
+        if not 0 <= i < self.n:
+            raise ValueError(f"Layer index {i} is out of range for {self.n} layers")
+
+    def key(self):
+        return (self.n, tuple(self.position_of), tuple(sorted(self.above)), tuple(sorted(self.block_masks)))
+
+    def __eq__(self, other):
+        return isinstance(other, LayerConstraints) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    @property
+    def empty(self):
+        return not (self.pinned_at or self.above or self.block_masks)
+
+    def allowed(self, mask, i):
+        # May layer i be placed directly below the layers in `mask`?
+        position = bin(mask).count("1")
+        if self.pinned_at.get(position, i) != i:
+            return False
+        if self.position_of[i] is not None and self.position_of[i] != position:
+            return False
+        if self.pred_mask[i] & ~mask:
+            return False
+        for block in self.block_masks:
+            placed = mask & block
+            if placed and placed != block and not block >> i & 1:
+                return False
+        return True
+
+    def allowed_sources(self, sources, i, position):
+        # Vectorized allowed() over an array of masks that all hold `position` layers
+        if self.pinned_at.get(position, i) != i:
+            return np.zeros(len(sources), dtype=bool)
+        if self.position_of[i] is not None and self.position_of[i] != position:
+            return np.zeros(len(sources), dtype=bool)
+        ok = (sources & self.pred_mask[i]) == self.pred_mask[i]
+        for block in self.block_masks:
+            if not block >> i & 1:
+                placed = sources & block
+                ok &= (placed == 0) | (placed == block)
+        return ok
+
+    def is_feasible(self, order):
+        mask = 0
+        for i in order:
+            if not self.allowed(mask, i):
+                return False
+            mask |= 1 << i
+        return True
+
+    def orders(self, preference=None):
+        # Feasible orderings depth-first, children tried in `preference` order
+        # (lexicographic by default)
+        preference = list(range(self.n) if preference is None else preference)
+        full = (1 << self.n) - 1
+        dead = set()  # masks known to have no feasible completion
+
+        def extend(mask, prefix):
+            if mask == full:
+                yield list(prefix)
+                return
+            found = False
+            for i in preference:
+                if not mask >> i & 1 and mask | 1 << i not in dead and self.allowed(mask, i):
+                    prefix.append(i)
+                    for order in extend(mask | 1 << i, prefix):
+                        found = True
+                        yield order
+                    prefix.pop()
+            if not found:
+                dead.add(mask)
+
+        return extend(0, [])
+
+    def first_feasible(self, preference=None):
+        order = next(self.orders(preference), None)
+        if order is None:
+            raise ValueError("The layer constraints cannot all be satisfied")
+        return order
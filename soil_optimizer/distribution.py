@@ -0,0 +1,150 @@
+import argparse
+import math
+
+import numpy as np
+
+from .dp import DP_MAX_LAYERS, SubsetDP
+from .coefficients import add_coefficient_arguments, coefficients_from_args
+from .engine import ForceModel
+from .loader import load_layers
+from .shards import rank_blocks
+
+DEFAULT_BINS = 1000
+
+
+# ------------------- Streaming Histogram -------------------
+class ForceHistogram:
+    # Fixed-bin histogram plus exact count, sum, sum of squares, min and max.
+    # Histograms over the same edges merge by adding counts, so shards of the
+    # rank range can be reduced in any order. Quantiles are interpolated
+    # within a bin and are off by at most one bin width.
+    def __init__(self, low, high, bins=DEFAULT_BINS):
+        if not high > low:
+            high = low + max(abs(low), 1.0) * 1e-9
+        self.low = float(low)
+        self.high = float(high)
+        self.bins = bins
+        self.width = (self.high - self.low) / bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # Least and greatest force arrangements, when known
+        self.best = None
+        self.worst = None
+
+    def edges(self):
+        return np.linspace(self.low, self.high, self.bins + 1)
+
+    def add(self, forces):
+        forces = np.asarray(forces, dtype=float)
+        if not len(forces):
+            return
+        index = np.clip(((forces - self.low) / self.width).astype(np.intp), 0, self.bins - 1)
+        self.counts += np.bincount(index, minlength=self.bins)
+        self.count += len(forces)
+        self.total += float(forces.sum())
+        self.total_sq += float(np.dot(forces, forces))
+        self.min = min(self.min, float(forces.min()))
+        self.max = max(self.max, float(forces.max()))
+
+    def merge(self, other):
+        if (other.low, other.high, other.bins) != (self.low, self.high, self.bins):
+            raise ValueError("Only histograms over the same bins can be merged")
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.total_sq / self.count - self.mean ** 2, 0.0))
+
+    def quantile(self, q):
+        target = q * self.count
+        cumulative = np.cumsum(self.counts)
+        b = min(int(np.searchsorted(cumulative, target)), self.bins - 1)
+        before = cumulative[b] - self.counts[b]
+        inside = (target - before) / self.counts[b] if self.counts[b] else 0.0
+        return min(max(self.low + (b + inside) * self.width, self.min), self.max)
+
+    def fraction_below(self, force):
+        # Share of arrangements with a smaller force (to within one bin)
+        position = (force - self.low) / self.width
+        b = int(np.clip(math.floor(position), 0, self.bins - 1))
+        partial = self.counts[b] * min(max(position - b, 0.0), 1.0)
+        return float((self.counts[:b].sum() + partial) / self.count)
+
+
+# ------------------- All Orderings -------------------
+def force_range(model):
+    # Exact least and greatest force, from a minimizing and a maximizing subset DP
+    if model.n > DP_MAX_LAYERS:
+        raise ValueError(f"Force statistics over all orderings need at most {DP_MAX_LAYERS} layers")
+    best = SubsetDP(model)
+    best.solve()
+    worst = SubsetDP(model, maximize=True)
+    worst.solve()
+    best_order, worst_order = best.best_order(), worst.best_order()
+    return best_order, model.force(best_order), worst_order, model.force(worst_order)
+
+
+def force_distribution(layers, gwt_depth, bins=DEFAULT_BINS, start=0, stop=None, progress=None, cancel=None,
+                       surcharge=0.0, coefficients=None, water=False):
+    # Stream every ordering (or ranks [start, stop) of them) through batched
+    # evaluation into a histogram; memory stays at one block of forces.
+    #   progress -- progress(evaluated, total), called once per block
+    #   cancel   -- threading.Event-like; stops early with a partial histogram
+    model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+    best_order, low, worst_order, high = force_range(model)
+    stop = math.factorial(model.n) if stop is None else stop
+
+    histogram = ForceHistogram(low, high, bins)
+    histogram.best = model.layers_for(best_order)
+    histogram.worst = model.layers_for(worst_order)
+    for rank, forces in rank_blocks(model, start, stop):
+        histogram.add(forces)
+        if progress is not None:
+            progress(rank + len(forces) - start, stop - start)
+        if cancel is not None and cancel.is_set():
+            break
+    return histogram
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.distribution",
+                                     description="Force statistics over every arrangement of the layers")
+    parser.add_argument("csv")
+    parser.add_argument("--gwt", type=float)
+    parser.add_argument("--surcharge", type=float, default=0.0)
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    add_coefficient_arguments(parser)
+    args = parser.parse_args(argv)
+
+    coefficients = coefficients_from_args(args)
+    layers = load_layers(args.csv, args.gwt)
+    histogram = force_distribution(layers, args.gwt, args.bins, surcharge=args.surcharge, coefficients=coefficients,
+                                   water=args.water)
+    print(f"Arrangements: {histogram.count:,}")
+    print(f"Min / mean / max: {histogram.min:.2f} / {histogram.mean:.2f} / {histogram.max:.2f} kN/m "
+          f"(std {histogram.std:.2f})")
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+        print(f"  {q:>4.0%} percentile: {histogram.quantile(q):.2f} kN/m")
+    given = ForceModel(layers, args.gwt, args.surcharge, coefficients, args.water).force(range(len(layers)))
+    print(f"Arrangement as given: {given:.2f} kN/m, better than {1 - histogram.fraction_below(given):.1%} "
+          f"of all arrangements")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .model import GAMMA_W
+
+# Largest layer count the in-memory subset tables are built for (2^n states)
+DP_MAX_LAYERS = 20
+# Largest layer count for the disk-backed tables: 9 bytes per state, 2.4 GB
+# of files at 28 layers
+DISK_DP_MAX_LAYERS = 28
+# Sets per block of the disk-backed tables (2^bits); a block and a few
+# temporaries of that size are all that is held in memory
+DISK_BLOCK_BITS = 20
+
+
+# ------------------- Subset Dynamic Programming -------------------
+# The effective stress below a set S of layers is the total stress Σγh of S
+# minus the pore pressure at its depth, whatever order S is in. So the cheapest
+# way to stack S only depends on S: cost[S ∪ {i}] = min cost[S] + force of i
+# placed below S. That is an exact O(2^n·n) search instead of n!.
+def popcounts(size):
+    counts = np.zeros(size, dtype=np.uint8)
+    for b in range(max(size - 1, 0).bit_length()):
+        counts += ((np.arange(size) >> b) & 1).astype(np.uint8)
+    return counts
+
+
+class SubsetDP:
+    def __init__(self, model, constraints=None, maximize=False):
+        if model.n > DP_MAX_LAYERS:
+            raise ValueError(f"Subset DP is limited to {DP_MAX_LAYERS} layers, got {model.n}")
+        self.model = model
+        self.constraints = None if constraints is None or constraints.empty else constraints
+        self.n = model.n
+        self.size = 1 << model.n
+
+        masks = np.arange(self.size)
+        counts = popcounts(self.size)
+        self.levels = [masks[counts == c] for c in range(self.n + 1)]
+
+        self.depth = np.zeros(self.size)
+        self.total_stress = np.zeros(self.size)
+        for i in range(self.n):
+            has = ((masks >> i) & 1).astype(bool)
+            self.depth[has] += model.thickness[i]
+            self.total_stress[has] += model.gamma[i] * model.thickness[i]
+        self.stress = np.zeros(self.size)
+        self._update_stress(masks)
+
+        # Costs are negated forces when looking for the greatest force
+        self.sign = -1.0 if maximize else 1.0
+        self.cost = np.full(self.size, np.inf)
+        self.cost[0] = 0.0
+        self.parent = np.full(self.size, -1, dtype=np.int8)
+        self.solved = False
+
+    def _update_stress(self, masks):
+        pore = GAMMA_W * np.maximum(self.depth[masks] - self.model._gwt, 0.0)
+        self.stress[masks] = self.model.surcharge + self.total_stress[masks] - pore
+
+    def _extend(self, sources, i, position):
+        # Relax every transition S -> S ∪ {i} for the given source sets, all of
+        # which hold `position` layers. Unreachable sets (infinite cost) and
+        # moves the constraints forbid are skipped.
+        if self.constraints is not None:
+            sources = sources[np.isfinite(self.cost[sources])]
+            sources = sources[self.constraints.allowed_sources(sources, i, position)]
+        f, _ = self.model.layer_forces(i, self.depth[sources], self.stress[sources])
+        candidate = self.cost[sources] + self.sign * f
+        targets = sources | (1 << i)
+        better = candidate < self.cost[targets]
+        self.cost[targets[better]] = candidate[better]
+        self.parent[targets[better]] = i
+
+    def solve(self, should_stop=None):
+        # Fill the tables level by level (sets of equal size); returns False if
+        # should_stop() asked to interrupt between levels
+        for c in range(self.n):
+            sources = self.levels[c]
+            for i in range(self.n):
+                self._extend(sources[(sources >> i) & 1 == 0], i, c)
+            if should_stop is not None and should_stop():
+                return False
+        self.solved = True
+        return True
+
+    def update_layer(self, k, layer):
+        # Layer k changed: only sets containing it are recomputed
+        self.model.set_layer(k, layer)
+        bit = 1 << k
+        for c in range(1, self.n + 1):
+            targets = self.levels[c][self.levels[c] & bit != 0]
+            self.depth[targets] = self.depth[targets ^ bit] + self.model.thickness[k]
+            self.total_stress[targets] = (self.total_stress[targets ^ bit] +
+                                          self.model.gamma[k] * self.model.thickness[k])
+            self._update_stress(targets)
+            self.cost[targets] = np.inf
+            self.parent[targets] = -1
+
+        # Same transition order as solve(), so ties resolve identically
+        for c in range(self.n):
+            sources = self.levels[c]
+            with_k = sources[sources & bit != 0]
+            for i in range(self.n):
+                if i == k:
+                    self._extend(sources[sources & bit == 0], k, c)
+                else:
+                    self._extend(with_k[(with_k >> i) & 1 == 0], i, c)
+        return self.size // 2
+
+    def best_order(self):
+        if not np.isfinite(self.cost[self.size - 1]):
+            raise ValueError("The layer constraints cannot all be satisfied")
+        return _walk_parents(self.parent, self.size)
+
+
+def _walk_parents(parent, size):
+    order = []
+    s = size - 1
+    while s:
+        i = int(parent[s])
+        order.append(i)
+        s ^= 1 << i
+    return order[::-1]
+
+
+# ------------------- Disk-Backed Subset DP -------------------
+# The same recurrence for 21 to 28 layers, with the cost (float64) and parent
+# (uint8 layer index) tables in numpy.memmap files. Depths and stresses are
+# not stored: a set's depth is the sum of the high bits' thicknesses, fixed
+# per block, plus a table over the low bits. Blocks are filled in increasing
+# order of their high bits, so every set missing one high layer lies in an
+# earlier block, at a constant offset: it is read as one contiguous slice.
+# Within a block the low layers are added in popcount order, as in SubsetDP.
+class DiskSubsetDP:
+    def __init__(self, model, directory=None, block_bits=DISK_BLOCK_BITS):
+        if model.n > DISK_DP_MAX_LAYERS:
+            raise ValueError(f"Disk-backed subset DP is limited to {DISK_DP_MAX_LAYERS} layers, got {model.n}")
+        self.model = model
+        self.n = model.n
+        self.size = 1 << model.n
+        self.bits = min(block_bits, self.n)
+        self.block = 1 << self.bits
+        self.next_block = 0
+
+        self._owned = directory is None
+        self.directory = tempfile.mkdtemp(prefix="subset-dp-") if directory is None else directory
+        self.cost = np.memmap(os.path.join(self.directory, "cost.f8"), dtype=np.float64, mode="w+",
+                              shape=(self.size,))
+        self.parent = np.memmap(os.path.join(self.directory, "parent.u1"), dtype=np.uint8, mode="w+",
+                                shape=(self.size,))
+
+        # Depth and total stress of every combination of the low layers, and
+        # the low sets grouped by popcount
+        low = np.arange(self.block)
+        self.low_depth = np.zeros(self.block)
+        self.low_total = np.zeros(self.block)
+        for i in range(self.bits):
+            has = ((low >> i) & 1).astype(bool)
+            self.low_depth[has] += model.thickness[i]
+            self.low_total[has] += model.gamma[i] * model.thickness[i]
+        counts = popcounts(self.block)
+        self.levels = [low[counts == c] for c in range(self.bits + 1)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Drop the tables (and their directory if this object made it)
+        for name in ("cost", "parent"):
+            table = getattr(self, name, None)
+            if isinstance(table, np.memmap):
+                table._mmap.close()
+            setattr(self, name, None)
+        if self._owned:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        else:
+            for name in ("cost.f8", "parent.u1"):
+                path = os.path.join(self.directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _stress(self, depth, total):
+        return self.model.surcharge + total - GAMMA_W * np.maximum(depth - self.model._gwt, 0.0)
+
+    def _fill(self, b):
+        model = self.model
+        start = b << self.bits
+        high = [i for i in range(self.bits, self.n) if start >> i & 1]
+        depth = sum(model._thickness[i] for i in high) + self.low_depth
+        total = sum(model._gamma[i] * model._thickness[i] for i in high) + self.low_total
+
+        cost = np.full(self.block, np.inf)
+        parent = np.zeros(self.block, dtype=np.uint8)
+        if b == 0:
+            cost[0] = 0.0
+        # Sets whose last layer is a high one: the source block is on disk
+        for i in high:
+            h = model._thickness[i]
+            source_depth = depth - h
+            source_total = total - model._gamma[i] * h
+            f, _ = model.layer_forces(i, source_depth, self._stress(source_depth, source_total))
+            offset = start - (1 << i)
+            candidate = np.asarray(self.cost[offset:offset + self.block]) + f
+            better = candidate < cost
+            cost[better] = candidate[better]
+            parent[better] = i
+        # Sets whose last layer is a low one: the source is in this block
+        stress = self._stress(depth, total)
+        for c in range(self.bits):
+            sources = self.levels[c]
+            for i in range(self.bits):
+                s = sources[(sources >> i) & 1 == 0]
+                f, _ = model.layer_forces(i, depth[s], stress[s])
+                candidate = cost[s] + f
+                targets = s | (1 << i)
+                better = candidate < cost[targets]
+                cost[targets[better]] = candidate[better]
+                parent[targets[better]] = i
+        self.cost[start:start + self.block] = cost
+        self.parent[start:start + self.block] = parent
+
+    def solve(self, should_stop=None, progress=None):
+        # Fill the tables block by block; returns False if should_stop()
+        # asked to interrupt between blocks (solve() again resumes). The
+        # tables are flushed to disk whenever it returns.
+        blocks = self.size >> self.bits
+        while self.next_block < blocks:
+            self._fill(self.next_block)
+            self.next_block += 1
+            if progress is not None:
+                progress(self.next_block << self.bits, self.size)
+            if should_stop is not None and should_stop():
+                break
+        self.cost.flush()
+        self.parent.flush()
+        return self.solved
+
+    @property
+    def solved(self):
+        return self.next_block == self.size >> self.bits
+
+    def best_force(self):
+        return float(self.cost[self.size - 1])
+
+    def best_order(self):
+        return _walk_parents(self.parent, self.size)
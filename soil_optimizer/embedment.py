@@ -0,0 +1,133 @@
+import argparse
+import math
+
+import numpy as np
+
+from .coefficients import RANKINE, add_coefficient_arguments, coefficients_from_args
+from .dp import DP_MAX_LAYERS
+from .engine import ForceModel
+from .loader import load_layers
+from .model import GAMMA_W
+from .pareto import pareto_front
+
+# Gross-up of the toe depth for the simplified cantilever method (covers the
+# reversed passive pressure at the toe that the method leaves out)
+DEPTH_FACTOR = 1.2
+ROOT_TOL = 1e-10
+ROOT_MAX_ITER = 100
+
+
+# ------------------- Moment Equilibrium -------------------
+# Simplified (Blum) cantilever: below the dredge level the wall is pushed by
+# active pressure Ka·(σH + γ·d) and held by passive pressure Kp·γ·d, both on
+# the embedment soil. Moments about the toe at depth D balance when
+#   (Kp − Ka)·γ·D³/6 − Ka·σH·D²/2 − P·D − M = 0
+# with P the active force above the dredge level and M its moment about the
+# dredge level. The left side falls with P and M, so the root grows with both.
+def solve_embedment(force, moment, stress, ka, kp, gamma, tol=ROOT_TOL, max_iter=ROOT_MAX_ITER):
+    # Toe depth D0 below the dredge level for arrays of (force, moment) at
+    # once: Newton steps kept inside a bracket that bisection shrinks whenever
+    # a step would leave it
+    force = np.asarray(force, dtype=float)
+    moment = np.asarray(moment, dtype=float)
+    a = (kp - ka) * gamma / 6
+    b = ka * stress / 2
+    if not a > 0:
+        raise ValueError("The passive coefficient must exceed the active one below the dredge level")
+
+    def g(d):
+        return ((a * d - b) * d - force) * d - moment
+
+    lo = np.zeros_like(force)
+    hi = np.ones_like(force)
+    while np.any(g(hi) < 0):
+        hi = np.where(g(hi) < 0, 2 * hi, hi)
+    d = hi.copy()
+    for _ in range(max_iter):
+        value = g(d)
+        lo = np.where(value < 0, d, lo)
+        hi = np.where(value >= 0, d, hi)
+        slope = (3 * a * d - 2 * b) * d - force
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = d - value / slope
+        d_next = np.where((step > lo) & (step < hi), step, 0.5 * (lo + hi))
+        if np.all(np.abs(d_next - d) <= tol * np.maximum(d_next, 1.0)):
+            return d_next
+        d = d_next
+    return d
+
+
+# ------------------- Embedded Cantilever Wall -------------------
+class EmbeddedWall:
+    # Cantilever sheet pile retaining `layers` above the dredge level and
+    # embedded in one soil (φ, γ) below it. Passive resistance is divided by
+    # `passive_factor`; the toe depth is multiplied by `depth_factor`. A GWT
+    # above the dredge level is taken to stand at the dredge level in front,
+    # so the embedment soil is submerged and net water pressure below the
+    # dredge level is ignored.
+    def __init__(self, layers, gwt_depth, embedment_phi, embedment_gamma, surcharge=0.0, coefficients=None,
+                 water=False, passive_factor=1.0, depth_factor=DEPTH_FACTOR):
+        self.layers = list(layers)
+        self.gwt_depth = gwt_depth
+        self.surcharge = surcharge
+        self.coefficients = RANKINE if coefficients is None else coefficients
+        self.water = water
+        self.model = ForceModel(self.layers, gwt_depth, surcharge, self.coefficients, water)
+        self.depth_factor = depth_factor
+
+        height = self.model.height()
+        submerged = gwt_depth is not None and gwt_depth <= height
+        self.gamma = embedment_gamma - GAMMA_W if submerged else embedment_gamma
+        self.ka = float(self.coefficients(embedment_phi))
+        self.kp = math.tan(math.radians(45 + embedment_phi / 2)) ** 2 / passive_factor
+        # Vertical effective stress at the dredge level is the same for every ordering
+        self.stress = self.model.prefix_state(range(self.model.n))[1]
+
+    def depths(self, orders):
+        # Required embedment below the dredge level for an (m, n) array of orderings
+        forces, moments = self.model.batch_forces_moments(orders)
+        return self.depth_factor * solve_embedment(forces, moments, self.stress, self.ka, self.kp, self.gamma)
+
+    def depth(self, order):
+        return float(self.depths(np.asarray([order], dtype=np.intp).reshape(1, -1))[0])
+
+    def optimize(self, constraints=None):
+        # Ordering with the least required embedment. It is Pareto-optimal in
+        # (force, moment), so only the points of that front need a root solve.
+        front = pareto_front(self.layers, self.gwt_depth, constraints=constraints, surcharge=self.surcharge,
+                             coefficients=self.coefficients, water=self.water)
+        index = {id(layer): i for i, layer in enumerate(self.layers)}
+        orders = np.array([[index[id(layer)] for layer in point.ordering] for point in front], dtype=np.intp)
+        depths = self.depths(orders.reshape(len(front), self.model.n))
+        best = int(np.argmin(depths))
+        return front[best].ordering, float(depths[best])
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.embedment",
+                                     description="Order the retained layers of a cantilever sheet pile for the "
+                                                 "least embedment depth")
+    parser.add_argument("csv")
+    parser.add_argument("--gwt", type=float)
+    parser.add_argument("--surcharge", type=float, default=0.0)
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    parser.add_argument("--embedment-phi", type=float, required=True, help="φ of the soil below the dredge level")
+    parser.add_argument("--embedment-gamma", type=float, required=True, help="γ of the soil below the dredge level")
+    parser.add_argument("--passive-factor", type=float, default=1.0, help="factor of safety on Kp")
+    parser.add_argument("--depth-factor", type=float, default=DEPTH_FACTOR)
+    add_coefficient_arguments(parser)
+    args = parser.parse_args(argv)
+
+    layers = load_layers(args.csv, args.gwt)
+    if len(layers) > DP_MAX_LAYERS:
+        parser.error(f"The least embedment search is limited to {DP_MAX_LAYERS} layers, got {len(layers)}")
+    wall = EmbeddedWall(layers, args.gwt, args.embedment_phi, args.embedment_gamma, args.surcharge,
+                        coefficients_from_args(args), args.water, args.passive_factor, args.depth_factor)
+    ordering, depth = wall.optimize()
+    print(f"Embedment as given: {wall.depth(range(len(layers))):.3f} m")
+    print(f"Least embedment: {depth:.3f} m with {' > '.join(str(layer.name) for layer in ordering)}")
+
+
+if __name__ == "__main__":
+    main()
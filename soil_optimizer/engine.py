@@ -0,0 +1,292 @@
+import math
+
+import numpy as np
+
+from .coefficients import RANKINE
+from .model import GAMMA_W
+
+
+# ------------------- Clipped Segments -------------------
+# With cohesion σa = Ka·(σv' - t) with t = 2c'/√Ka, clipped at zero. σv' is
+# linear along a segment, so the tension zone ends where the line crosses t and
+# the area (and first moment) of the clipped part is closed form too.
+def _clipped_area(a, b, length):
+    # ∫ max(s, 0) along a segment where s runs linearly from a to b
+    if a >= 0.0 and b >= 0.0:
+        return 0.5 * (a + b) * length
+    if a <= 0.0 and b <= 0.0:
+        return 0.0
+    return 0.5 * max(a, b) ** 2 / abs(a - b) * length
+
+
+def _clipped_areas(a, b, length):
+    # Vectorized _clipped_area; needs no depths, so it also serves models
+    # whose depths are measured from a water table at infinity
+    crossing = (a < 0) != (b < 0)
+    positive = np.maximum(a, 0.0) + np.maximum(b, 0.0)
+    return 0.5 * positive * np.where(crossing, positive / np.where(crossing, np.abs(a - b), 1.0), 1.0) * length
+
+
+def _crossing(a, b, z0, length):
+    # Depth where s crosses zero inside the segment, else its top
+    crossing = (a < 0) != (b < 0)
+    return z0 + np.where(crossing, a / np.where(crossing, a - b, 1.0), 0.0) * length
+
+
+def _clipped_segments(a, b, z0, length):
+    # Vectorized (area, first moment about the surface) of max(s, 0) over
+    # segments starting at depth z0: the positive part runs from u to v
+    zc = _crossing(a, b, z0, length)
+    u = np.where(a >= 0, z0, zc)
+    v = np.where(b >= 0, z0 + length, zc)
+    pa = np.maximum(a, 0.0)
+    pb = np.maximum(b, 0.0)
+    return 0.5 * (v - u) * (pa + pb), (v - u) * (pa * (2 * u + v) + pb * (u + 2 * v)) / 6
+
+
+# ------------------- Analytic Force Engine -------------------
+# Within a layer the vertical stress is linear in depth (with a kink at the
+# GWT), so the area under Ka·σv is exact from the end points. This gives the
+# same force as total_force without sampling the profile, in O(n) per ordering.
+# A uniform surcharge q only raises the starting stress; cohesive layers use
+# the clipped formulas above and stay O(n). The coefficients (Rankine unless a
+# coefficient model is given) are evaluated once per layer here, never inside
+# the ordering loops. With `water` the hydrostatic pressure γw·(z − zw) below
+# the GWT is added layer by layer in the same pass, so forces and moments are
+# the total thrust on the wall.
+class ForceModel:
+    def __init__(self, layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+        self.layers = list(layers)
+        self.gwt_depth = gwt_depth
+        self.surcharge = float(surcharge)
+        self.coefficients = RANKINE if coefficients is None else coefficients
+        self.water = bool(water)
+        self.n = len(self.layers)
+
+        self.gamma = np.array([layer.gamma for layer in self.layers], dtype=float)
+        self.thickness = np.array([layer.thickness for layer in self.layers], dtype=float)
+        self.ka = self.coefficients(np.array([layer.phi for layer in self.layers], dtype=float))
+        self.cohesion = np.array([getattr(layer, "cohesion", 0.0) for layer in self.layers], dtype=float)
+
+        self._gwt = math.inf if gwt_depth is None else float(gwt_depth)
+        self._sync()
+
+    @classmethod
+    def from_arrays(cls, gamma, thickness, ka, gwt_depth, layers=None, cohesion=None, surcharge=0.0,
+                    coefficients=None, water=False):
+        # Build straight from column arrays (e.g. a memory-mapped catalog);
+        # `layers` is only needed to turn orderings back into SoilLayers
+        model = cls([], gwt_depth, surcharge, coefficients, water)
+        model.layers = layers
+        model.gamma = np.asarray(gamma, dtype=float)
+        model.thickness = np.asarray(thickness, dtype=float)
+        model.ka = np.asarray(ka, dtype=float)
+        model.cohesion = np.zeros_like(model.gamma) if cohesion is None else np.asarray(cohesion, dtype=float)
+        model.n = len(model.gamma)
+        model._sync()
+        return model
+
+    def _sync(self):
+        # Stress below which each layer is in tension, and whether any is
+        self.cutoff = 2 * self.cohesion / np.sqrt(self.ka)
+        self.cohesive = bool(np.any(self.cohesion > 0))
+        # Plain float copies for the scalar path used by tree searches
+        self._gamma = self.gamma.tolist()
+        self._thickness = self.thickness.tolist()
+        self._ka = self.ka.tolist()
+        self._cutoff = self.cutoff.tolist()
+
+    def set_layer(self, i, layer):
+        # Replace layer i in place (used by the incremental engines)
+        self.layers[i] = layer
+        self.gamma[i] = layer.gamma
+        self.thickness[i] = layer.thickness
+        self.ka[i] = self.coefficients(layer.phi)
+        self.cohesion[i] = getattr(layer, "cohesion", 0.0)
+        self._sync()
+
+    def start(self):
+        # (depth, stress, force) at the surface
+        return 0.0, self.surcharge, 0.0
+
+    def height(self):
+        return float(sum(self._thickness))
+
+    def layer_force(self, i, depth, stress, thickness=None):
+        # Force of layer i placed with its top at `depth` under vertical stress
+        # `stress`; returns (force, stress at the layer bottom). `thickness`
+        # cuts the layer short (e.g. at an excavation level).
+        h = self._thickness[i] if thickness is None else thickness
+        g = self._gamma[i]
+        above = min(max(self._gwt - depth, 0.0), h)
+        below = h - above
+        stress_gwt = stress + g * above
+        bottom = stress_gwt + (g - GAMMA_W) * below
+        if self.cohesive:
+            t = self._cutoff[i]
+            force = self._ka[i] * (_clipped_area(stress - t, stress_gwt - t, above) +
+                                   _clipped_area(stress_gwt - t, bottom - t, below))
+        else:
+            force = self._ka[i] * (stress * above + 0.5 * g * above * above +
+                                   stress_gwt * below + 0.5 * (g - GAMMA_W) * below * below)
+        if self.water:
+            force += GAMMA_W * below * (max(depth - self._gwt, 0.0) + 0.5 * below)
+        return force, bottom
+
+    def force(self, order):
+        return self.prefix_state(order)[2]
+
+    def prefix_state(self, prefix):
+        # (depth, stress, force) below a partial ordering
+        depth, stress, force = self.start()
+        for i in prefix:
+            f, stress = self.layer_force(i, depth, stress)
+            force += f
+            depth += self._thickness[i]
+        return depth, stress, force
+
+    def batch_forces(self, orders, start=None):
+        # Forces for an (m, k) array of orderings (or of suffixes continuing
+        # from the prefix_state `start`). Positions are accumulated one column
+        # at a time so every row gets exactly the arithmetic of force().
+        orders = np.asarray(orders, dtype=np.intp)
+        m = orders.shape[0]
+        start = self.start() if start is None else start
+        depth = np.full(m, start[0])
+        stress = np.full(m, start[1])
+        force = np.full(m, start[2])
+        for p in range(orders.shape[1]):
+            idx = orders[:, p]
+            f, stress = self.layer_forces(idx, depth, stress)
+            force += f
+            depth += self.thickness[idx]
+        return force
+
+    def layer_forces(self, idx, depth, stress):
+        # Vectorized layer_force over arrays of layer indices / depths / stresses
+        h = self.thickness[idx]
+        g = self.gamma[idx]
+        above = np.minimum(np.maximum(self._gwt - depth, 0.0), h)
+        below = h - above
+        stress_gwt = stress + g * above
+        bottom = stress_gwt + (g - GAMMA_W) * below
+        if self.cohesive:
+            t = self.cutoff[idx]
+            force = self.ka[idx] * (_clipped_areas(stress - t, stress_gwt - t, above) +
+                                    _clipped_areas(stress_gwt - t, bottom - t, below))
+        else:
+            force = self.ka[idx] * (stress * above + 0.5 * g * above * above +
+                                    stress_gwt * below + 0.5 * (g - GAMMA_W) * below * below)
+        if self.water:
+            force = force + GAMMA_W * below * (np.maximum(depth - self._gwt, 0.0) + 0.5 * below)
+        return force, bottom
+
+    def layer_forces_moments(self, idx, depth, stress, thickness=None):
+        # Like layer_forces, also returning the first moment ∫σa·z dz of the
+        # layer's pressure about the surface
+        h = self.thickness[idx] if thickness is None else thickness
+        g = self.gamma[idx]
+        gs = g - GAMMA_W
+        above = np.minimum(np.maximum(self._gwt - depth, 0.0), h)
+        below = h - above
+        stress_gwt = stress + g * above
+        depth_gwt = depth + above
+        bottom = stress_gwt + gs * below
+        if self.cohesive:
+            t = self.cutoff[idx]
+            f1, m1 = _clipped_segments(stress - t, stress_gwt - t, depth, above)
+            f2, m2 = _clipped_segments(stress_gwt - t, bottom - t, depth_gwt, below)
+            force, moment = self.ka[idx] * (f1 + f2), self.ka[idx] * (m1 + m2)
+        else:
+            force = self.ka[idx] * (stress * above + 0.5 * g * above * above +
+                                    stress_gwt * below + 0.5 * gs * below * below)
+            moment = self.ka[idx] * (stress * depth * above + 0.5 * (stress + g * depth) * above * above +
+                                     g * above ** 3 / 3 +
+                                     stress_gwt * depth_gwt * below +
+                                     0.5 * (stress_gwt + gs * depth_gwt) * below * below + gs * below ** 3 / 3)
+        if self.water:
+            # Linear from γw·(top − zw) to γw·(bottom − zw) over the submerged part
+            top_u = GAMMA_W * np.maximum(depth - self._gwt, 0.0)
+            bottom_u = top_u + GAMMA_W * below
+            force = force + 0.5 * below * (top_u + bottom_u)
+            moment = moment + below * (top_u * (2 * depth_gwt + depth + h) + bottom_u * (depth_gwt + 2 * (depth + h))) / 6
+        return force, moment, bottom
+
+    def batch_forces_moments(self, orders):
+        # Total force and overturning moment about the wall base for an (m, n)
+        # array of orderings, in one pass
+        orders = np.asarray(orders, dtype=np.intp)
+        m = orders.shape[0]
+        depth = np.zeros(m)
+        stress = np.full(m, self.surcharge)
+        force = np.zeros(m)
+        moment = np.zeros(m)
+        for p in range(orders.shape[1]):
+            idx = orders[:, p]
+            f, mz, stress = self.layer_forces_moments(idx, depth, stress)
+            force += f
+            moment += mz
+            depth += self.thickness[idx]
+        return force, self.height() * force - moment
+
+    def resultant(self, order):
+        # Total force of an ordering and the height of its line of action
+        # above the base
+        force, moment = self.batch_forces_moments(np.asarray([order], dtype=np.intp).reshape(1, -1))
+        force, moment = float(force[0]), float(moment[0])
+        return force, moment / force if force else 0.0
+
+    def water_thrust(self):
+        # Hydrostatic force below the GWT and its height above the base; it
+        # depends only on the wall height, so it is the same for every ordering
+        submerged = max(self.height() - self._gwt, 0.0)
+        return 0.5 * GAMMA_W * submerged * submerged, submerged / 3
+
+    def pressure_profile(self, order):
+        # Depths and lateral pressures at the top, end of any tension zone,
+        # water table, end of any tension zone below it, and bottom of every
+        # layer in `order` as (n, 5) arrays; the pressure is linear in between.
+        # An (m, n) array of orderings gives (m, n, 5) arrays in one pass.
+        depth, sigma_a = self._effective_profile(order)
+        if self.water:
+            sigma_a = sigma_a + GAMMA_W * np.maximum(depth - self._gwt, 0.0)
+        return depth, sigma_a
+
+    def _effective_profile(self, order):
+        idx = np.asarray(order, dtype=np.intp)
+        h = self.thickness[idx]
+        g = self.gamma[idx]
+        t = self.cutoff[idx]
+        bottom = np.cumsum(h, axis=-1)
+        top = bottom - h
+        above = np.minimum(np.maximum(self._gwt - top, 0.0), h)
+        increment = g * above + (g - GAMMA_W) * (h - above)
+        stress_bottom = self.surcharge + np.cumsum(increment, axis=-1)
+        stress_top = stress_bottom - increment
+        stress_gwt = stress_top + g * above
+
+        a, b, c = stress_top - t, stress_gwt - t, stress_bottom - t
+        upper = (a < 0) != (b < 0)
+        lower = (b < 0) != (c < 0)
+        depth = np.stack([top, _crossing(a, b, top, above), top + above,
+                          _crossing(b, c, top + above, h - above), bottom], axis=-1)
+        net = np.stack([a, np.where(upper, 0.0, a), b, np.where(lower, 0.0, b), c], axis=-1)
+        return depth, self.ka[idx][..., None] * np.maximum(net, 0.0)
+
+    def crack_depth(self, order):
+        # Depth of the tension crack from the surface: where σa first rises
+        # above zero (0 when there is no tension at the top)
+        depth, sigma_a = self._effective_profile(order)
+        positive = sigma_a.ravel() > 0
+        if not positive.any():
+            return self.height()
+        k = int(np.argmax(positive))
+        return float(depth.ravel()[k - 1]) if k else 0.0
+
+    def layers_for(self, order):
+        return tuple(self.layers[i] for i in order)
+
+
+def analytic_force(layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+    model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+    return model.force(range(model.n))
@@ -0,0 +1,191 @@
+import argparse
+import json
+
+import numpy as np
+
+from .coefficients import add_coefficient_arguments, coefficients_from_args
+from .engine import ForceModel
+from .loader import load_layers
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow export is optional
+    pa = None
+
+IPC_EXTENSIONS = (".arrow", ".feather", ".ipc")
+# Orderings per record batch: memory stays bounded however many are exported
+EXPORT_BATCH_ROWS = 65_536
+# Breakpoints per layer in a pressure profile (see ForceModel.pressure_profile)
+PROFILE_POINTS = 5
+
+
+# ------------------- Arrow Columns -------------------
+# Columns wrap the engines' NumPy buffers: a contiguous numeric array without
+# nulls becomes an Arrow array without a copy, and an (m, n) block of
+# orderings becomes a fixed-size list column over its flat buffer. No Python
+# object is made per row.
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Exporting Arrow or Parquet files requires pyarrow")
+
+
+def _column(values, dtype=float):
+    return pa.array(np.ascontiguousarray(values, dtype=dtype))
+
+
+def _orderings(orders):
+    orders = np.asarray(orders)
+    return pa.FixedSizeListArray.from_arrays(_column(orders.ravel(), np.int64), orders.shape[1])
+
+
+def _metadata(names, **extra):
+    # Layer names once per file instead of once per row
+    metadata = {"layer_names": json.dumps([str(name) for name in names])}
+    metadata.update({key: json.dumps(value) for key, value in extra.items()})
+    return metadata
+
+
+def results_batch(orders, forces, moments=None, ids=None, metadata=None):
+    # One row per ordering: id, the ordering as layer indices, force and
+    # (optionally) moment about the wall base
+    _require_pyarrow()
+    orders = np.asarray(orders)
+    ids = np.arange(len(orders)) if ids is None else ids
+    columns = {"id": _column(ids, np.int64), "ordering": _orderings(orders), "force": _column(forces)}
+    if moments is not None:
+        columns["moment"] = _column(moments)
+    return pa.RecordBatch.from_pydict(columns, metadata=metadata)
+
+
+def profile_batch(model, orders, ids=None, metadata=None):
+    # One row per breakpoint of each ordering's pressure profile; the pressure
+    # is linear between consecutive rows of the same id
+    _require_pyarrow()
+    orders = np.asarray(orders, dtype=np.intp)
+    m, n = orders.shape
+    ids = np.arange(m) if ids is None else np.asarray(ids)
+    depth, sigma_a = model.pressure_profile(orders)
+    columns = {"id": _column(np.repeat(ids, n * PROFILE_POINTS), np.int64),
+               "position": _column(np.tile(np.repeat(np.arange(n), PROFILE_POINTS), m), np.int32),
+               "layer": _column(np.repeat(orders.ravel(), PROFILE_POINTS), np.int32),
+               "depth": _column(depth.ravel()),
+               "pressure": _column(sigma_a.ravel())}
+    return pa.RecordBatch.from_pydict(columns, metadata=metadata)
+
+
+# ------------------- Writing Files -------------------
+def file_format(path):
+    name = getattr(path, "name", path)
+    if isinstance(name, str) and name.lower().endswith(IPC_EXTENSIONS):
+        return "ipc"
+    return "parquet"
+
+
+def write_batches(path, batches, format=None):
+    # Stream record batches into one Parquet or Arrow IPC file (by extension
+    # unless `format` is given); only one batch is held at a time. `path` may
+    # also be a writable file object. Returns the number of rows written.
+    _require_pyarrow()
+    format = file_format(path) if format is None else format
+    writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = (ipc.new_file(path, batch.schema) if format == "ipc" else
+                          pq.ParquetWriter(path, batch.schema))
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("Nothing to export")
+    return rows
+
+
+def _chunks(m, batch_rows):
+    for start in range(0, m, batch_rows):
+        yield start, min(start + batch_rows, m)
+
+
+def export_results(path, model, orders, batch_rows=EXPORT_BATCH_ROWS, format=None):
+    # Orderings of one layer set with their forces and moments, evaluated and
+    # written a batch at a time
+    orders = np.asarray(orders, dtype=np.intp)
+    metadata = _metadata([layer.name for layer in model.layers])
+
+    def batches():
+        for start, stop in _chunks(len(orders), batch_rows):
+            forces, moments = model.batch_forces_moments(orders[start:stop])
+            yield results_batch(orders[start:stop], forces, moments, np.arange(start, stop), metadata)
+
+    return write_batches(path, batches(), format)
+
+
+def export_profiles(path, model, orders, batch_rows=EXPORT_BATCH_ROWS, format=None):
+    orders = np.asarray(orders, dtype=np.intp)
+    metadata = _metadata([layer.name for layer in model.layers], gwt_depth=model.gwt_depth,
+                         surcharge=model.surcharge, water=model.water)
+    rows = max(1, batch_rows // max(model.n * PROFILE_POINTS, 1))
+
+    def batches():
+        for start, stop in _chunks(len(orders), rows):
+            yield profile_batch(model, orders[start:stop], np.arange(start, stop), metadata)
+
+    return write_batches(path, batches(), format)
+
+
+def export_alignment(path, alignment, orders=None, forces=None, sections=None, batch_rows=EXPORT_BATCH_ROWS,
+                     format=None):
+    # Per-section results of an Alignment: the ordering (optimized unless
+    # given), its force and the force of the layers as listed
+    if orders is None:
+        orders, forces = alignment.optimize()
+    given = alignment.forces()
+    forces = alignment.forces(orders) if forces is None else forces
+    sections = np.arange(alignment.sections) if sections is None else np.asarray(sections)
+    metadata = _metadata(alignment.names)
+
+    def batches():
+        for start, stop in _chunks(alignment.sections, batch_rows):
+            batch = results_batch(orders[start:stop], forces[start:stop], ids=np.arange(start, stop))
+            columns = [pa.array(sections[start:stop])] + batch.columns + [_column(given[start:stop])]
+            names = ["section"] + batch.schema.names + ["given_force"]
+            yield pa.RecordBatch.from_arrays(columns, names=names, metadata=metadata)
+
+    return write_batches(path, batches(), format)
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    from .search import optimize_layers
+
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.export",
+                                     description="Write the given and optimized orderings of a layer table, with "
+                                                 "their forces and pressure profiles, as Parquet or Arrow files")
+    parser.add_argument("csv")
+    parser.add_argument("results", help="output file (.parquet, or .arrow for Arrow IPC)")
+    parser.add_argument("--profiles", help="also write the pressure profiles to this file")
+    parser.add_argument("--gwt", type=float)
+    parser.add_argument("--surcharge", type=float, default=0.0)
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    add_coefficient_arguments(parser)
+    args = parser.parse_args(argv)
+
+    layers = load_layers(args.csv, args.gwt)
+    coefficients = coefficients_from_args(args)
+    model = ForceModel(layers, args.gwt, args.surcharge, coefficients, args.water)
+    ordering, _ = optimize_layers(layers, args.gwt, surcharge=args.surcharge, coefficients=coefficients,
+                                  water=args.water)
+    index = {id(layer): i for i, layer in enumerate(layers)}
+    orders = np.array([range(len(layers)), [index[id(layer)] for layer in ordering]], dtype=np.intp)
+    print(f"Wrote {export_results(args.results, model, orders)} orderings to {args.results}")
+    if args.profiles:
+        print(f"Wrote {export_profiles(args.profiles, model, orders)} profile points to {args.profiles}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import itertools
+import random
+import sys
+
+import numpy as np
+
+from .coefficients import AtRest, Coulomb, MononobeOkabe
+from .engine import ForceModel, analytic_force
+from .incremental import IncrementalOptimizer
+from .model import GAMMA_W, SoilLayer, total_force
+from .pareto import pareto_front
+from .search import ENGINES, search_layers
+
+# Relative and absolute tolerance of an engine against the reference. Without
+# cohesion the reference pressure is linear between its sample points, so the
+# trapezoid sum is exact and only rounding separates the two.
+REL_TOL = 1e-9
+ABS_TOL = 1e-9
+# The reference samples every layer segment with at least 50 points; a
+# tension crack inside a segment is the only kink the sampling can miss
+REFERENCE_POINTS = 50
+# Largest stack whose optimum is found by running the reference on every ordering
+ORACLE_MAX_LAYERS = 5
+# Thicknesses are multiples of this, so boundary depths add up exactly and a
+# GWT can sit exactly on one
+THICKNESS_STEP = 0.25
+GWT_CASES = ("none", "surface", "boundary", "inside", "base", "below")
+
+
+# ------------------- Random Problems -------------------
+class FuzzCase:
+    def __init__(self, layers, gwt_depth, surcharge=0.0, coefficients=None, water=False, gwt_case="none"):
+        self.layers = list(layers)
+        self.gwt_depth = gwt_depth
+        self.surcharge = surcharge
+        self.coefficients = coefficients
+        self.water = water
+        self.gwt_case = gwt_case
+
+    def options(self):
+        return {"surcharge": self.surcharge, "coefficients": self.coefficients, "water": self.water}
+
+    def with_layers(self, layers):
+        return FuzzCase(layers, self.gwt_depth, self.surcharge, self.coefficients, self.water, self.gwt_case)
+
+    def describe(self):
+        # Enough to rebuild the case by hand: the layer CSV and the options
+        lines = ["name,phi,gamma,thickness,cohesion"]
+        lines += [f"{layer.name},{layer.phi!r},{layer.gamma!r},{layer.thickness!r},{layer.cohesion!r}"
+                  for layer in self.layers]
+        lines.append(f"gwt={self.gwt_depth!r} ({self.gwt_case}) surcharge={self.surcharge!r} "
+                     f"coefficients={self.coefficients!r} water={self.water}")
+        return "\n".join(lines)
+
+
+def random_case(rng, max_layers=ORACLE_MAX_LAYERS):
+    n = rng.randint(1, max_layers)
+    gwt_case = rng.choice(GWT_CASES)
+    # Below a GWT the submerged weight must stay positive
+    gamma_min = GAMMA_W + 0.5 if gwt_case != "none" else 12.0
+    cohesive = rng.random() < 0.3
+    layers = [SoilLayer(rng.uniform(15.0, 45.0), rng.uniform(gamma_min, 22.0),
+                        rng.randint(1, 16) * THICKNESS_STEP, f"L{i + 1}",
+                        rng.uniform(0.0, 15.0) if cohesive and rng.random() < 0.6 else 0.0)
+              for i in range(n)]
+
+    height = sum(layer.thickness for layer in layers)
+    boundaries = list(itertools.accumulate(layer.thickness for layer in layers))
+    gwt_depth = {"none": None,
+                 "surface": 0.0,
+                 "boundary": rng.choice(boundaries),
+                 "inside": rng.uniform(0.0, height),
+                 "base": height,
+                 "below": height + rng.uniform(0.1, 5.0)}[gwt_case]
+
+    kind = rng.choice(("rankine", "rankine", "coulomb", "at-rest", "mononobe-okabe"))
+    coefficients = None
+    if kind == "coulomb":
+        beta = rng.choice((0.0, rng.uniform(0.0, min(layer.phi for layer in layers))))
+        coefficients = Coulomb(rng.uniform(0.0, 20.0), rng.uniform(-10.0, 10.0), beta)
+    elif kind == "at-rest":
+        coefficients = AtRest(rng.uniform(1.0, 4.0))
+    elif kind == "mononobe-okabe":
+        # kh ≤ 0.25 tilts gravity by less than the smallest φ
+        coefficients = MononobeOkabe(rng.uniform(0.0, 0.25), rng.uniform(-0.1, 0.1), delta_ratio=rng.uniform(0.0, 1.0))
+    surcharge = rng.choice((0.0, rng.uniform(0.0, 50.0)))
+    return FuzzCase(layers, gwt_depth, surcharge, coefficients, rng.random() < 0.4, gwt_case)
+
+
+# ------------------- Reference Oracle -------------------
+def tolerance(case, force):
+    # Allowed gap to the reference force. A tension crack inside a sampling
+    # interval of length dz changes the trapezoid sum by at most K·γ·dz²/8.
+    tol = ABS_TOL + REL_TOL * abs(force)
+    for layer in case.layers:
+        if layer.cohesion > 0:
+            dz = layer.thickness / (REFERENCE_POINTS - 1)
+            tol += layer.ka(case.coefficients) * layer.gamma * dz * dz / 8
+    return tol
+
+
+def reference_force(case, order):
+    return float(total_force([case.layers[i] for i in order], case.gwt_depth, **case.options()))
+
+
+def reference_optimum(case):
+    # Least reference force over every ordering: slow, hence small stacks only
+    return min(reference_force(case, order) for order in itertools.permutations(range(len(case.layers))))
+
+
+# ------------------- Checks -------------------
+def check_case(case, rng=None, orders=8):
+    # Every engine against the reference; returns a list of failure messages
+    rng = random.Random(0) if rng is None else rng
+    n = len(case.layers)
+    options = case.options()
+    failures = []
+
+    def expect(name, value, expected):
+        if not abs(value - expected) <= tolerance(case, expected):
+            failures.append(f"{name}: {value!r} != reference {expected!r} (diff {value - expected:.3e})")
+
+    # Single orderings: scalar, batched and force/moment passes
+    model = ForceModel(case.layers, case.gwt_depth, **options)
+    sample = [list(range(n))] + [rng.sample(range(n), n) for _ in range(orders - 1)]
+    expected = [reference_force(case, order) for order in sample]
+    expect("analytic_force", analytic_force(case.layers, case.gwt_depth, **options), expected[0])
+    batch = model.batch_forces(np.array(sample, dtype=np.intp))
+    forces, _ = model.batch_forces_moments(np.array(sample, dtype=np.intp))
+    for order, f_ref, f_batch, f_moment in zip(sample, expected, batch.tolist(), forces.tolist()):
+        expect(f"ForceModel.force{tuple(order)}", model.force(order), f_ref)
+        expect(f"batch_forces{tuple(order)}", f_batch, f_ref)
+        expect(f"batch_forces_moments{tuple(order)}", f_moment, f_ref)
+
+    if n > ORACLE_MAX_LAYERS:
+        return failures
+    optimum = reference_optimum(case)
+
+    # Exact engines must reach the optimum; every engine's reported force must
+    # be that of its ordering and its lower bound may not exceed the optimum
+    index = {id(layer): i for i, layer in enumerate(case.layers)}
+    for engine in ENGINES:
+        result = search_layers(case.layers, case.gwt_depth, engine=engine, **options)
+        order = [index[id(layer)] for layer in result.ordering]
+        expect(f"{engine} ordering force", result.force, reference_force(case, order))
+        if engine == "local":
+            if result.force < optimum - tolerance(case, optimum):
+                failures.append(f"local: {result.force!r} beats the reference optimum {optimum!r}")
+        else:
+            expect(f"{engine} optimum", result.force, optimum)
+        if result.lower_bound is not None and result.lower_bound > optimum + tolerance(case, optimum):
+            failures.append(f"{engine}: lower bound {result.lower_bound!r} above the optimum {optimum!r}")
+
+    front = pareto_front(case.layers, case.gwt_depth, **options)
+    expect("pareto_front least force", min(point.force for point in front), optimum)
+
+    # Incremental DP: start from perturbed layers and edit them into the case
+    start = [SoilLayer(layer.phi, layer.gamma, layer.thickness + THICKNESS_STEP, layer.name, layer.cohesion)
+             for layer in case.layers]
+    incremental = IncrementalOptimizer(start, case.gwt_depth, sample[-1], **options)
+    for k, layer in enumerate(case.layers):
+        incremental.update_layer(k, layer)
+    expect("IncrementalOptimizer.best", incremental.best()[1], optimum)
+    expect("IncrementalOptimizer.order_force", incremental.order_force(), expected[-1])
+    return failures
+
+
+def shrink(case, failing):
+    # Drop layers one at a time while the case still fails
+    shrunk = True
+    while shrunk and len(case.layers) > 1:
+        shrunk = False
+        for k in range(len(case.layers)):
+            candidate = case.with_layers(case.layers[:k] + case.layers[k + 1:])
+            if case.gwt_case == "boundary" and candidate.gwt_depth not in itertools.accumulate(
+                    layer.thickness for layer in candidate.layers):
+                continue
+            if failing(candidate):
+                case = candidate
+                shrunk = True
+                break
+    return case
+
+
+def fuzz(cases=200, seed=0, max_layers=ORACLE_MAX_LAYERS, progress=None):
+    # Run `cases` random problems; returns (index, shrunk case, failures) for
+    # every failing one. Case i is reproducible from (seed, i) alone.
+    found = []
+    for k in range(cases):
+        rng = random.Random(f"{seed}:{k}")
+        case = random_case(rng, max_layers)
+        try:
+            failures = check_case(case, random.Random(k))
+        except Exception as e:
+            failures = [f"{type(e).__name__}: {e}"]
+        if failures:
+            def failing(candidate):
+                try:
+                    return bool(check_case(candidate, random.Random(k)))
+                except Exception:
+                    return True
+            case = shrink(case, failing)
+            try:
+                failures = check_case(case, random.Random(k)) or failures
+            except Exception as e:
+                failures = [f"{type(e).__name__}: {e}"]
+            found.append((k, case, failures))
+        if progress is not None:
+            progress(k + 1, len(found))
+    return found
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.fuzz",
+                                     description="Cross-check every force engine against the reference "
+                                                 "total_force on random layer sets")
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-layers", type=int, default=ORACLE_MAX_LAYERS,
+                        help=f"optima are only checked up to {ORACLE_MAX_LAYERS} layers")
+    args = parser.parse_args(argv)
+
+    found = fuzz(args.cases, args.seed, args.max_layers)
+    for k, case, failures in found:
+        print(f"--- case {k} (seed {args.seed}) ---")
+        print(case.describe())
+        for failure in failures:
+            print(f"  {failure}")
+    print(f"{args.cases} cases, {len(found)} failing")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
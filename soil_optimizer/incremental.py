@@ -0,0 +1,74 @@
+from .dp import SubsetDP
+from .engine import ForceModel
+
+
+def _same_layer(a, b):
+    return ((a.name, a.phi, a.gamma, a.thickness, a.cohesion) ==
+            (b.name, b.phi, b.gamma, b.thickness, b.cohesion))
+
+
+# ------------------- Incremental Re-optimization -------------------
+class IncrementalOptimizer:
+    # Keeps the subset DP tables and the prefix states of a manual arrangement
+    # between edits, so changing one layer only recomputes what depends on it.
+    def __init__(self, layers, gwt_depth, order=None, constraints=None, surcharge=0.0, coefficients=None,
+                 water=False):
+        self.gwt_depth = gwt_depth
+        self.surcharge = surcharge
+        self.constraints = constraints
+        self.model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+        self.dp = SubsetDP(self.model, constraints)
+        self.dp.solve()
+
+        self.order = list(range(self.model.n) if order is None else order)
+        self.states = []  # (depth, stress, force) below each position of self.order
+        self._refresh_states(0)
+
+    def _refresh_states(self, start):
+        del self.states[start:]
+        depth, stress, force = self.states[-1] if self.states else self.model.start()
+        for i in self.order[start:]:
+            f, stress = self.model.layer_force(i, depth, stress)
+            force += f
+            depth += self.model._thickness[i]
+            self.states.append((depth, stress, force))
+
+    def update_layer(self, k, layer):
+        self.dp.update_layer(k, layer)
+        self._refresh_states(self.order.index(k))
+
+    def set_order(self, order):
+        # Manual rearrangement: recompute the profile from the first moved layer
+        order = list(order)
+        start = next((p for p, (a, b) in enumerate(zip(self.order, order)) if a != b),
+                     min(len(self.order), len(order)))
+        self.order = order
+        self._refresh_states(start)
+
+    def sync(self, layers, gwt_depth, order=None, constraints=None, surcharge=0.0, coefficients=None, water=False):
+        # Bring the engine in line with an edited layer table. Returns the
+        # indices of the layers that changed, or None if it had to be rebuilt.
+        layers = list(layers)
+        coefficients = self.model.coefficients if coefficients is None else coefficients
+        if (gwt_depth != self.gwt_depth or surcharge != self.surcharge or len(layers) != self.model.n or
+                constraints != self.constraints or coefficients != self.model.coefficients or
+                water != self.model.water):
+            self.__init__(layers, gwt_depth, order, constraints, surcharge, coefficients, water)
+            return None
+        changed = [k for k, layer in enumerate(layers) if not _same_layer(layer, self.model.layers[k])]
+        if len(changed) > 1:
+            # Each update redoes half the table, so a fresh solve is cheaper
+            self.__init__(layers, gwt_depth, order, constraints, surcharge, coefficients, water)
+            return None
+        for k in changed:
+            self.update_layer(k, layers[k])
+        if order is not None:
+            self.set_order(order)
+        return changed
+
+    def order_force(self):
+        return self.states[-1][2] if self.states else 0.0
+
+    def best(self):
+        order = self.dp.best_order()
+        return self.model.layers_for(order), self.model.force(order)
@@ -0,0 +1,80 @@
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .search import search_layers
+
+
+# ------------------- Background Optimization Jobs -------------------
+class OptimizationJob:
+    def __init__(self, layers, gwt_depth, **options):
+        self.layers = list(layers)
+        self.gwt_depth = gwt_depth
+        self.options = options
+        self.total = math.factorial(len(self.layers))
+
+        self.evaluated = 0
+        self.covered = 0
+        self.best_layers = None
+        self.best_force = None
+        self.result = None
+        self.error = None
+
+        self.future = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def _progress(self, stats):
+        with self._lock:
+            self.evaluated = stats.evaluated
+            self.covered = stats.covered
+
+    def _improved(self, ordering, force, stats):
+        with self._lock:
+            self.best_layers = ordering
+            self.best_force = force
+
+    def run(self):
+        try:
+            self.result = search_layers(self.layers, self.gwt_depth,
+                                        on_improvement=self._improved, progress=self._progress,
+                                        cancel=self._cancel, **self.options)
+        except Exception as e:
+            self.error = e
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def snapshot(self):
+        # Consistent (evaluated, best_layers, best_force) view for the UI thread
+        with self._lock:
+            return self.evaluated, self.best_layers, self.best_force
+
+    def fraction(self):
+        # Share of all orderings evaluated or ruled out by the search so far
+        return min(self.covered / self.total, 1.0) if self.total else 1.0
+
+
+class JobPool:
+    # One pool is shared by every session on the server, so a long search in
+    # one browser tab never occupies the Streamlit script thread of another.
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="soil-optimizer")
+
+    def submit(self, layers, gwt_depth, **options):
+        job = OptimizationJob(layers, gwt_depth, **options)
+        job.future = self._executor.submit(job.run)
+        return job
+
+    def shutdown(self, cancel_futures=True):
+        self._executor.shutdown(wait=False, cancel_futures=cancel_futures)
@@ -0,0 +1,206 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from .model import GAMMA_W, SoilLayer
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pq = None
+
+LAYER_COLUMNS = ("name", "phi", "gamma", "thickness")
+# Optional column; missing means a cohesionless layer
+COHESION_COLUMN = "cohesion"
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+# Problems listed in the error message; the exception keeps all of them
+MAX_REPORTED_PROBLEMS = 20
+
+
+# ------------------- Validation -------------------
+class LayerTableError(ValueError):
+    def __init__(self, problems):
+        # (row, message) pairs, rows numbered from 1 like the data lines of the file
+        self.problems = problems
+        lines = [f"row {row}: {message}" for row, message in problems[:MAX_REPORTED_PROBLEMS]]
+        if len(problems) > MAX_REPORTED_PROBLEMS:
+            lines.append(f"... and {len(problems) - MAX_REPORTED_PROBLEMS} more")
+        super().__init__(f"{len(problems)} invalid value(s) in the layer table:\n" + "\n".join(lines))
+
+
+def _numeric_column(df, col, problems, rows):
+    raw = df[col]
+    values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=float)
+    bad = np.isnan(values)
+    for k in np.flatnonzero(bad):
+        given = raw.iloc[k]
+        problems.append((rows[k], f"{col} is missing" if pd.isna(given) else f"{col} '{given}' is not a number"))
+    return values, bad
+
+
+def _check_range(values, ok, skip, col, requirement, problems, rows):
+    for k in np.flatnonzero(~ok & ~skip):
+        problems.append((rows[k], f"{col} = {values[k]:g} {requirement}"))
+
+
+def layer_arrays(df, gwt_depth=None, first_row=1):
+    # Coerce and validate a layer table in bulk; returns (names, phi, gamma,
+    # thickness, cohesion) arrays or raises LayerTableError listing every bad value.
+    # gwt_depth is None, a scalar or one depth per row (nan = no GWT).
+    missing = [col for col in LAYER_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Layer table is missing columns: {', '.join(missing)}")
+
+    rows = np.arange(first_row, first_row + len(df))
+    problems = []
+    phi, bad_phi = _numeric_column(df, 'phi', problems, rows)
+    gamma, bad_gamma = _numeric_column(df, 'gamma', problems, rows)
+    thickness, bad_thickness = _numeric_column(df, 'thickness', problems, rows)
+
+    _check_range(phi, (phi > 0) & (phi < 90), bad_phi, 'phi', "must be between 0 and 90°", problems, rows)
+    wet = np.zeros(len(df), dtype=bool)
+    if gwt_depth is not None:
+        wet = ~np.isnan(np.broadcast_to(np.asarray(gwt_depth, dtype=float), (len(df),)))
+    _check_range(gamma, wet | (gamma > 0), bad_gamma, 'gamma', "must be positive", problems, rows)
+    # Below the water table the submerged weight γ − γw must stay positive
+    _check_range(gamma, ~wet | (gamma > GAMMA_W), bad_gamma, 'gamma',
+                 f"must exceed γw = {GAMMA_W} kN/m³ with a groundwater table", problems, rows)
+    _check_range(thickness, thickness > 0, bad_thickness, 'thickness', "must be positive", problems, rows)
+    if COHESION_COLUMN in df.columns:
+        blank_cohesion = df[COHESION_COLUMN].isna().to_numpy()
+        cohesion = np.where(blank_cohesion, 0.0,
+                            pd.to_numeric(df[COHESION_COLUMN], errors="coerce").to_numpy(dtype=float))
+        _check_range(cohesion, cohesion >= 0, blank_cohesion, COHESION_COLUMN,
+                     "must be a non-negative number", problems, rows)
+    else:
+        cohesion = np.zeros(len(df))
+
+    if problems:
+        problems.sort(key=lambda problem: problem[0])
+        raise LayerTableError(problems)
+
+    names = df['name'].astype(str).to_numpy(dtype=str)
+    blank = df['name'].isna().to_numpy() | (np.char.strip(names) == "")
+    if blank.any():
+        names = names.astype(object)
+        names[blank] = [f"Layer {row}" for row in rows[blank]]
+        names = names.astype(str)
+    return names, phi, gamma, thickness, cohesion
+
+
+def layers_from_arrays(names, phi, gamma, thickness, cohesion):
+    return [SoilLayer(*values) for values in zip(phi.tolist(), gamma.tolist(), thickness.tolist(), names.tolist(),
+                                                 cohesion.tolist())]
+
+
+def layers_from_frame(df, gwt_depth=None):
+    return layers_from_arrays(*layer_arrays(df, gwt_depth))
+
+
+# ------------------- Reading Files -------------------
+def _is_parquet(source):
+    name = getattr(source, "name", source)
+    return isinstance(name, str) and name.lower().endswith(PARQUET_EXTENSIONS)
+
+
+def read_table(source):
+    # CSV or Parquet (by file name) into a DataFrame; `source` may be a path
+    # or an uploaded file object
+    if _is_parquet(source):
+        if pq is None:
+            raise ImportError("Reading Parquet files requires pyarrow")
+        return pq.read_table(source).to_pandas()
+    return pd.read_csv(source)
+
+
+def load_layers(source, gwt_depth=None):
+    return layers_from_frame(read_table(source), gwt_depth)
+
+
+def _chunks(source, chunksize):
+    if _is_parquet(source):
+        if pq is None:
+            raise ImportError("Reading Parquet files requires pyarrow")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(source, chunksize=chunksize) as reader:
+            yield from reader
+
+
+def iter_sites(source, gwt_depth=None, site_column="site", chunksize=100_000):
+    # Stream a multi-site file chunk by chunk, yielding (site, layers) for each
+    # run of rows sharing a site id. A site may span chunk boundaries but its
+    # rows must be contiguous.
+    pending = None
+    done = set()
+    first_row = 1
+    for chunk in _chunks(source, chunksize):
+        if site_column not in chunk.columns:
+            raise ValueError(f"Multi-site file is missing the '{site_column}' column")
+        columns = layer_arrays(chunk, gwt_depth, first_row)
+        first_row += len(chunk)
+
+        sites = chunk[site_column].to_numpy()
+        starts = np.flatnonzero(np.r_[True, sites[1:] != sites[:-1]])
+        stops = np.r_[starts[1:], len(sites)]
+        for start, stop in zip(starts, stops):
+            site = sites[start]
+            layers = layers_from_arrays(*(column[start:stop] for column in columns))
+            if pending is not None and pending[0] == site:
+                pending[1].extend(layers)
+                continue
+            if pending is not None:
+                done.add(pending[0])
+                yield pending
+            if site in done:
+                raise ValueError(f"Rows for site {site!r} are not contiguous")
+            pending = (site, layers)
+    if pending is not None:
+        yield pending
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    from .coefficients import add_coefficient_arguments, coefficients_from_args
+    from .search import optimize_layers
+    from .warmstart import SolutionIndex
+
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.loader",
+                                     description="Optimize every site in a multi-site CSV or Parquet file.")
+    parser.add_argument("path")
+    parser.add_argument("--gwt", type=float)
+    parser.add_argument("--surcharge", type=float, default=0.0)
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    parser.add_argument("--site-column", default="site")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--index", help="solution index (.npz) of solved sites: each search starts from the most "
+                                         "similar one, and the file is created or extended")
+    add_coefficient_arguments(parser)
+    args = parser.parse_args(argv)
+
+    coefficients = coefficients_from_args(args)
+
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} does not exist")
+    index = None
+    if args.index:
+        index = SolutionIndex.load(args.index) if os.path.exists(args.index) else SolutionIndex()
+    print("site,layers,force,ordering")
+    for site, layers in iter_sites(args.path, args.gwt, args.site_column, args.chunksize):
+        if index is None:
+            ordering, force = optimize_layers(layers, args.gwt, surcharge=args.surcharge,
+                                              coefficients=coefficients, water=args.water)
+        else:
+            result = index.solve(layers, args.gwt, surcharge=args.surcharge, coefficients=coefficients,
+                                 water=args.water)
+            ordering, force = result.ordering, result.force
+        print(f"{site},{len(layers)},{force:.4f},{' > '.join(str(layer.name) for layer in ordering)}")
+    if index is not None:
+        index.save(args.index)
+
+
+if __name__ == "__main__":
+    main()
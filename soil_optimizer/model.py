@@ -0,0 +1,133 @@
+import math
+
+import numpy as np
+
+GAMMA_W = 9.81  # Unit weight of water in kN/m³
+
+
+# ------------------- Soil Layer Class -------------------
+class SoilLayer:
+    def __init__(self, phi, gamma, thickness, name="Layer", cohesion=0.0):
+        self.phi = phi
+        self.gamma = gamma
+        self.thickness = thickness
+        self.name = name
+        self.cohesion = cohesion  # Effective cohesion c' in kPa
+
+    def ka(self, coefficients=None):
+        # Rankine by default, or K from a coefficient model (see coefficients.py)
+        if coefficients is not None:
+            return float(coefficients(self.phi))
+        return math.tan(math.radians(45 - self.phi/2))**2
+
+
+def rankine_ka(phi):
+    # Vectorized SoilLayer.ka() for an array of friction angles
+    return np.tan(np.radians(45 - np.asarray(phi, dtype=float) / 2))**2
+
+
+# ------------------- Pressure Calculation Functions -------------------
+def active_pressure(layer, ka, vertical_stress):
+    # σa = Ka·σv' - 2c'√Ka, with tension clipped to zero
+    return max(ka * vertical_stress - 2 * layer.cohesion * math.sqrt(ka), 0.0)
+
+def calculate_pressure_profile(layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+    gamma_w = GAMMA_W
+
+    # Create detailed pressure profile for plotting
+    depths = []
+    pressures = []
+
+    cumulative_depth = 0
+    cumulative_vertical_stress = surcharge  # A uniform surcharge q adds to σv' everywhere
+
+    for i, layer in enumerate(layers):
+        ka = layer.ka(coefficients)
+        layer_top = cumulative_depth
+        layer_bottom = cumulative_depth + layer.thickness
+
+        # Add point at the top of the layer
+        if i > 0 and len(depths) > 0:
+            # Add a point with the new Ka at the layer boundary
+            depths.append(layer_top)
+            pressures.append(active_pressure(layer, ka, cumulative_vertical_stress))
+        else:
+            depths.append(layer_top)
+            pressures.append(active_pressure(layer, ka, cumulative_vertical_stress))
+
+        # Calculate points within the layer
+        if gwt_depth is not None and layer_top < gwt_depth < layer_bottom:
+            # Layer intersects with GWT
+
+            # Points above GWT
+            z_above = np.linspace(layer_top, gwt_depth, 50)
+            for z in z_above:
+                local_depth = z - layer_top
+                vertical_stress = cumulative_vertical_stress + layer.gamma * local_depth
+                depths.append(z)
+                pressures.append(active_pressure(layer, ka, vertical_stress))
+
+            # Points below GWT
+            z_below = np.linspace(gwt_depth, layer_bottom, 50)
+            for z in z_below:
+                local_depth_above_gwt = gwt_depth - layer_top
+                local_depth_below_gwt = z - gwt_depth
+                vertical_stress = (cumulative_vertical_stress +
+                                  layer.gamma * local_depth_above_gwt +
+                                  (layer.gamma - gamma_w) * local_depth_below_gwt)
+                depths.append(z)
+                pressures.append(active_pressure(layer, ka, vertical_stress))
+        else:
+            # Layer doesn't intersect GWT
+            z_values = np.linspace(layer_top, layer_bottom, 100)
+            for z in z_values:
+                local_depth = z - layer_top
+                if gwt_depth is not None and z > gwt_depth:
+                    # Below GWT
+                    if layer_top >= gwt_depth:
+                        # Entire layer is below GWT
+                        vertical_stress = cumulative_vertical_stress + (layer.gamma - gamma_w) * local_depth
+                    else:
+                        # Should not reach here as this case is handled above
+                        pass
+                else:
+                    # Above GWT
+                    vertical_stress = cumulative_vertical_stress + layer.gamma * local_depth
+
+                depths.append(z)
+                pressures.append(active_pressure(layer, ka, vertical_stress))
+
+        # Update cumulative values for next layer
+        if gwt_depth is not None and layer_bottom > gwt_depth:
+            if layer_top >= gwt_depth:
+                # Entire layer is below GWT
+                cumulative_vertical_stress += (layer.gamma - gamma_w) * layer.thickness
+            else:
+                # Layer intersects GWT
+                above_gwt = gwt_depth - layer_top
+                below_gwt = layer_bottom - gwt_depth
+                cumulative_vertical_stress += (layer.gamma * above_gwt +
+                                             (layer.gamma - gamma_w) * below_gwt)
+        else:
+            cumulative_vertical_stress += layer.gamma * layer.thickness
+
+        cumulative_depth = layer_bottom
+
+    if water and gwt_depth is not None:
+        # Total lateral pressure: add the hydrostatic pressure below the GWT
+        pressures = [p + gamma_w * max(z - gwt_depth, 0) for z, p in zip(depths, pressures)]
+
+    return list(zip(depths, pressures))
+
+def total_force(layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+    pressure_profile = calculate_pressure_profile(layers, gwt_depth, surcharge, coefficients, water)
+    depths = [p[0] for p in pressure_profile]
+    pressures = [p[1] for p in pressure_profile]
+
+    force = 0
+    for i in range(len(depths) - 1):
+        h = depths[i+1] - depths[i]
+        avg_pressure = (pressures[i] + pressures[i+1]) / 2
+        force += avg_pressure * h
+
+    return force
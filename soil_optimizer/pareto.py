@@ -0,0 +1,150 @@
+import bisect
+import itertools
+
+import numpy as np
+
+from .dp import SubsetDP
+from .engine import ForceModel
+
+OBJECTIVES = ("moment", "height")
+
+
+# ------------------- Dominance Filtering -------------------
+class ParetoFront:
+    # Non-dominated (force, other) points, both minimized, kept as a staircase:
+    # forces ascending and the other objective strictly descending. Queries
+    # and insertions are a bisect plus removal of the points the new one beats.
+    def __init__(self):
+        self.forces = []
+        self.others = []
+        self.items = []
+
+    def __len__(self):
+        return len(self.forces)
+
+    def dominated(self, force, other):
+        i = bisect.bisect_right(self.forces, force)
+        return i > 0 and self.others[i - 1] <= other
+
+    def add(self, force, other, item=None):
+        if self.dominated(force, other):
+            return False
+        i = bisect.bisect_left(self.forces, force)
+        j = i
+        while j < len(self.others) and self.others[j] >= other:
+            j += 1
+        self.forces[i:j] = [force]
+        self.others[i:j] = [other]
+        self.items[i:j] = [item]
+        return True
+
+    def points(self):
+        return list(zip(self.forces, self.others, self.items))
+
+
+def pareto_mask(forces, others):
+    # Vectorized filter for a batch: sort by force (then other) and keep the
+    # points that improve on the best `other` seen so far
+    forces = np.asarray(forces)
+    others = np.asarray(others)
+    order = np.lexsort((others, forces))
+    sorted_others = others[order]
+    best_before = np.minimum.accumulate(np.concatenate(([np.inf], sorted_others[:-1])))
+    mask = np.zeros(len(forces), dtype=bool)
+    mask[order[sorted_others < best_before]] = True
+    return mask
+
+
+# ------------------- Pareto Search -------------------
+class ParetoPoint:
+    def __init__(self, ordering, force, moment, height):
+        self.ordering = ordering
+        self.force = force
+        self.moment = moment    # overturning moment about the wall base (kN·m/m)
+        self.height = height    # height of the resultant above the base (m)
+
+
+def _points(model, orders, forces, moments):
+    points = []
+    for order, f, m in zip(orders, forces, moments):
+        height = m / f if f else 0.0
+        points.append(ParetoPoint(model.layers_for(order), float(f), float(m), float(height)))
+    return sorted(points, key=lambda p: p.force)
+
+
+def _exhaustive_front(model, objective, constraints, chunk=4096):
+    if constraints is None:
+        perms = itertools.permutations(range(model.n))
+    else:
+        perms = constraints.orders()
+    front_orders = np.zeros((0, model.n), dtype=np.intp)
+    front_forces = np.zeros(0)
+    front_moments = np.zeros(0)
+    while True:
+        block = np.array(list(itertools.islice(perms, chunk)), dtype=np.intp).reshape(-1, model.n)
+        if len(block) == 0:
+            break
+        forces, moments = model.batch_forces_moments(block)
+        front_orders = np.concatenate([front_orders, block])
+        front_forces = np.concatenate([front_forces, forces])
+        front_moments = np.concatenate([front_moments, moments])
+        others = front_moments if objective == "moment" else front_moments / front_forces
+        keep = pareto_mask(front_forces, others)
+        front_orders, front_forces, front_moments = front_orders[keep], front_forces[keep], front_moments[keep]
+    return _points(model, front_orders.tolist(), front_forces, front_moments)
+
+
+def _dp_front(model, constraints):
+    # Multi-objective subset DP. Both the force and the base moment are sums
+    # of per-layer terms that only depend on the set above, so a label at a set
+    # that is dominated there stays dominated in every completion.
+    tables = SubsetDP(model, constraints)
+    height = model.height()
+    fronts = {0: ParetoFront()}
+    fronts[0].add(0.0, 0.0, ())
+    for c in range(model.n):
+        sources = np.array([s for s in tables.levels[c] if s in fronts], dtype=np.intp)
+        for i in range(model.n):
+            free = sources[(sources >> i) & 1 == 0]
+            if tables.constraints is not None:
+                free = free[tables.constraints.allowed_sources(free, i, c)]
+            if len(free) == 0:
+                continue
+            f, mz, _ = model.layer_forces_moments(i, tables.depth[free], tables.stress[free])
+            moments = height * f - mz
+            for s, df, dm in zip(free.tolist(), f.tolist(), moments.tolist()):
+                target = fronts.setdefault(s | 1 << i, ParetoFront())
+                for force, moment, prefix in fronts[s].points():
+                    target.add(force + df, moment + dm, prefix + (i,))
+        for s in sources.tolist():
+            del fronts[s]
+    full = fronts.get(tables.size - 1)
+    if full is None:
+        raise ValueError("The layer constraints cannot all be satisfied")
+    # Re-evaluate the survivors with the same single-pass engine as the batch path
+    orders = [item for _, _, item in full.points()]
+    forces, moments = model.batch_forces_moments(orders)
+    return _points(model, orders, forces, moments)
+
+
+def pareto_front(layers, gwt_depth, objective="moment", engine="auto", constraints=None, surcharge=0.0,
+                 coefficients=None, water=False):
+    # Orderings that are Pareto-optimal for (total force, overturning moment
+    # about the base) or (total force, height of the resultant). Both values
+    # come out of one pass over each ordering.
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {', '.join(OBJECTIVES)}")
+    model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+    constraints = None if constraints is None or constraints.empty else constraints
+    if constraints is not None:
+        constraints.first_feasible()
+    if engine == "auto":
+        engine = "dynamic_programming" if objective == "moment" else "exhaustive"
+    if engine == "dynamic_programming":
+        if objective != "moment":
+            raise ValueError("The resultant height is a ratio and cannot be built up set by set; "
+                             "use the exhaustive engine")
+        return _dp_front(model, constraints)
+    if engine == "exhaustive":
+        return _exhaustive_front(model, objective, constraints)
+    raise ValueError(f"Unknown Pareto engine '{engine}'")
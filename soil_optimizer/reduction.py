@@ -0,0 +1,112 @@
+import math
+
+import numpy as np
+
+from .coefficients import RANKINE, Rankine
+from .engine import ForceModel
+from .model import GAMMA_W, SoilLayer
+
+# Bisection steps for the φ that gives a composite its weighted K
+EQUIVALENT_PHI_STEPS = 60
+
+
+# ------------------- Sublayer Merging -------------------
+class ReducedProfile:
+    def __init__(self, layers, groups, error_bound):
+        self.layers = layers            # composite layers
+        self.groups = groups            # original indices behind each composite
+        self.error_bound = error_bound  # max |force error| of any arrangement, kN/m
+
+    def expand(self, ordering):
+        # Original sublayer indices for an ordering of the composite layers
+        index = {id(layer): k for k, layer in enumerate(self.layers)}
+        return [i for layer in ordering for i in self.groups[index[id(layer)]]]
+
+
+def _segments(phi, gamma, cohesive, phi_tol, gamma_tol):
+    # Greedy runs of adjacent sublayers whose φ and γ ranges stay within the
+    # tolerances (greedy gives the fewest runs for range limits like these).
+    # Cohesive sublayers are kept on their own: clipping their tension zones
+    # is not linear in Ka, which the error bound relies on.
+    groups = []
+    start = 0
+    lo_phi = hi_phi = phi[0]
+    lo_gamma = hi_gamma = gamma[0]
+    for i in range(1, len(phi)):
+        lo_phi, hi_phi = min(lo_phi, phi[i]), max(hi_phi, phi[i])
+        lo_gamma, hi_gamma = min(lo_gamma, gamma[i]), max(hi_gamma, gamma[i])
+        if (hi_phi - lo_phi > phi_tol or hi_gamma - lo_gamma > gamma_tol or
+                cohesive[i] or cohesive[i - 1]):
+            groups.append(list(range(start, i)))
+            start = i
+            lo_phi = hi_phi = phi[i]
+            lo_gamma = hi_gamma = gamma[i]
+    groups.append(list(range(start, len(phi))))
+    return groups
+
+
+def _composite_name(layers):
+    names = [str(layer.name) for layer in layers]
+    if len(set(names)) == 1:
+        return names[0] if len(names) == 1 else f"{names[0]} ({len(names)} sublayers)"
+    return f"{names[0]} … {names[-1]}"
+
+
+def _equivalent_phi(coefficients, ka, phi, k):
+    # φ whose K under `coefficients` is `ka`, the weighted K of a group with
+    # friction angles `phi` and coefficients `k`. ka lies between the
+    # smallest and largest k, so bisecting between their φ finds it whether
+    # or not K is monotonic in φ.
+    if isinstance(coefficients, Rankine):
+        return 90 - 2 * math.degrees(math.atan(math.sqrt(ka)))
+    lo, hi = float(phi[np.argmax(k)]), float(phi[np.argmin(k)])
+    for _ in range(EQUIVALENT_PHI_STEPS):
+        mid = 0.5 * (lo + hi)
+        if float(coefficients.compute(np.array([mid]))[0]) > ka:
+            lo = mid
+        else:
+            hi = mid
+    return 0.5 * (lo + hi)
+
+
+def reduce_layers(layers, gwt_depth, phi_tol=1.0, gamma_tol=0.5, surcharge=0.0, coefficients=None, water=False):
+    # Merge runs of similar adjacent sublayers (e.g. from a CPT log) into
+    # composite layers. A composite keeps the total thickness, the
+    # thickness-weighted γ (so every stress below it is unchanged) and the
+    # thickness-weighted K of the coefficient model in use (so the stress
+    # acting on its top carries exactly the same force); its φ is the one
+    # giving that K. What is left is the pressure from the weight inside
+    # the group, bounded per group as:
+    #   |dry self-weight force difference|  +  γw·H·Σ h_i·|K_i − K|  (with a GWT)
+    # and summed over groups: no arrangement of the composite layers is off
+    # by more than that from the same arrangement of the original sublayers.
+    # A surcharge only adds to the stress on each group's top and the water
+    # thrust does not depend on the arrangement, so neither changes the bound.
+    layers = list(layers)
+    if not layers:
+        return ReducedProfile([], [], 0.0)
+    coefficients = RANKINE if coefficients is None else coefficients
+    model = ForceModel(layers, None, coefficients=coefficients)
+    phi = np.array([layer.phi for layer in layers], dtype=float)
+    groups = _segments(phi, model.gamma, model.cohesion > 0, phi_tol, gamma_tol)
+
+    composites = []
+    error_bound = 0.0
+    for group in groups:
+        if len(group) == 1:
+            composites.append(layers[group[0]])
+            continue
+        h = model.thickness[group]
+        thickness = float(h.sum())
+        gamma = float((model.gamma[group] * h).sum() / thickness)
+        ka = float((model.ka[group] * h).sum() / thickness)
+        composites.append(SoilLayer(_equivalent_phi(coefficients, ka, phi[group], model.ka[group]), gamma,
+                                    thickness, _composite_name([layers[i] for i in group])))
+
+        dry_self_weight = model.force(group)
+        error = abs(dry_self_weight - 0.5 * ka * gamma * thickness * thickness)
+        if gwt_depth is not None:
+            error += GAMMA_W * thickness * float((h * np.abs(model.ka[group] - ka)).sum())
+        error_bound += error
+
+    return ReducedProfile(composites, groups, error_bound)
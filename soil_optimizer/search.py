@@ -0,0 +1,415 @@
+import itertools
+import math
+import time
+
+import numpy as np
+
+from .dp import DP_MAX_LAYERS, DiskSubsetDP, SubsetDP
+from .engine import ForceModel
+from .model import GAMMA_W
+
+# How many orderings / tree nodes to process between progress reports and
+# deadline or cancel checks
+PROGRESS_INTERVAL = 512
+# Relative tolerance used when comparing bounds against the incumbent
+BOUND_TOL = 1e-9
+
+ENGINES = ("auto", "dynamic_programming", "branch_and_bound", "exhaustive", "local")
+
+
+# ------------------- Search Results -------------------
+class SearchStats:
+    def __init__(self, engine, total):
+        self.engine = engine
+        self.total = total        # size of the search space (n!)
+        self.evaluated = 0        # complete orderings evaluated
+        self.nodes = 0            # partial orderings expanded
+        self.covered = 0          # orderings evaluated or ruled out by a bound
+        self.lower_bound = None
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def fraction(self):
+        return min(self.covered / self.total, 1.0) if self.total else 1.0
+
+
+class SearchResult:
+    def __init__(self, ordering, force, lower_bound, interrupted, stats):
+        self.ordering = ordering
+        self.force = force
+        self.lower_bound = lower_bound
+        self.interrupted = interrupted
+        self.stats = stats
+
+    @property
+    def gap(self):
+        # Relative optimality gap, None when the engine has no bound
+        if self.lower_bound is None or self.force is None:
+            return None
+        if self.force == 0:
+            return 0.0
+        return max(self.force - self.lower_bound, 0.0) / abs(self.force)
+
+    @property
+    def optimal(self):
+        return self.gap is not None and self.gap <= BOUND_TOL
+
+
+class Search:
+    # Bookkeeping shared by the engines here and by searches built on them
+    # elsewhere (staged excavation, the material catalog): the incumbent
+    # (best_order, best_force), SearchStats, the deadline / cancel checks and
+    # the callbacks documented at search_layers. A search offers every
+    # complete ordering it evaluates, calls should_stop every
+    # PROGRESS_INTERVAL steps and ends with result(lower bound). `engine` is
+    # the name reported in the stats and `total` the size of the search
+    # space (n! by default).
+    def __init__(self, model, engine, deadline=None, on_improvement=None, progress=None, cancel=None,
+                 constraints=None, total=None, initial=None):
+        self.model = model
+        self.initial = None if initial is None else [int(i) for i in initial]
+        self.constraints = None if constraints is None or constraints.empty else constraints
+        self.stats = SearchStats(engine, math.factorial(model.n) if total is None else total)
+        self.stop_at = None if deadline is None else self.stats.started + deadline
+        self.on_improvement = on_improvement
+        self.progress = progress
+        self.cancel = cancel
+        self.best_order = None
+        self.best_force = None
+        self.interrupted = False
+
+    def offer(self, order, force):
+        if self.best_force is None or force < self.best_force:
+            self.best_order = tuple(order)
+            self.best_force = force
+            if self.on_improvement is not None:
+                self.on_improvement(self.model.layers_for(self.best_order), force, self.stats)
+            return True
+        return False
+
+    def seed(self, relax):
+        # Starting incumbent: the relaxed sort, or the first feasible ordering
+        # closest to it when there are constraints
+        if self.constraints is None:
+            return relax.order
+        return self.constraints.first_feasible(relax.order)
+
+    def feasible(self, order):
+        return self.constraints is None or self.constraints.is_feasible(order)
+
+    def warm_start(self):
+        # A known good ordering (e.g. from a similar solved site) as an
+        # incumbent, so bounds prune against it from the start
+        if self.initial is not None and self.feasible(self.initial):
+            self.offer(self.initial, self.model.force(self.initial))
+
+    def should_stop(self):
+        if self.progress is not None:
+            self.progress(self.stats)
+        if self.cancel is not None and self.cancel.is_set():
+            self.interrupted = True
+        elif self.stop_at is not None and time.monotonic() >= self.stop_at:
+            self.interrupted = True
+        return self.interrupted
+
+    def result(self, lower_bound):
+        self.stats.lower_bound = lower_bound
+        if self.progress is not None:
+            self.progress(self.stats)
+        ordering = None if self.best_order is None else self.model.layers_for(self.best_order)
+        return SearchResult(ordering, self.best_force, lower_bound, self.interrupted, self.stats)
+
+
+# ------------------- Lower Bounds -------------------
+# With one unit weight per layer the force is Σ Ka_i·h_i·(stress above layer i)
+# plus a constant, a single-machine weighted completion time problem: sorting
+# by γ/Ka (Smith's rule) is optimal, so without a GWT the sort is the exact
+# optimum. Under a GWT two relaxations are combined:
+#   - submerged unit weight everywhere can only lower the stresses;
+#   - effective stress = total stress - pore pressure, where the total-stress
+#     part is again solved by Smith's rule and the Ka-weighted pore pressure
+#     part is largest with Ka ascending downwards (pore pressure only grows
+#     with depth).
+class RelaxedBound:
+    def __init__(self, model):
+        self.model = model
+        ka = model._ka
+        gamma = model._gamma
+        self.gwt = model._gwt
+        self.height = model.height()
+        self.water = model.water
+        # Clipped cohesive pressure is at least Ka·σv' - 2c'√Ka, so the
+        # cohesionless bound less Σ 2c'√Ka·h over the remaining layers (and
+        # at least zero) stays a lower bound
+        self.cohesion = [2 * c * math.sqrt(k) * h for c, k, h in
+                         zip(model.cohesion.tolist(), ka, model._thickness)] if model.cohesive else None
+        self.dry_order = sorted(range(model.n), key=lambda i: gamma[i] / ka[i])
+        if model.gwt_depth is None:
+            self.wet_order = None
+            self.order = self.dry_order
+        else:
+            self.submerged = [g - GAMMA_W for g in gamma]
+            self.wet_order = sorted(range(model.n), key=lambda i: self.submerged[i] / ka[i])
+            self.ka_order = sorted(range(model.n), key=lambda i: ka[i])
+            self.order = self.wet_order
+
+    def _smith(self, order, weight, remaining, stress):
+        h = self.model._thickness
+        ka = self.model._ka
+        total = 0.0
+        for i in order:
+            if i in remaining:
+                w = weight[i]
+                total += ka[i] * (stress * h[i] + 0.5 * w * h[i] * h[i])
+                stress += w * h[i]
+        return total
+
+    def _pore_pressure(self, remaining, depth):
+        # Largest possible Σ Ka_i·∫u dz over the remaining layers
+        h = self.model._thickness
+        ka = self.model._ka
+        total = 0.0
+        below_top = max(depth - self.gwt, 0.0)
+        for i in self.ka_order:
+            if i in remaining:
+                depth += h[i]
+                below_bottom = max(depth - self.gwt, 0.0)
+                total += ka[i] * 0.5 * GAMMA_W * (below_bottom * below_bottom - below_top * below_top)
+                below_top = below_bottom
+        return total
+
+    def bound(self, remaining, stress, depth=0.0):
+        # Minimum force the `remaining` layers can add below `depth`, where the
+        # vertical effective stress is `stress`
+        if self.wet_order is None:
+            bound = self._smith(self.dry_order, self.model._gamma, remaining, stress)
+        else:
+            submerged = self._smith(self.wet_order, self.submerged, remaining, stress)
+            total_stress = stress + GAMMA_W * max(depth - self.gwt, 0.0)
+            split = (self._smith(self.dry_order, self.model._gamma, remaining, total_stress) -
+                     self._pore_pressure(remaining, depth))
+            bound = max(submerged, split)
+        if self.cohesion is not None:
+            bound = max(bound - sum(self.cohesion[i] for i in remaining), 0.0)
+        if self.water:
+            # The remaining layers fill the wall down to its base, whatever their order
+            top = max(depth - self.gwt, 0.0)
+            base = max(self.height - self.gwt, 0.0)
+            bound += 0.5 * GAMMA_W * (base * base - top * top)
+        return bound
+
+
+# ------------------- Search Engines -------------------
+def _exhaustive(search, chunk=4096):
+    model = search.model
+    search.warm_start()
+    # Ties go to the first ordering visited (the lowest lexicographic rank,
+    # as in the shards module), so a warm-start incumbent gives way to the
+    # first ordering at least as good
+    warm = search.best_order
+    if search.constraints is None:
+        perms = itertools.permutations(range(model.n))
+    else:
+        perms = search.constraints.orders()
+    while True:
+        block = np.array(list(itertools.islice(perms, chunk)), dtype=np.intp)
+        if block.size == 0:
+            break
+        forces = model.batch_forces(block)
+        k = int(np.argmin(forces))
+        if warm is not None and forces[k] <= search.best_force:
+            search.best_force = warm = None
+        search.offer(block[k].tolist(), float(forces[k]))
+        search.stats.evaluated += len(block)
+        search.stats.covered += len(block)
+        if search.should_stop():
+            return RelaxedBound(model).bound(set(range(model.n)), model.surcharge)
+    search.stats.covered = search.stats.total
+    return search.best_force
+
+
+def branch_and_bound(search, relax=None):
+    # Depth-first branch and bound over the orderings of search.model; the
+    # best ordering is left on `search` and a lower bound is returned.
+    # `relax` is RelaxedBound(search.model) by default; any object with an
+    # `order` (the first incumbent) and bound(remaining, stress, depth) that
+    # never overestimates the force the remaining layers add will do.
+    model = search.model
+    relax = RelaxedBound(model) if relax is None else relax
+    stats = search.stats
+    n = model.n
+
+    # The relaxed sort is usually a very good first incumbent
+    seed = search.seed(relax)
+    search.offer(seed, model.force(seed))
+    search.warm_start()
+
+    everything = frozenset(range(n))
+    root_bound = relax.bound(everything, model.surcharge)
+    # Depth-first with an explicit stack:
+    # (bound, prefix, remaining, placed mask, depth, stress, force)
+    stack = [(root_bound, (), everything, 0, 0.0, model.surcharge, 0.0)]
+    while stack:
+        if stats.nodes % PROGRESS_INTERVAL == 0 and stats.nodes and search.should_stop():
+            return min([search.best_force] + [node[0] for node in stack])
+
+        bound, prefix, remaining, mask, depth, stress, force = stack.pop()
+        stats.nodes += 1
+        if bound >= search.best_force - BOUND_TOL * abs(search.best_force):
+            stats.covered += math.factorial(len(remaining))
+            continue
+
+        children = []
+        for i in remaining:
+            if search.constraints is not None and not search.constraints.allowed(mask, i):
+                stats.covered += math.factorial(len(remaining) - 1)
+                continue
+            f, child_stress = model.layer_force(i, depth, stress)
+            child_prefix = prefix + (i,)
+            child_remaining = remaining - {i}
+            if not child_remaining:
+                stats.evaluated += 1
+                stats.covered += 1
+                search.offer(child_prefix, force + f)
+                continue
+            child_depth = depth + model._thickness[i]
+            child_bound = force + f + relax.bound(child_remaining, child_stress, child_depth)
+            children.append((child_bound, child_prefix, child_remaining, mask | 1 << i,
+                             child_depth, child_stress, force + f))
+
+        # Most promising child on top of the stack
+        children.sort(key=lambda node: node[0], reverse=True)
+        stack.extend(children)
+
+    return search.best_force
+
+
+def _dynamic_programming(search):
+    model = search.model
+    relax = RelaxedBound(model)
+    seed = search.seed(relax)
+    search.offer(seed, model.force(seed))
+    search.warm_start()
+
+    if model.n > DP_MAX_LAYERS:
+        return _disk_dynamic_programming(search, relax)
+    dp = SubsetDP(model, search.constraints)
+    if not dp.solve(should_stop=search.should_stop):
+        return relax.bound(set(range(model.n)), model.surcharge)
+
+    order = dp.best_order()
+    search.stats.nodes = dp.size
+    search.stats.evaluated += 1
+    search.stats.covered = search.stats.total
+    search.offer(order, model.force(order))
+    return search.best_force
+
+
+def _disk_dynamic_programming(search, relax):
+    # Beyond DP_MAX_LAYERS the tables live in temporary files
+    model = search.model
+    if search.constraints is not None:
+        raise ValueError(f"Placement constraints need at most {DP_MAX_LAYERS} layers with dynamic programming")
+    stats = search.stats
+
+    def progress(done, size):
+        stats.nodes = done
+        stats.covered = stats.total * done // size
+
+    with DiskSubsetDP(model) as dp:
+        if not dp.solve(should_stop=search.should_stop, progress=progress):
+            return relax.bound(set(range(model.n)), model.surcharge)
+        order = dp.best_order()
+    stats.evaluated += 1
+    stats.covered = stats.total
+    search.offer(order, model.force(order))
+    return search.best_force
+
+
+def _local(search):
+    # Insertion-move hill climbing from the relaxed sort (or a given ordering)
+    model = search.model
+    relax = RelaxedBound(model)
+    lower_bound = relax.bound(set(range(model.n)), model.surcharge)
+
+    initial = search.initial
+    order = list(initial) if initial is not None and search.feasible(initial) else search.seed(relax)
+    search.offer(order, model.force(order))
+    if search.feasible(range(model.n)):
+        search.offer(range(model.n), model.force(range(model.n)))
+    order = list(search.best_order)
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(model.n):
+            for j in range(model.n):
+                if i == j:
+                    continue
+                candidate = order[:i] + order[i + 1:]
+                candidate.insert(j, order[i])
+                if not search.feasible(candidate):
+                    continue
+                search.stats.evaluated += 1
+                if search.offer(candidate, model.force(candidate)):
+                    order = candidate
+                    improved = True
+                if search.stats.evaluated % PROGRESS_INTERVAL == 0 and search.should_stop():
+                    return lower_bound
+    return lower_bound
+
+
+def search_layers(layers, gwt_depth, engine="auto", deadline=None,
+                  on_improvement=None, progress=None, cancel=None, initial=None,
+                  constraints=None, surcharge=0.0, coefficients=None, water=False):
+    # Anytime search for the ordering with the least total force.
+    #   deadline        -- wall-clock budget in seconds; the best ordering found
+    #                      so far is returned when it runs out
+    #   on_improvement  -- on_improvement(ordering, force, stats) for every new
+    #                      incumbent
+    #   progress        -- progress(stats), called periodically
+    #   cancel          -- threading.Event-like; setting it interrupts the search
+    #   initial         -- known good ordering (indices into `layers`), e.g.
+    #                      from a similar solved site: the first incumbent of
+    #                      every engine and the starting point of "local"
+    #   constraints     -- LayerConstraints (pinned positions, precedences,
+    #                      blocks); infeasible moves are never explored
+    #   surcharge       -- uniform surcharge q on the backfill surface, kPa
+    #   coefficients    -- earth-pressure coefficient model (Rankine if None)
+    #   water           -- rank by total thrust, adding the hydrostatic
+    #                      pressure below the GWT
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown search engine '{engine}', expected one of {', '.join(ENGINES)}")
+    if engine == "auto":
+        engine = "dynamic_programming" if len(layers) <= DP_MAX_LAYERS else "branch_and_bound"
+
+    model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+    if constraints is not None and constraints.n != model.n:
+        raise ValueError(f"Constraints are for {constraints.n} layers, got {model.n}")
+    if initial is not None and sorted(initial) != list(range(model.n)):
+        raise ValueError(f"The initial ordering must list each of the {model.n} layers once")
+    search = Search(model, engine, deadline, on_improvement, progress, cancel, constraints, initial=initial)
+    if search.constraints is not None:
+        search.constraints.first_feasible()
+    if model.n == 0:
+        search.offer((), 0.0)
+        return search.result(0.0)
+
+    if engine == "dynamic_programming":
+        lower_bound = _dynamic_programming(search)
+    elif engine == "exhaustive":
+        lower_bound = _exhaustive(search)
+    elif engine == "branch_and_bound":
+        lower_bound = branch_and_bound(search)
+    else:
+        lower_bound = _local(search)
+    return search.result(lower_bound)
+
+
+# ------------------- Layer Order Optimization -------------------
+def optimize_layers(layers, gwt_depth, **options):
+    result = search_layers(layers, gwt_depth, **options)
+    return result.ordering, result.force
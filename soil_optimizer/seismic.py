@@ -0,0 +1,164 @@
+import argparse
+
+import numpy as np
+
+from .coefficients import mononobe_okabe
+from .dp import DP_MAX_LAYERS, SubsetDP
+from .engine import ForceModel
+from .loader import load_layers
+from .search import Search, branch_and_bound
+
+
+# ------------------- Scenario Coefficients -------------------
+def scenario_coefficients(phi, kh, kv, delta=0.0, batter=0.0, beta=0.0, delta_ratio=None):
+    # Mononobe-Okabe coefficients of every layer under every (kh, kv) pair of
+    # the grid, as a (len(kh)·len(kv), n) array in one broadcast: scenario
+    # s = a·len(kv) + b is (kh[a], kv[b])
+    phi = np.asarray(phi, dtype=float)
+    kh, kv = np.meshgrid(np.asarray(kh, dtype=float), np.asarray(kv, dtype=float), indexing="ij")
+    delta = phi * delta_ratio if delta_ratio is not None else delta
+    return mononobe_okabe(phi[None, :], kh.reshape(-1, 1), kv.reshape(-1, 1), delta, batter, beta)
+
+
+# ------------------- Scenario Grid -------------------
+class SeismicScenarios:
+    # One layer set under a grid of horizontal (kh) and vertical (kv) seismic
+    # coefficients. The coefficient table is built once for all scenarios;
+    # each scenario is a ForceModel over the same layers with its own row.
+    def __init__(self, layers, gwt_depth, kh, kv=(0.0,), delta=0.0, batter=0.0, beta=0.0, delta_ratio=None,
+                 surcharge=0.0, water=False):
+        self.layers = list(layers)
+        self.gwt_depth = gwt_depth
+        self.kh = np.asarray(kh, dtype=float)
+        self.kv = np.asarray(kv, dtype=float)
+        self.n = len(self.layers)
+        self.wall = (delta, batter, beta, delta_ratio)
+        self.coefficients = scenario_coefficients([layer.phi for layer in self.layers], self.kh, self.kv, *self.wall)
+        self.base = ForceModel(self.layers, gwt_depth, surcharge, water=water)
+
+    @property
+    def shape(self):
+        return len(self.kh), len(self.kv)
+
+    def model(self, s=None):
+        # Scenario s, or the static case (kh = kv = 0) for the same wall if None
+        if s is None:
+            coefficients = scenario_coefficients([layer.phi for layer in self.layers], [0.0], [0.0], *self.wall)[0]
+        else:
+            coefficients = self.coefficients[s]
+        return ForceModel.from_arrays(self.base.gamma, self.base.thickness, coefficients, self.gwt_depth,
+                                      self.layers, self.base.cohesion, self.base.surcharge, water=self.base.water)
+
+    def forces(self, orders):
+        # Forces of an (m, n) array of orderings under every scenario, (m, S).
+        # Without cohesion the force is linear in the coefficients, so the
+        # stress integral of every layer in every ordering is found once and
+        # all scenarios follow from one matrix product.
+        orders = np.asarray(orders, dtype=np.intp).reshape(-1, self.n)
+        if self.base.cohesive:
+            return np.column_stack([self.model(s).batch_forces(orders) for s in range(len(self.coefficients))])
+        unit = ForceModel.from_arrays(self.base.gamma, self.base.thickness, np.ones(self.n), self.gwt_depth,
+                                      surcharge=self.base.surcharge)
+        integrals = np.zeros((len(orders), self.n))
+        rows = np.arange(len(orders))
+        depth = np.zeros(len(orders))
+        stress = np.full(len(orders), self.base.surcharge)
+        for p in range(self.n):
+            idx = orders[:, p]
+            integrals[rows, idx], stress = unit.layer_forces(idx, depth, stress)
+            depth += self.base.thickness[idx]
+        water = self.base.water_thrust()[0] if self.base.water and self.gwt_depth is not None else 0.0
+        return integrals @ self.coefficients.T + water
+
+    def optimize(self):
+        # Least-force ordering of every scenario. Scenarios with the same
+        # coefficient row (e.g. a repeated grid value) are solved once.
+        _, first, inverse = np.unique(self.coefficients, axis=0, return_index=True, return_inverse=True)
+        orders = np.zeros((len(first), self.n), dtype=np.intp)
+        for k, s in enumerate(first.tolist()):
+            orders[k] = _least_force_order(self.model(s))
+        return ScenarioOptimum(self, orders[inverse.ravel()])
+
+    def static_order(self):
+        # Optimal ordering without seismic loading, whether or not the grid
+        # contains kh = kv = 0
+        return _least_force_order(self.model())
+
+
+def _least_force_order(model):
+    if model.n <= DP_MAX_LAYERS:
+        dp = SubsetDP(model)
+        dp.solve()
+        return dp.best_order()
+    search = Search(model, "branch_and_bound")
+    branch_and_bound(search)
+    return list(search.best_order)
+
+
+class ScenarioOptimum:
+    # Optimal ordering of every scenario, the distinct orderings among them and
+    # every distinct ordering evaluated under every scenario
+    def __init__(self, scenarios, orders):
+        self.scenarios = scenarios
+        self.orders = orders
+        self.distinct, first, labels = np.unique(orders, axis=0, return_index=True, return_inverse=True)
+        # Number the distinct orderings in the order they first appear on the grid
+        rank = np.argsort(np.argsort(first))
+        self.distinct = self.distinct[np.argsort(first)]
+        self.labels = rank[labels.ravel()]
+        self.cross = scenarios.forces(self.distinct)
+        self.forces = self.cross[self.labels, np.arange(len(self.labels))]
+
+    def regions(self):
+        # (len(kh), len(kv)) grid of indices into `distinct`
+        return self.labels.reshape(self.scenarios.shape)
+
+    def regret(self, order):
+        # Extra force of one fixed ordering over each scenario's optimum
+        return self.scenarios.forces([order])[0] - self.forces
+
+    def switches(self):
+        # (kv, kh before, kh after, ordering before, ordering after) wherever
+        # the optimal ordering changes as kh grows at constant kv
+        regions = self.regions()
+        changes = []
+        for b, kv in enumerate(self.scenarios.kv.tolist()):
+            for a in range(1, len(self.scenarios.kh)):
+                if regions[a, b] != regions[a - 1, b]:
+                    changes.append((kv, float(self.scenarios.kh[a - 1]), float(self.scenarios.kh[a]),
+                                    int(regions[a - 1, b]), int(regions[a, b])))
+        return changes
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.seismic",
+                                     description="Optimal layer orderings over a grid of Mononobe-Okabe seismic "
+                                                 "coefficients")
+    parser.add_argument("csv")
+    parser.add_argument("--kh", type=float, nargs="+", required=True, help="horizontal seismic coefficients")
+    parser.add_argument("--kv", type=float, nargs="+", default=[0.0], help="vertical seismic coefficients (up)")
+    parser.add_argument("--gwt", type=float)
+    parser.add_argument("--surcharge", type=float, default=0.0)
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    parser.add_argument("--delta", type=float, default=0.0, help="wall friction δ (degrees)")
+    parser.add_argument("--delta-ratio", type=float, help="wall friction as a fraction of φ")
+    parser.add_argument("--batter", type=float, default=0.0, help="wall batter from vertical (degrees)")
+    parser.add_argument("--beta", type=float, default=0.0, help="backfill slope β (degrees)")
+    args = parser.parse_args(argv)
+
+    layers = load_layers(args.csv, args.gwt)
+    scenarios = SeismicScenarios(layers, args.gwt, args.kh, args.kv, args.delta, args.batter, args.beta,
+                                 args.delta_ratio, args.surcharge, args.water)
+    optimum = scenarios.optimize()
+    for k, order in enumerate(optimum.distinct):
+        print(f"ordering {k}: {' > '.join(str(layers[i].name) for i in order)}")
+    print("kh,kv,force,ordering")
+    for s, (a, b) in enumerate(np.ndindex(*scenarios.shape)):
+        print(f"{scenarios.kh[a]:g},{scenarios.kv[b]:g},{optimum.forces[s]:.4f},{optimum.labels[s]}")
+    for kv, before, after, old, new in optimum.switches():
+        print(f"kv = {kv:g}: the optimum changes from ordering {old} to {new} between kh = {before:g} and {after:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+
+import numpy as np
+
+from .coefficients import add_coefficient_arguments, coefficients_from_args
+from .engine import ForceModel, _clipped_segments, _crossing
+from .loader import load_layers
+from .model import GAMMA_W
+
+# Default variations for the tornado chart: φ and γ by absolute amounts, h as
+# a fraction of each thickness, c' in kPa and the GWT in metres
+SWINGS = {"phi": 2.0, "gamma": 1.0, "thickness": 0.1, "cohesion": 5.0, "gwt": 0.5}
+
+
+# ------------------- Force Gradient -------------------
+class ForceGradient:
+    # Total force of one ordering and its derivatives. Per-layer arrays are
+    # indexed like the layer list, not by position in the ordering; `gwt` is
+    # None without a groundwater table.
+    def __init__(self, force, phi, gamma, thickness, cohesion, gwt, surcharge):
+        self.force = force
+        self.phi = phi              # ∂F/∂φ per degree
+        self.gamma = gamma          # ∂F/∂γ
+        self.thickness = thickness  # ∂F/∂h
+        self.cohesion = cohesion    # ∂F/∂c'
+        self.gwt = gwt              # ∂F/∂zw
+        self.surcharge = surcharge  # ∂F/∂q
+
+    def swings(self, layers, phi=SWINGS["phi"], gamma=SWINGS["gamma"], thickness=SWINGS["thickness"],
+               cohesion=SWINGS["cohesion"], gwt=SWINGS["gwt"]):
+        # First-order change of the force for the given variation of every
+        # input, as (label, change) pairs with the largest change first.
+        # Cohesion only appears for cohesive layers.
+        rows = []
+        for k, layer in enumerate(layers):
+            rows.append((f"φ {layer.name} ±{phi:g}°", self.phi[k] * phi))
+            rows.append((f"γ {layer.name} ±{gamma:g} kN/m³", self.gamma[k] * gamma))
+            rows.append((f"h {layer.name} ±{thickness:.0%}", self.thickness[k] * thickness * layer.thickness))
+            if layer.cohesion > 0:
+                rows.append((f"c' {layer.name} ±{cohesion:g} kPa", self.cohesion[k] * cohesion))
+        if self.gwt is not None:
+            rows.append((f"GWT ±{gwt:g} m", self.gwt * gwt))
+        rows = [(label, float(change)) for label, change in rows]
+        return sorted(rows, key=lambda row: abs(row[1]), reverse=True)
+
+
+def _active(a, b, z0, length):
+    # Part of a segment where the net stress a → b is positive: (top, bottom)
+    zc = _crossing(a, b, z0, length)
+    return np.where(a >= 0, z0, zc), np.where(b >= 0, z0 + length, zc)
+
+
+def force_gradient(model, order=None):
+    # Force of `order` and its gradient with respect to every input, in one
+    # O(n) pass. σa = max(K·σv' − 2c'√K, 0) and a change of any input moves
+    # σv' linearly below the layer it belongs to, so each derivative is a sum
+    # of per-layer integrals over the compressed (σa > 0) parts:
+    #   ∂F/∂K_p  = ∫_p (σv' − c'/√K) dz
+    #   ∂F/∂γ_p  = K_p·∫_p (z − z_p) dz + h_p·Σ_{q below p} K_q·L_q
+    #   ∂F/∂h_p  = σa at the bottom of p + Σ_{q below p} K_q·(γ_p·L_q − γw·W_q)
+    #              (+ γw times the submerged height below p with water)
+    #   ∂F/∂zw   = γw·Σ K_q·W_q for zw > 0 (− γw·(H − zw) with water)
+    # with L_q the compressed length of layer q and W_q its part below the
+    # GWT. ∂F/∂φ follows from ∂F/∂K and the coefficient model's dK/dφ.
+    idx = np.arange(model.n) if order is None else np.asarray(order, dtype=np.intp)
+    h = model.thickness[idx]
+    g = model.gamma[idx]
+    k = model.ka[idx]
+    t = model.cutoff[idx]
+    gwt = model._gwt
+
+    bottom = np.cumsum(h)
+    top = bottom - h
+    height = float(bottom[-1]) if len(bottom) else 0.0
+    above = np.minimum(np.maximum(gwt - top, 0.0), h)
+    below = h - above
+    increment = g * above + (g - GAMMA_W) * below
+    stress_bottom = model.surcharge + np.cumsum(increment)
+    stress_top = stress_bottom - increment
+    stress_gwt = stress_top + g * above
+
+    # Above and below the GWT within each layer the stress is linear
+    segments = [(stress_top - t, stress_gwt - t, top, above),
+                (stress_gwt - t, stress_bottom - t, top + above, below)]
+    net = 0.0
+    moment = 0.0
+    lengths = []
+    for a, b, z0, length in segments:
+        u, v = _active(a, b, z0, length)
+        net = net + _clipped_segments(a, b, z0, length)[0]
+        moment = moment + 0.5 * (v * v - u * u) - top * (v - u)
+        lengths.append(v - u)
+    compressed = lengths[0] + lengths[1]
+    wet = lengths[1]
+
+    # Σ over the layers below each position
+    after_compressed = np.sum(k * compressed) - np.cumsum(k * compressed)
+    after_wet = np.sum(k * wet) - np.cumsum(k * wet)
+
+    d_ka = net + 0.5 * t * compressed
+    d_gamma = k * moment + h * after_compressed
+    d_thickness = k * np.maximum(stress_bottom - t, 0.0) + g * after_compressed - GAMMA_W * after_wet
+    d_cohesion = -2 * np.sqrt(k) * compressed
+    # A GWT above the surface leaves the effective stresses as they are at zw = 0
+    d_gwt = None if model.gwt_depth is None else GAMMA_W * float(np.sum(k * wet)) * (gwt > 0)
+    if model.water and model.gwt_depth is not None:
+        d_thickness = d_thickness + GAMMA_W * (np.maximum(bottom - gwt, 0.0) +
+                                               np.maximum(height - np.maximum(bottom, gwt), 0.0))
+        d_gwt -= GAMMA_W * max(height - max(gwt, 0.0), 0.0)
+
+    phi = np.array([model.layers[i].phi for i in idx.tolist()], dtype=float)
+    d_phi = d_ka * model.coefficients.derivative(phi)
+
+    def by_layer(values):
+        out = np.zeros(model.n)
+        out[idx] = values
+        return out
+
+    return ForceGradient(model.force(idx.tolist()), by_layer(d_phi), by_layer(d_gamma), by_layer(d_thickness),
+                         by_layer(d_cohesion), d_gwt, float(np.sum(k * compressed)))
+
+
+def _active_area(a, b, length):
+    # _clipped_area and the length over which s > 0
+    if a >= 0.0 and b >= 0.0:
+        return 0.5 * (a + b) * length, length
+    if a <= 0.0 and b <= 0.0:
+        return 0.0, 0.0
+    part = max(a, b) / abs(a - b) * length
+    return 0.5 * max(a, b) * part, part
+
+
+def thickness_gradient(model, order, thickness):
+    # Force of `order` with the layer at position p given thickness[p]
+    # instead of its own, and ∂F/∂h by position (as in force_gradient), for
+    # the thickness allocation's inner loop (allocation.py). A scalar pass
+    # over the model's lists like ForceModel.layer_force: for the few layers
+    # of a wall it is far cheaper than the array version.
+    gwt = model._gwt
+    gamma, ka, cutoff = model._gamma, model._ka, model._cutoff
+    order = np.asarray(order, dtype=np.intp).tolist()
+    h = np.asarray(thickness, dtype=float).tolist()
+    force = 0.0
+    depth = 0.0
+    stress = model.surcharge
+    pressure = []   # σa at the bottom of each position
+    compressed = []
+    wet = []
+    for p, i in enumerate(order):
+        g, k, t = gamma[i], ka[i], cutoff[i]
+        above = min(max(gwt - depth, 0.0), h[p])
+        below = h[p] - above
+        stress_gwt = stress + g * above
+        bottom = stress_gwt + (g - GAMMA_W) * below
+        dry_area, dry = _active_area(stress - t, stress_gwt - t, above)
+        wet_area, wet_part = _active_area(stress_gwt - t, bottom - t, below)
+        force += k * (dry_area + wet_area)
+        pressure.append(k * max(bottom - t, 0.0))
+        compressed.append(k * (dry + wet_part))
+        wet.append(k * wet_part)
+        depth += h[p]
+        stress = bottom
+
+    gradient = [0.0] * len(h)
+    after_compressed = 0.0
+    after_wet = 0.0
+    for p in range(len(h) - 1, -1, -1):
+        gradient[p] = pressure[p] + gamma[order[p]] * after_compressed - GAMMA_W * after_wet
+        after_compressed += compressed[p]
+        after_wet += wet[p]
+    gradient = np.array(gradient)
+    if model.water and model.gwt_depth is not None:
+        # γw·(z − zw) over the wall below the GWT (or below the surface)
+        top = min(max(gwt, 0.0), depth)
+        force += 0.5 * GAMMA_W * ((depth - gwt) ** 2 - (top - gwt) ** 2)
+        bottoms = np.cumsum(h)
+        gradient += GAMMA_W * (np.maximum(bottoms - gwt, 0.0) + np.maximum(depth - np.maximum(bottoms, gwt), 0.0))
+    return force, gradient
+
+
+def layer_gradient(layers, gwt_depth, order=None, surcharge=0.0, coefficients=None, water=False):
+    return force_gradient(ForceModel(layers, gwt_depth, surcharge, coefficients, water), order)
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.sensitivity",
+                                     description="Derivatives of the total force with respect to every layer "
+                                                 "parameter and the GWT depth")
+    parser.add_argument("csv")
+    parser.add_argument("--gwt", type=float)
+    parser.add_argument("--surcharge", type=float, default=0.0)
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    add_coefficient_arguments(parser)
+    args = parser.parse_args(argv)
+
+    layers = load_layers(args.csv, args.gwt)
+    gradient = layer_gradient(layers, args.gwt, surcharge=args.surcharge, coefficients=coefficients_from_args(args),
+                              water=args.water)
+    print(f"Force: {gradient.force:.4f} kN/m")
+    print("layer,dF_dphi,dF_dgamma,dF_dthickness,dF_dcohesion")
+    for k, layer in enumerate(layers):
+        print(f"{layer.name},{gradient.phi[k]:.6g},{gradient.gamma[k]:.6g},{gradient.thickness[k]:.6g},"
+              f"{gradient.cohesion[k]:.6g}")
+    if gradient.gwt is not None:
+        print(f"dF/dGWT: {gradient.gwt:.6g} kN/m per m")
+    print(f"dF/dq: {gradient.surcharge:.6g} kN/m per kPa")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import heapq
+import json
+import math
+import shlex
+import sys
+
+import numpy as np
+
+from .coefficients import RANKINE, add_coefficient_arguments, coefficient_argv, coefficients_from_args
+from .engine import ForceModel
+from .loader import load_layers
+
+# Trailing positions enumerated as one vectorized block per common prefix
+BLOCK_POSITIONS = 7
+
+
+# ------------------- Permutation Ranking -------------------
+# Rank r of a permutation of range(n) is its index in lexicographic order,
+# which is also the order itertools.permutations (and the exhaustive engine)
+# visits them in. Its Lehmer code is r written in the factorial base.
+# Orderings of equal force rank by r, so the merged best is the ordering
+# search_layers(engine="exhaustive") returns; the other engines may return
+# a different ordering of the same force.
+def unrank_permutation(rank, n):
+    if not 0 <= rank < math.factorial(n):
+        raise ValueError(f"Rank {rank} out of range for {n} layers")
+    available = list(range(n))
+    order = []
+    for position in range(n - 1, -1, -1):
+        digit, rank = divmod(rank, math.factorial(position))
+        order.append(available.pop(digit))
+    return order
+
+
+def rank_permutation(order):
+    available = sorted(order)
+    rank = 0
+    for position, i in enumerate(order):
+        digit = available.index(i)
+        rank += digit * math.factorial(len(order) - 1 - position)
+        available.pop(digit)
+    return rank
+
+
+def shard_ranges(n, shards):
+    # Split the n! ranks into `shards` contiguous [start, stop) ranges
+    total = math.factorial(n)
+    bounds = [total * k // shards for k in range(shards + 1)]
+    return [(bounds[k], bounds[k + 1]) for k in range(shards)]
+
+
+def _suffix_patterns(k):
+    # All permutations of range(k) in lexicographic order, one per row
+    patterns = np.zeros((math.factorial(k), k), dtype=np.intp)
+    for r in range(len(patterns)):
+        patterns[r] = unrank_permutation(r, k)
+    return patterns
+
+
+# ------------------- Shard Evaluation -------------------
+def rank_blocks(model, start, stop):
+    # Forces of ranks [start, stop) in lexicographic order, yielded as
+    # (first rank, forces) blocks that share all but the trailing positions
+    n = model.n
+    k = min(n, BLOCK_POSITIONS)
+    block = math.factorial(k)
+    patterns = _suffix_patterns(k)
+
+    rank = start
+    while rank < stop:
+        prefix_rank, offset = divmod(rank, block)
+        count = min(block - offset, stop - rank)
+
+        prefix = unrank_permutation(prefix_rank * block, n)[:n - k]
+        remaining = np.array(sorted(set(range(n)) - set(prefix)), dtype=np.intp)
+        yield rank, model.batch_forces(remaining[patterns[offset:offset + count]],
+                                       start=model.prefix_state(prefix))
+        rank += count
+
+
+def run_shard(layers, gwt_depth, start, stop, top_k=10, surcharge=0.0, coefficients=None, water=False):
+    # Evaluate ranks [start, stop); returns the shard's best and its top-k
+    # as (force, rank) pairs, ties broken by the lower rank.
+    model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+    n = model.n
+
+    best = []  # max-heap of the top_k smallest (force, rank) via negation
+    for rank, forces in rank_blocks(model, start, stop):
+        count = len(forces)
+        order = np.lexsort((np.arange(count), forces))[:top_k]
+        for j in order.tolist():
+            item = (-float(forces[j]), -(rank + j))
+            if len(best) < top_k:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+            else:
+                break
+
+    top = sorted((-f, -r) for f, r in best)
+    return {
+        "n": n,
+        "start": start,
+        "stop": stop,
+        "top_k": top_k,
+        "top": [{"force": f, "rank": r, "order": unrank_permutation(r, n),
+                 "layers": [str(layers[i].name) for i in unrank_permutation(r, n)]} for f, r in top],
+    }
+
+
+def merge_shards(shards, top_k=None):
+    # Reduce shard results; the ranges must tile [0, n!) exactly
+    if not shards:
+        raise ValueError("No shard results to merge")
+    n = shards[0]["n"]
+    fingerprint = shards[0].get("fingerprint")
+    ranges = sorted((s["start"], s["stop"]) for s in shards)
+    if any(s["n"] != n or s.get("fingerprint") != fingerprint for s in shards):
+        raise ValueError("Shard results come from different problems")
+    covered = 0
+    for start, stop in ranges:
+        if start != covered:
+            raise ValueError(f"Shards do not cover ranks {covered}..{start} exactly")
+        covered = stop
+    if covered != math.factorial(n):
+        raise ValueError(f"Shards stop at rank {covered}, expected {math.factorial(n)}")
+
+    top_k = top_k or min(s["top_k"] for s in shards)
+    top = sorted((t for s in shards for t in s["top"]), key=lambda t: (t["force"], t["rank"]))[:top_k]
+    return {"n": n, "fingerprint": fingerprint, "start": 0, "stop": covered, "top_k": top_k, "top": top}
+
+
+# ------------------- File Based Workflow -------------------
+def problem_fingerprint(layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+    coefficients = RANKINE if coefficients is None else coefficients
+    return json.dumps([[str(layer.name), float(layer.phi), float(layer.gamma), float(layer.thickness),
+                        float(layer.cohesion)] for layer in layers] +
+                      [gwt_depth, surcharge, coefficients.key(), water])
+
+
+def plan_commands(csv_path, n, shards, gwt_depth=None, top_k=10, prefix="shard", surcharge=0.0,
+                  coefficient_args=(), water=False):
+    # `coefficient_args` are the --coefficients ... options passed on to every worker
+    commands = []
+    for k, (start, stop) in enumerate(shard_ranges(n, shards)):
+        args = [sys.executable, "-m", "soil_optimizer.shards", "run", csv_path,
+                "--start", str(start), "--stop", str(stop), "--top-k", str(top_k),
+                "--out", f"{prefix}-{k:04d}-of-{shards:04d}.json"]
+        if gwt_depth is not None:
+            args += ["--gwt", repr(gwt_depth)]
+        if surcharge:
+            args += ["--surcharge", repr(surcharge)]
+        args += list(coefficient_args)
+        if water:
+            args.append("--water")
+        commands.append(shlex.join(args))
+    return commands
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.shards",
+                                     description="Exhaustive layer order search split into rank shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="print one worker command per shard")
+    plan.add_argument("csv")
+    plan.add_argument("--shards", type=int, required=True)
+    plan.add_argument("--gwt", type=float)
+    plan.add_argument("--surcharge", type=float, default=0.0)
+    plan.add_argument("--top-k", type=int, default=10)
+    plan.add_argument("--prefix", default="shard")
+    plan.add_argument("--water", action="store_true")
+    add_coefficient_arguments(plan)
+
+    run = commands.add_parser("run", help="evaluate one rank range")
+    run.add_argument("csv")
+    run.add_argument("--start", type=int, required=True)
+    run.add_argument("--stop", type=int, required=True)
+    run.add_argument("--gwt", type=float)
+    run.add_argument("--surcharge", type=float, default=0.0)
+    run.add_argument("--top-k", type=int, default=10)
+    run.add_argument("--out", required=True)
+    run.add_argument("--water", action="store_true")
+    add_coefficient_arguments(run)
+
+    merge = commands.add_parser("merge", help="reduce shard files to the global result")
+    merge.add_argument("files", nargs="+")
+    merge.add_argument("--top-k", type=int)
+    merge.add_argument("--out")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "plan":
+        layers = load_layers(args.csv, args.gwt)
+        for command in plan_commands(args.csv, len(layers), args.shards, args.gwt, args.top_k, args.prefix,
+                                     args.surcharge, coefficient_argv(args), args.water):
+            print(command)
+
+    elif args.command == "run":
+        layers = load_layers(args.csv, args.gwt)
+        coefficients = coefficients_from_args(args)
+        result = run_shard(layers, args.gwt, args.start, args.stop, args.top_k, args.surcharge, coefficients,
+                           args.water)
+        result["fingerprint"] = problem_fingerprint(layers, args.gwt, args.surcharge, coefficients, args.water)
+        with open(args.out, "w") as f:
+            json.dump(result, f)
+
+    else:
+        shards = []
+        for path in args.files:
+            with open(path) as f:
+                shards.append(json.load(f))
+        result = merge_shards(shards, args.top_k)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(result, f, indent=2)
+        best = result["top"][0]
+        print(f"Best ordering (rank {best['rank']}): {' → '.join(best['layers'])}  force = {best['force']!r} kN/m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import math
+from bisect import bisect_right
+
+import numpy as np
+
+from .coefficients import add_coefficient_arguments, coefficients_from_args
+from .engine import ForceModel
+from .loader import load_layers
+from .search import BOUND_TOL, PROGRESS_INTERVAL, RelaxedBound, Search
+
+
+# ------------------- Force at Any Excavation Depth -------------------
+class StageProfile:
+    # Cumulative force F(H) and first moment about the surface of one ordering,
+    # as prefix sums over the layer boundaries. A query at depth H bisects for
+    # the layer containing H and adds that layer's part above H analytically,
+    # so each stage costs O(log n) instead of a full re-evaluation.
+    def __init__(self, model, order):
+        self.model = model
+        self.order = np.asarray(order, dtype=np.intp)
+        h = model.thickness[self.order]
+        self.bottoms = np.cumsum(h)
+        self.tops = self.bottoms - h
+        # Stress at the top of every layer, then each whole layer's force and moment
+        stress = np.empty(len(self.order))
+        s = model.surcharge
+        for p, i in enumerate(self.order.tolist()):
+            stress[p] = s
+            s = model.layer_force(i, float(self.tops[p]), s)[1]
+        self.stress = stress
+        f, m, _ = model.layer_forces_moments(self.order, self.tops, stress)
+        self.force_before = np.concatenate([[0.0], np.cumsum(f)])
+        self.moment_before = np.concatenate([[0.0], np.cumsum(m)])
+        self._bottoms = self.bottoms.tolist()
+
+    def height(self):
+        return float(self.bottoms[-1]) if len(self.bottoms) else 0.0
+
+    def force(self, depth):
+        # F(H) for one excavation depth H
+        p = min(bisect_right(self._bottoms, depth), len(self._bottoms) - 1)
+        i = int(self.order[p])
+        top = float(self.tops[p])
+        partial, _ = self.model.layer_force(i, top, float(self.stress[p]), min(max(depth - top, 0.0),
+                                                                               self.model._thickness[i]))
+        return float(self.force_before[p]) + partial
+
+    def forces_moments(self, depths):
+        # F(H) and the moment about the excavation level, ∫σa·(H − z) dz, for
+        # an array of depths at once
+        depths = np.asarray(depths, dtype=float)
+        p = np.minimum(np.searchsorted(self.bottoms, depths, side="right"), len(self.bottoms) - 1)
+        idx = self.order[p]
+        part = np.clip(depths - self.tops[p], 0.0, self.model.thickness[idx])
+        f, m, _ = self.model.layer_forces_moments(idx, self.tops[p], self.stress[p], part)
+        force = self.force_before[p] + f
+        return force, depths * force - (self.moment_before[p] + m)
+
+
+def stage_forces(model, order, stages):
+    return StageProfile(model, order).forces_moments(stages)[0]
+
+
+# ------------------- Min-Max Stage Optimization -------------------
+def minimize_stage_force(layers, gwt_depth, stages, surcharge=0.0, coefficients=None, water=False,
+                         constraints=None, deadline=None, on_improvement=None, progress=None, cancel=None):
+    # Ordering whose largest force over the excavation `stages` (depths below
+    # the surface) is least. Branch and bound: once a prefix reaches below a
+    # stage its force there is fixed, F(H) never falls with depth, and the
+    # full-height stage is bounded by the relaxed bound of search_layers.
+    # Anytime like search_layers; the result's force is the worst stage force.
+    model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+    height = model.height()
+    stages = sorted({min(float(s), height) for s in stages if s > 0})
+    if not stages:
+        raise ValueError("At least one stage depth below the surface is needed")
+    search = Search(model, "staged", deadline, on_improvement, progress, cancel, constraints)
+    stats = search.stats
+    relax = RelaxedBound(model)
+    final = stages[-1] >= height - 1e-9
+
+    def worst(order):
+        return float(np.max(stage_forces(model, order, stages)))
+
+    seed = search.seed(relax)
+    search.offer(seed, worst(seed))
+
+    everything = frozenset(range(model.n))
+    # (bound, prefix, remaining, placed mask, next stage, depth, stress, force, worst so far)
+    stack = [(0.0, (), everything, 0, 0, 0.0, model.surcharge, 0.0, 0.0)]
+    while stack:
+        if stats.nodes % PROGRESS_INTERVAL == 0 and stats.nodes and search.should_stop():
+            return search.result(min([search.best_force] + [node[0] for node in stack]))
+
+        bound, prefix, remaining, mask, k, depth, stress, force, reached = stack.pop()
+        stats.nodes += 1
+        if bound >= search.best_force - BOUND_TOL * abs(search.best_force):
+            stats.covered += math.factorial(len(remaining))
+            continue
+
+        children = []
+        for i in remaining:
+            if search.constraints is not None and not search.constraints.allowed(mask, i):
+                stats.covered += math.factorial(len(remaining) - 1)
+                continue
+            h = model._thickness[i]
+            f, child_stress = model.layer_force(i, depth, stress)
+            child_depth = depth + h
+            child_reached = reached
+            j = k
+            while j < len(stages) and stages[j] <= child_depth + 1e-9:
+                part = model.layer_force(i, depth, stress, min(stages[j] - depth, h))[0]
+                child_reached = max(child_reached, force + part)
+                j += 1
+            child_prefix = prefix + (i,)
+            child_remaining = remaining - {i}
+            if not child_remaining:
+                stats.evaluated += 1
+                stats.covered += 1
+                search.offer(child_prefix, child_reached)
+                continue
+            child_bound = child_reached
+            if j < len(stages):
+                child_bound = max(child_bound, force + f)
+                if final:
+                    child_bound = max(child_bound, force + f + relax.bound(child_remaining, child_stress, child_depth))
+            children.append((child_bound, child_prefix, child_remaining, mask | 1 << i, j,
+                             child_depth, child_stress, force + f, child_reached))
+
+        children.sort(key=lambda node: node[0], reverse=True)
+        stack.extend(children)
+
+    return search.result(search.best_force)
+
+
+# ------------------- Command Line -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m soil_optimizer.staging",
+                                     description="Order the layers for the least force over all excavation stages")
+    parser.add_argument("csv")
+    parser.add_argument("--stages", type=float, nargs="+", required=True, help="excavation depths (m)")
+    parser.add_argument("--gwt", type=float)
+    parser.add_argument("--surcharge", type=float, default=0.0)
+    parser.add_argument("--water", action="store_true", help="include the hydrostatic thrust below the GWT")
+    parser.add_argument("--time-limit", type=float)
+    add_coefficient_arguments(parser)
+    args = parser.parse_args(argv)
+
+    layers = load_layers(args.csv, args.gwt)
+    coefficients = coefficients_from_args(args)
+    model = ForceModel(layers, args.gwt, args.surcharge, coefficients, args.water)
+    result = minimize_stage_force(layers, args.gwt, args.stages, args.surcharge, coefficients, args.water,
+                                  deadline=args.time_limit)
+    index = {id(layer): i for i, layer in enumerate(layers)}
+    given = stage_forces(model, range(len(layers)), args.stages)
+    best = stage_forces(model, [index[id(layer)] for layer in result.ordering], args.stages)
+    print("stage_depth,given_force,best_force")
+    for depth, f_given, f_best in zip(args.stages, given, best):
+        print(f"{depth:g},{f_given:.4f},{f_best:.4f}")
+    print(f"Worst stage: {given.max():.2f} kN/m as given, {result.force:.2f} kN/m with "
+          f"{' > '.join(str(layer.name) for layer in result.ordering)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import ast
+
+import numpy as np
+
+from .coefficients import RANKINE
+from .search import search_layers
+
+# Material values are rounded to these steps (φ in degrees, γ in kN/m³, c' in
+# kPa) to decide that two sites use the same set of materials
+MATERIAL_STEPS = (0.5, 0.25, 1.0)
+# Weights of φ, γ and c' against thickness (m) when sites differ in materials
+MATERIAL_WEIGHTS = np.array([0.2, 0.5, 0.1])
+
+
+# ------------------- Site Features -------------------
+# A site's layers are sorted by material (φ, γ, c', then h) so the order
+# they are listed in does not matter. The rounded materials form an exact
+# lookup key; the thicknesses, the GWT (capped at the wall height, where it
+# stops mattering) and the surcharge form the vector compared among sites.
+def _canonical(phi, gamma, cohesion, thickness):
+    return np.lexsort((thickness, cohesion, gamma, phi))
+
+
+def material_key(phi, gamma, cohesion):
+    rows = np.column_stack([np.round(np.asarray(a, dtype=float) / step).astype(np.int64)
+                            for a, step in zip((phi, gamma, cohesion), MATERIAL_STEPS)])
+    rows = rows[np.lexsort(rows.T[::-1])]
+    return tuple(map(tuple, rows.tolist()))
+
+
+def site_features(phi, gamma, thickness, cohesion, gwt_depth, surcharge=0.0):
+    # (feature vector, canonical permutation) of one site
+    phi, gamma, thickness, cohesion = (np.asarray(a, dtype=float) for a in (phi, gamma, thickness, cohesion))
+    canonical = _canonical(phi, gamma, cohesion, thickness)
+    height = float(thickness.sum())
+    gwt = height if gwt_depth is None else min(float(gwt_depth), height)
+    materials = np.column_stack([phi, gamma, cohesion])[canonical] * MATERIAL_WEIGHTS
+    return np.concatenate([thickness[canonical], [gwt, 0.1 * surcharge], materials.ravel()]), canonical
+
+
+# ------------------- Solution Index -------------------
+class SolutionIndex:
+    # Optimal orderings of solved sites, searched for the site most like a
+    # new one. Sites are grouped by layer count, coefficient model and water
+    # mode; within a group a site with the same (rounded) materials is
+    # preferred, found by key, then the nearest feature vector wins. Orderings
+    # are stored by canonical rank, so they carry over to a new site whatever
+    # order its layers are listed in.
+    def __init__(self):
+        self._groups = {}   # (n, coefficient key, water) -> list of entries
+        self._arrays = {}   # same key -> stacked features, rebuilt lazily
+        self._by_key = {}   # (group, material key) -> entry positions in the group
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._groups.values())
+
+    def _group(self, n, coefficients, water):
+        return n, (RANKINE if coefficients is None else coefficients).key(), bool(water)
+
+    def add(self, layers, gwt_depth, ordering, force, surcharge=0.0, coefficients=None, water=False):
+        # Record a solved site; `ordering` holds indices into `layers`
+        phi, gamma, thickness, cohesion = _columns(layers)
+        features, canonical = site_features(phi, gamma, thickness, cohesion, gwt_depth, surcharge)
+        rank = np.empty(len(layers), dtype=np.intp)
+        rank[canonical] = np.arange(len(layers))
+        self._insert(self._group(len(layers), coefficients, water), features,
+                     rank[np.asarray(ordering, dtype=np.intp)], float(force))
+
+    def _insert(self, group, features, ranks, force):
+        entries = self._groups.setdefault(group, [])
+        self._by_key.setdefault((group, _features_key(features, group[0])), []).append(len(entries))
+        entries.append((features, ranks, force))
+        self._arrays.pop(group, None)
+
+    def nearest(self, layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+        # (ordering as indices into `layers`, its recorded force, distance)
+        # of the most similar solved site, or None if none is comparable
+        group = self._group(len(layers), coefficients, water)
+        entries = self._groups.get(group)
+        if not entries:
+            return None
+        phi, gamma, thickness, cohesion = _columns(layers)
+        features, canonical = site_features(phi, gamma, thickness, cohesion, gwt_depth, surcharge)
+        if group not in self._arrays:
+            self._arrays[group] = np.array([entry[0] for entry in entries])
+        candidates = self._by_key.get((group, _features_key(features, len(layers))))
+        table = self._arrays[group]
+        rows = np.arange(len(entries)) if candidates is None else np.asarray(candidates)
+        distance = np.sqrt(((table[rows] - features) ** 2).sum(axis=1))
+        k = int(rows[np.argmin(distance)])
+        _, ranks, force = entries[k]
+        return canonical[ranks].tolist(), force, float(distance.min())
+
+    def warm_start(self, layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+        # `initial` for search_layers, or None
+        match = self.nearest(layers, gwt_depth, surcharge, coefficients, water)
+        return None if match is None else match[0]
+
+    def solve(self, layers, gwt_depth, **options):
+        # search_layers warm-started from the nearest solved site. A complete
+        # unconstrained result is added to the index; a constrained search
+        # still starts from the match if it happens to be feasible.
+        keys = {key: options.get(key, default) for key, default in
+                (("surcharge", 0.0), ("coefficients", None), ("water", False))}
+        if options.get("initial") is None:
+            options["initial"] = self.warm_start(layers, gwt_depth, **keys)
+        result = search_layers(layers, gwt_depth, **options)
+        constraints = options.get("constraints")
+        if not result.interrupted and (constraints is None or constraints.empty):
+            index = {id(layer): i for i, layer in enumerate(layers)}
+            self.add(layers, gwt_depth, [index[id(layer)] for layer in result.ordering], result.force, **keys)
+        return result
+
+    # ------------------- Persistence -------------------
+    def save(self, path):
+        # One .npz file: per group its key (as text), stacked features,
+        # orderings (by canonical rank) and forces
+        groups = list(self._groups)
+        arrays = {"groups": np.array([repr(group) for group in groups])}
+        for g, group in enumerate(groups):
+            features, ranks, forces = zip(*self._groups[group])
+            arrays[f"features_{g}"] = np.array(features)
+            arrays[f"ranks_{g}"] = np.array(ranks, dtype=np.intp)
+            arrays[f"forces_{g}"] = np.array(forces)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with np.load(path) as data:
+            for g, text in enumerate(data["groups"].tolist()):
+                # (layer count, coefficient key, water), written with repr
+                group = ast.literal_eval(text)
+                for features, ranks, force in zip(data[f"features_{g}"], data[f"ranks_{g}"], data[f"forces_{g}"]):
+                    index._insert(group, features, ranks, float(force))
+        return index
+
+
+def _features_key(features, n):
+    # Material key from a feature vector, so stored and queried sites round alike
+    return material_key(*(features[n + 2:].reshape(n, 3) / MATERIAL_WEIGHTS).T)
+
+
+def _columns(layers):
+    return tuple(np.array([getattr(layer, name, 0.0) for layer in layers], dtype=float)
+                 for name in ("phi", "gamma", "thickness", "cohesion"))
@@ -878,12 +878,23 @@
 # """, unsafe_allow_html=True)
 
 
+import io
+import math
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import math
-import itertools
 import numpy as np
+from matplotlib import colormaps
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+
+from soil_optimizer import (DP_MAX_LAYERS, AtRest, Coulomb, EmbeddedWall, ForceModel, IncrementalOptimizer,
+                            JobPool, LayerConstraints, LayerTableError, MononobeOkabe, Rankine, SeismicScenarios,
+                            SoilLayer, StageProfile,
+                            export_profiles, export_results, force_distribution, layer_gradient,
+                            layers_from_frame, minimize_stage_force, pareto_front, read_table, reduce_layers,
+                            total_force)
 
 # Set page configuration
 st.set_page_config(
@@ -949,119 +960,607 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ------------------- Soil Layer Class -------------------
-class SoilLayer:
-    def __init__(self, phi, gamma, thickness, name="Layer"):
-        self.phi = phi
-        self.gamma = gamma
-        self.thickness = thickness
-        self.name = name
-
-    def ka(self):
-        phi_rad = math.radians(self.phi)
-        return math.tan(math.radians(45 - self.phi/2))**2
-
-# ------------------- Pressure Calculation Functions -------------------
-def calculate_pressure_profile(layers, gwt_depth):
-    gamma_w = 9.81  # Unit weight of water in kN/m³
-    
-    # Create detailed pressure profile for plotting
-    depths = []
-    pressures = []
-    
-    cumulative_depth = 0
-    cumulative_vertical_stress = 0
-    
-    for i, layer in enumerate(layers):
-        ka = layer.ka()
-        layer_top = cumulative_depth
-        layer_bottom = cumulative_depth + layer.thickness
-        
-        # Add point at the top of the layer
-        if i > 0 and len(depths) > 0:
-            # Add a point with the new Ka at the layer boundary
-            depths.append(layer_top)
-            pressures.append(ka * cumulative_vertical_stress)
-        else:
-            depths.append(layer_top)
-            pressures.append(ka * cumulative_vertical_stress)
-        
-        # Calculate points within the layer
-        if gwt_depth is not None and layer_top < gwt_depth < layer_bottom:
-            # Layer intersects with GWT
-            
-            # Points above GWT
-            z_above = np.linspace(layer_top, gwt_depth, 50)
-            for z in z_above:
-                local_depth = z - layer_top
-                vertical_stress = cumulative_vertical_stress + layer.gamma * local_depth
-                depths.append(z)
-                pressures.append(ka * vertical_stress)
-            
-            # Points below GWT
-            z_below = np.linspace(gwt_depth, layer_bottom, 50)
-            for z in z_below:
-                local_depth_above_gwt = gwt_depth - layer_top
-                local_depth_below_gwt = z - gwt_depth
-                vertical_stress = (cumulative_vertical_stress + 
-                                  layer.gamma * local_depth_above_gwt + 
-                                  (layer.gamma - gamma_w) * local_depth_below_gwt)
-                depths.append(z)
-                pressures.append(ka * vertical_stress)
-        else:
-            # Layer doesn't intersect GWT
-            z_values = np.linspace(layer_top, layer_bottom, 100)
-            for z in z_values:
-                local_depth = z - layer_top
-                if gwt_depth is not None and z > gwt_depth:
-                    # Below GWT
-                    if layer_top >= gwt_depth:
-                        # Entire layer is below GWT
-                        vertical_stress = cumulative_vertical_stress + (layer.gamma - gamma_w) * local_depth
-                    else:
-                        # Should not reach here as this case is handled above
-                        pass
-                else:
-                    # Above GWT
-                    vertical_stress = cumulative_vertical_stress + layer.gamma * local_depth
-                
-                depths.append(z)
-                pressures.append(ka * vertical_stress)
-        
-        # Update cumulative values for next layer
-        if gwt_depth is not None and layer_bottom > gwt_depth:
-            if layer_top >= gwt_depth:
-                # Entire layer is below GWT
-                cumulative_vertical_stress += (layer.gamma - gamma_w) * layer.thickness
-            else:
-                # Layer intersects GWT
-                above_gwt = gwt_depth - layer_top
-                below_gwt = layer_bottom - gwt_depth
-                cumulative_vertical_stress += (layer.gamma * above_gwt + 
-                                             (layer.gamma - gamma_w) * below_gwt)
-        else:
-            cumulative_vertical_stress += layer.gamma * layer.thickness
-        
-        cumulative_depth = layer_bottom
-    
-    return list(zip(depths, pressures))
+# ------------------- Result Rendering -------------------
+def format_table(layers, coefficients=None):
+    return pd.DataFrame({
+        'Name': [layer.name for layer in layers],
+        'φ (°)': [layer.phi for layer in layers],
+        'γ (kN/m³)': [layer.gamma for layer in layers],
+        'Thickness (m)': [layer.thickness for layer in layers],
+        "c' (kPa)": [layer.cohesion for layer in layers],
+        'K': [round(layer.ka(coefficients), 4) for layer in layers]
+    })
+
+def show_figure(fig):
+    # Figures are built with the object-oriented Figure API, so pyplot's
+    # global registry never holds them; clearing once rendered frees the
+    # artists now instead of at the next garbage collection
+    st.pyplot(fig, clear_figure=True)
+
+def release_session_state(*keys):
+    # Drop the state of a section this run does not show, so a session holds
+    # at most one optimizer, one background job and one histogram
+    job = st.session_state.get("optimization_job") if "optimization_job" in keys else None
+    if job is not None:
+        job.cancel()
+    for key in keys:
+        st.session_state.pop(key, None)
+
+# ------------------- Pressure Coefficients -------------------
+def coefficient_label(coefficients):
+    if isinstance(coefficients, Coulomb):
+        return "Coulomb Active"
+    if isinstance(coefficients, AtRest):
+        return "At-Rest"
+    if isinstance(coefficients, MononobeOkabe):
+        return f"Seismic (kh = {coefficients.kh:g}, kv = {coefficients.kv:g})"
+    return "Rankine Active"
+
+def coefficient_inputs():
+    # Widgets for the earth-pressure coefficient model
+    kind = st.selectbox("📐 Pressure Coefficient:",
+                        ["Rankine active", "Coulomb active", "At-rest (K0)", "Mononobe–Okabe (seismic)"])
+    if kind in ("Coulomb active", "Mononobe–Okabe (seismic)"):
+        delta_ratio = st.number_input("Wall friction δ/φ:", min_value=0.0, max_value=1.0, value=2 / 3, step=0.05)
+        batter = st.number_input("Wall batter from vertical (°):", min_value=-30.0, max_value=30.0, value=0.0)
+        beta = st.number_input("Backfill slope β (°):", min_value=0.0, max_value=45.0, value=0.0)
+        if kind == "Coulomb active":
+            return Coulomb(batter=batter, beta=beta, delta_ratio=delta_ratio)
+        kh = st.number_input("Horizontal seismic coefficient kh:", min_value=0.0, max_value=1.0, value=0.15,
+                             step=0.05)
+        kv = st.number_input("Vertical seismic coefficient kv (up):", min_value=-0.5, max_value=0.5, value=0.0,
+                             step=0.05)
+        return MononobeOkabe(kh, kv, batter=batter, beta=beta, delta_ratio=delta_ratio)
+    if kind == "At-rest (K0)":
+        return AtRest(st.number_input("Overconsolidation ratio:", min_value=1.0, value=1.0, step=0.5))
+    return Rankine()
+
+# ------------------- Pressure Profile Plots -------------------
+# (width, height, dpi) of the rendered profile figure
+PLOT_STYLE = (12, 8, 100)
+# Above this many layers the profiles are drawn as a native Streamlit chart
+PLOT_MAX_LAYERS = 25
+# Text labels are drawn only for layers at least this share of the wall
+# height (at most 20 per panel), and legend entries only for short profiles,
+# so rendering time stays flat as the layer count grows
+LABEL_MIN_FRACTION = 0.05
+LEGEND_MAX_LAYERS = 10
+LAYER_COLORS = ['blue', 'green', 'red', 'purple', 'orange']
+
+def layer_rows(layers):
+    return tuple((str(layer.name), float(layer.phi), float(layer.gamma), float(layer.thickness),
+                  float(layer.cohesion)) for layer in layers)
+
+def draw_pressure_profile(ax, rows, gwt_depth, title, surcharge=0.0, coefficients=None, water=False):
+    # One collection per element type instead of one artist per layer
+    model = ForceModel([SoilLayer(phi, gamma, h, name, c) for name, phi, gamma, h, c in rows], gwt_depth,
+                       surcharge, coefficients, water)
+    depth, sigma_a = model.pressure_profile(range(model.n))
+    colors = [LAYER_COLORS[i % len(LAYER_COLORS)] for i in range(model.n)]
+    mid_x = -5  # Where to draw vertical thickness annotations
+
+    ax.add_collection(LineCollection(np.stack([sigma_a, depth], axis=-1), colors=colors))
+    # Dashed connectors at layer boundaries and dotted extensions to the bottom pressures
+    ax.hlines(depth[1:, 0], sigma_a[:-1, -1], sigma_a[1:, 0], colors='black', linestyles='dashed', linewidth=1)
+    ax.hlines(depth[:, -1], 0, sigma_a[:, -1], colors='gray', linestyles='dotted', linewidth=1)
+    # Vertical depth markers (thickness labels)
+    ax.vlines(np.full(model.n, mid_x), depth[:, 0], depth[:, -1], colors='black', linestyles='solid')
+
+    for i in np.flatnonzero(depth[:, -1] - depth[:, 0] >= LABEL_MIN_FRACTION * model.height()):
+        z, sigma = depth[i], sigma_a[i]
+        ax.text(sigma[-1] / 2, z[-1] + 0.2, f"{sigma[-1]:.1f} kPa", fontsize=10, ha='center', color=colors[i])
+        ax.text(mid_x - 1, (z[0] + z[-1]) / 2, f"{rows[i][3]:g} m", va='center', ha='center', fontsize=10,
+                rotation=90, bbox=dict(facecolor='white', edgecolor='gray', boxstyle='round'))
+
+    handles = []
+    if model.n <= LEGEND_MAX_LAYERS:
+        handles = [Line2D([], [], color=color, label=f"{name} (ϕ={phi:g}°, γ={gamma:g} kN/m³"
+                                                         + (f", c'={c:g} kPa)" if c else ")"))
+                   for (name, phi, gamma, h, c), color in zip(rows, colors)]
+    crack = model.crack_depth(range(model.n))
+    if crack > 0:
+        handles.append(ax.axhspan(0, crack, color='orange', alpha=0.15, label=f'Tension Crack ({crack:.2f} m)'))
+    if gwt_depth is not None:
+        handles.append(ax.axhline(y=gwt_depth, color='cyan', linestyle='--', linewidth=2, label='Groundwater Table'))
+        ax.text(mid_x - 1, gwt_depth, "GWT", va='bottom', ha='center', color='cyan', fontsize=10,
+                bbox=dict(facecolor='white', alpha=0.7, boxstyle='round'))
+
+    # Plot settings
+    ax.autoscale_view()
+    ax.set_xlim(mid_x - 5, None)
+    ax.invert_yaxis()
+    ax.set_xlabel('Total Lateral Pressure σₐ + u (kPa)' if water else 'Lateral Earth Pressure σₐ (kPa)', fontsize=12)
+    ax.set_ylabel('Depth (m)', fontsize=12)
+    ax.set_title(f"{title} Layer Arrangement", fontsize=14)
+    ax.grid(True)
+    if handles:
+        ax.legend(handles=handles, loc='upper right')
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def render_pressure_profiles(original_rows, optimized_rows, gwt_depth, surcharge=0.0, coefficients=None,
+                             water=False, style=PLOT_STYLE):
+    # PNG bytes of both profiles, cached on the arrangements, GWT and style so
+    # reruns that change nothing skip rendering entirely
+    width, height, dpi = style
+    fig = Figure(figsize=(width, height), dpi=dpi)
+    fig.suptitle(f"{coefficient_label(coefficients)} Earth Pressure with Groundwater Table", fontsize=16)
+    # Fixed margins; tight_layout would lay out every label once more just to measure it
+    fig.subplots_adjust(left=0.06, right=0.98, bottom=0.08, top=0.88, wspace=0.15)
+    for ax, rows, title in zip(fig.subplots(1, 2), [original_rows, optimized_rows], ["Original", "Optimized"]):
+        draw_pressure_profile(ax, rows, gwt_depth, title, surcharge, coefficients, water)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    fig.clear()
+    return buffer.getvalue()
+
+def show_pressure_profiles(layers, optimized_layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+    if len(layers) <= PLOT_MAX_LAYERS:
+        st.image(render_pressure_profiles(layer_rows(layers), layer_rows(optimized_layers), gwt_depth, surcharge,
+                                          coefficients, water), width='stretch')
+        return
+
+    # Many layers: a light native chart of σa against depth for both arrangements
+    frames = []
+    for label, set_layers in [("Original", layers), ("Optimized", optimized_layers)]:
+        model = ForceModel(set_layers, gwt_depth, surcharge, coefficients, water)
+        depth, sigma_a = model.pressure_profile(range(len(set_layers)))
+        frames.append(pd.DataFrame({'Depth (m)': depth.ravel(), 'σₐ (kPa)': sigma_a.ravel(), 'Arrangement': label}))
+    st.line_chart(pd.concat(frames), x='Depth (m)', y='σₐ (kPa)', color='Arrangement')
+
+def show_results(layers, optimized_layers, gwt_depth, original_force, optimized_force, surcharge=0.0,
+                 coefficients=None, water=False):
+    reduction_percentage = ((original_force - optimized_force) / original_force) * 100
+
+    col1, col2 = st.columns(2)
 
-def total_force(layers, gwt_depth):
-    pressure_profile = calculate_pressure_profile(layers, gwt_depth)
-    depths = [p[0] for p in pressure_profile]
-    pressures = [p[1] for p in pressure_profile]
-    
-    force = 0
-    for i in range(len(depths) - 1):
-        h = depths[i+1] - depths[i]
-        avg_pressure = (pressures[i] + pressures[i+1]) / 2
-        force += avg_pressure * h
-    
-    return force
+    with col1:
+        st.markdown('<h3 class="sub-header">🔹 Original Layer Order</h3>', unsafe_allow_html=True)
+        st.dataframe(format_table(layers, coefficients), use_container_width=True)
+
+    with col2:
+        st.markdown('<h3 class="sub-header">✅ Optimized Layer Order</h3>', unsafe_allow_html=True)
+        st.dataframe(format_table(optimized_layers, coefficients), use_container_width=True)
+
+    st.markdown('<div class="result-box">', unsafe_allow_html=True)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Original Force", f"{original_force:.2f} kN/m")
+    col2.metric("Optimized Force", f"{optimized_force:.2f} kN/m")
+    col3.metric("Reduction", f"{reduction_percentage:.2f}%", f"-{reduction_percentage:.2f}%")
+    original_height = ForceModel(layers, gwt_depth, surcharge, coefficients, water).resultant(range(len(layers)))[1]
+    optimized_model = ForceModel(optimized_layers, gwt_depth, surcharge, coefficients, water)
+    optimized_height = optimized_model.resultant(range(len(optimized_layers)))[1]
+    col1.caption(f"Resultant {original_height:.2f} m above the base")
+    col2.caption(f"Resultant {optimized_height:.2f} m above the base")
+    if water:
+        thrust, thrust_height = optimized_model.water_thrust()
+        col3.caption(f"Includes {thrust:.2f} kN/m of water thrust at {thrust_height:.2f} m, "
+                     "the same for every arrangement")
+    st.markdown('</div>', unsafe_allow_html=True)
 
-def optimize_layers(layers, gwt_depth):
-    best_perm = min(itertools.permutations(layers), key=lambda perm: total_force(perm, gwt_depth))
-    return best_perm, total_force(best_perm, gwt_depth)
+    show_downloads(layers, optimized_layers, gwt_depth, surcharge, coefficients, water)
+
+    # Plot
+    show_pressure_profiles(layers, optimized_layers, gwt_depth, surcharge, coefficients, water)
+
+    show_sensitivity(optimized_layers, gwt_depth, surcharge, coefficients, water)
+
+    show_force_distribution(layers, gwt_depth, original_force, optimized_force, surcharge, coefficients, water)
+
+def show_downloads(layers, optimized_layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+    # Both arrangements as Parquet files for downstream tools
+    model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+    index = {id(layer): i for i, layer in enumerate(layers)}
+    orders = np.array([range(len(layers)), [index[id(layer)] for layer in optimized_layers]], dtype=np.intp)
+    files = []
+    try:
+        for export in (export_results, export_profiles):
+            buffer = io.BytesIO()
+            export(buffer, model, orders)
+            files.append(buffer.getvalue())
+    except ImportError:
+        st.caption("Install pyarrow to download the results as Parquet files.")
+        return
+    col1, col2 = st.columns(2)
+    col1.download_button("⬇️ Orderings and forces (Parquet)", files[0], "results.parquet",
+                         "application/vnd.apache.parquet")
+    col2.download_button("⬇️ Pressure profiles (Parquet)", files[1], "profiles.parquet",
+                         "application/vnd.apache.parquet")
+    st.caption("Row 0 is the original arrangement and row 1 the optimized one; layers are numbered in the "
+               "original order.")
+
+# ------------------- Sensitivity -------------------
+TORNADO_BARS = 12
+
+
+def show_sensitivity(layers, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+    st.markdown('<h3 class="sub-header">🌪️ Sensitivity of the Optimized Force</h3>', unsafe_allow_html=True)
+    if not st.toggle("Show which soil parameters the optimized force depends on most"):
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    dphi = col1.number_input("φ variation (±°):", min_value=0.0, value=2.0, step=0.5)
+    dgamma = col2.number_input("γ variation (±kN/m³):", min_value=0.0, value=1.0, step=0.5)
+    dthickness = col3.number_input("Thickness variation (±%):", min_value=0.0, value=10.0, step=5.0) / 100
+    dgwt = col4.number_input("GWT variation (±m):", min_value=0.0, value=0.5, step=0.1)
+
+    gradient = layer_gradient(layers, gwt_depth, surcharge=surcharge, coefficients=coefficients, water=water)
+    rows = gradient.swings(layers, dphi, dgamma, dthickness, gwt=dgwt)[:TORNADO_BARS][::-1]
+    labels = [label for label, _ in rows]
+    changes = np.array([change for _, change in rows])
+
+    fig = Figure(figsize=(8, 0.4 * len(rows) + 1.5))
+    ax = fig.subplots()
+    ax.barh(labels, changes, color='#EF4444', label='Input increased')
+    ax.barh(labels, -changes, color='#3B82F6', label='Input decreased')
+    ax.axvline(0, color='black', linewidth=0.8)
+    ax.set_xlabel(f'Change of the Total Force from {gradient.force:.2f} kN/m (kN/m)', fontsize=12)
+    ax.grid(True, axis='x')
+    ax.legend(loc='lower right')
+    show_figure(fig)
+    st.caption("First-order changes from the analytic gradient of the force for the arrangement above. Each bar "
+               "shows one input moved by the given amount either way; the longest bars point to the lab tests "
+               "most worth refining.")
+
+# ------------------- Force Distribution -------------------
+# Streaming all n! arrangements takes about 20 s at 11 layers, ten times that at 12
+DISTRIBUTION_MAX_LAYERS = 11
+
+def show_force_distribution(layers, gwt_depth, original_force, optimized_force, surcharge=0.0, coefficients=None,
+                            water=False):
+    st.markdown('<h3 class="sub-header">📈 Compared with Every Arrangement</h3>', unsafe_allow_html=True)
+    if len(layers) > DISTRIBUTION_MAX_LAYERS:
+        st.caption(f"Available for up to {DISTRIBUTION_MAX_LAYERS} layers "
+                   f"({math.factorial(DISTRIBUTION_MAX_LAYERS):,} arrangements).")
+        release_session_state("distribution", "distribution_key")
+        return
+    if not st.toggle(f"Show the force distribution over all {math.factorial(len(layers)):,} arrangements"):
+        release_session_state("distribution", "distribution_key")
+        return
+
+    key = job_key(layers, gwt_depth, surcharge=surcharge, coefficients=coefficients, water=water)
+    if st.session_state.get("distribution_key") != key:
+        bar = st.progress(0.0, text="Evaluating every arrangement...")
+        shown = [0]
+
+        def progress(done, total):
+            # Redraw once per percent rather than once per block
+            if done * 100 // total > shown[0]:
+                shown[0] = done * 100 // total
+                bar.progress(done / total, text=f"Evaluated {done:,} of {total:,} arrangements")
+
+        histogram = force_distribution(layers, gwt_depth, progress=progress, surcharge=surcharge,
+                                       coefficients=coefficients, water=water)
+        bar.empty()
+        st.session_state["distribution"] = histogram
+        st.session_state["distribution_key"] = key
+    histogram = st.session_state["distribution"]
+
+    # Coarser bars for display; the statistics use the full histogram
+    bars = histogram.counts.reshape(50, -1).sum(axis=1)
+    edges = histogram.edges()[::histogram.bins // 50]
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    ax.bar(edges[:-1], bars / histogram.count * 100, width=np.diff(edges), align='edge',
+           color='#93C5FD', edgecolor='#3B82F6')
+    ax.axvline(original_force, color='gray', linestyle='--', label=f'Original ({original_force:.1f} kN/m)')
+    ax.axvline(optimized_force, color='red', label=f'Optimized ({optimized_force:.1f} kN/m)')
+    ax.set_xlabel('Total Force (kN/m)', fontsize=12)
+    ax.set_ylabel('Share of Arrangements (%)', fontsize=12)
+    ax.legend(loc='upper right')
+    show_figure(fig)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Mean", f"{histogram.mean:.2f} kN/m")
+    col2.metric("Median", f"{histogram.quantile(0.5):.2f} kN/m")
+    col3.metric("Worst", f"{histogram.max:.2f} kN/m")
+    col4.metric("Original Beats", f"{1 - histogram.fraction_below(original_force):.1%}")
+    st.caption(f"The optimized arrangement saves {histogram.mean - optimized_force:.2f} kN/m against a random "
+               f"arrangement on average; 5–95% of arrangements lie between {histogram.quantile(0.05):.2f} "
+               f"and {histogram.quantile(0.95):.2f} kN/m.")
+
+# ------------------- Pareto Front -------------------
+# The front's subset DP keeps a list of labels per layer set and runs on the
+# script thread: about 1.5 s at 14 layers, 13 s at 16 and a minute at 18
+PARETO_MAX_LAYERS = 14
+
+def show_pareto_front(layers, gwt_depth, constraints=None, surcharge=0.0, coefficients=None, water=False):
+    st.markdown('<h3 class="sub-header">⚖️ Force vs. Overturning Moment</h3>', unsafe_allow_html=True)
+    if len(layers) > PARETO_MAX_LAYERS:
+        st.caption(f"Available for up to {PARETO_MAX_LAYERS} layers.")
+        return
+    if not st.toggle("Find the arrangements that trade total force against overturning moment"):
+        return
+
+    with st.spinner("Computing the Pareto front..."):
+        front = pareto_front(layers, gwt_depth, constraints=constraints, surcharge=surcharge,
+                             coefficients=coefficients, water=water)
+
+    choice = 0
+    if len(front) > 1:
+        choice = st.select_slider(
+            "Pick an arrangement on the front:", options=list(range(len(front))),
+            format_func=lambda k: f"{front[k].force:.1f} kN/m · {front[k].moment:.1f} kN·m/m")
+    point = front[choice]
+
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.plot([p.force for p in front], [p.moment for p in front], 'o-', color='#3B82F6', label='Pareto front')
+    ax.plot(point.force, point.moment, '*', color='red', markersize=15, label='Selected arrangement')
+    ax.set_xlabel('Total Force (kN/m)', fontsize=12)
+    ax.set_ylabel('Overturning Moment about Base (kN·m/m)', fontsize=12)
+    ax.grid(True)
+    ax.legend(loc='upper right')
+    show_figure(fig)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Force", f"{point.force:.2f} kN/m")
+    col2.metric("Overturning Moment", f"{point.moment:.2f} kN·m/m")
+    col3.metric("Resultant Height", f"{point.height:.2f} m")
+    st.dataframe(format_table(point.ordering, coefficients), use_container_width=True)
+
+# ------------------- Embedded Cantilever -------------------
+def show_embedment(layers, order, gwt_depth, constraints=None, surcharge=0.0, coefficients=None, water=False):
+    st.markdown('<h3 class="sub-header">🪝 Embedded Cantilever Wall</h3>', unsafe_allow_html=True)
+    # The candidates are the points of the force–moment Pareto front, so the
+    # same limit applies
+    if len(layers) > PARETO_MAX_LAYERS:
+        st.caption(f"Available for up to {PARETO_MAX_LAYERS} layers.")
+        return
+    if not st.toggle("Size a cantilever sheet pile: find the arrangement needing the least embedment"):
+        return
+
+    col1, col2, col3 = st.columns(3)
+    embedment_phi = col1.number_input("φ below dredge level (°):", min_value=1.0, max_value=60.0, value=32.0)
+    embedment_gamma = col2.number_input("γ below dredge level (kN/m³):", min_value=10.0, value=19.0)
+    passive_factor = col3.number_input("Factor of safety on Kp:", min_value=1.0, value=1.5, step=0.1)
+
+    with st.spinner("Solving the embedment depths..."):
+        wall = EmbeddedWall(layers, gwt_depth, embedment_phi, embedment_gamma, surcharge, coefficients, water,
+                            passive_factor)
+        ordering, depth = wall.optimize(constraints)
+        given = wall.depth(order)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Embedment as Given", f"{given:.2f} m")
+    col2.metric("Least Embedment", f"{depth:.2f} m")
+    col3.metric("Pile Length Saved", f"{given - depth:.2f} m")
+    st.caption("Simplified cantilever method: moment equilibrium about the toe, toe depth increased by 20%.")
+    st.dataframe(format_table(ordering, coefficients), use_container_width=True)
+
+# ------------------- Staged Excavation -------------------
+STAGING_TIME_LIMIT = 10.0
+
+
+def show_staging(layers, order, gwt_depth, constraints=None, surcharge=0.0, coefficients=None, water=False):
+    st.markdown('<h3 class="sub-header">🏗️ Staged Excavation</h3>', unsafe_allow_html=True)
+    if not st.toggle("Check the force at every excavation stage and minimize the worst stage"):
+        return
+
+    height = sum(layer.thickness for layer in layers)
+    text = st.text_input("Excavation stage depths (m, comma separated):",
+                         value=", ".join(f"{height * k / 4:g}" for k in range(1, 5)))
+    try:
+        stages = sorted({float(s) for s in text.replace(";", ",").split(",") if s.strip()})
+    except ValueError:
+        st.error("Enter the stage depths as numbers separated by commas.")
+        return
+    stages = [s for s in stages if 0 < s <= height]
+    if not stages:
+        st.error(f"Enter at least one stage depth between 0 and {height:g} m.")
+        return
+
+    with st.spinner("Minimizing the worst stage force..."):
+        result = minimize_stage_force(layers, gwt_depth, stages, surcharge, coefficients, water, constraints,
+                                      deadline=STAGING_TIME_LIMIT)
+        model = ForceModel(layers, gwt_depth, surcharge, coefficients, water)
+        index = {id(layer): i for i, layer in enumerate(layers)}
+        given = StageProfile(model, order)
+        best = StageProfile(model, [index[id(layer)] for layer in result.ordering])
+
+    depths = np.linspace(0.0, height, 200)
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    for profile, label, color in ((given, 'As given', '#3B82F6'), (best, 'Min-max over stages', 'red')):
+        ax.plot(profile.forces_moments(depths)[0], depths, color=color, label=label)
+        ax.plot(profile.forces_moments(stages)[0], stages, 'o', color=color)
+    for s in stages:
+        ax.axhline(s, color='gray', linestyle=':', linewidth=0.8)
+    ax.invert_yaxis()
+    ax.set_xlabel('Force above Excavation Level F(H) (kN/m)', fontsize=12)
+    ax.set_ylabel('Excavation Depth H (m)', fontsize=12)
+    ax.grid(True)
+    ax.legend(loc='upper right')
+    show_figure(fig)
+
+    given_forces, given_moments = given.forces_moments(stages)
+    best_forces, best_moments = best.forces_moments(stages)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Worst Stage as Given", f"{given_forces.max():.2f} kN/m")
+    col2.metric("Least Worst Stage", f"{result.force:.2f} kN/m")
+    col3.metric("Reduction", f"{given_forces.max() - result.force:.2f} kN/m")
+    if result.interrupted:
+        st.warning(f"Time limit reached; the worst stage force cannot be below {result.lower_bound:.2f} kN/m.")
+    st.dataframe(pd.DataFrame({"Depth (m)": stages, "Force as Given (kN/m)": given_forces,
+                               "Moment as Given (kN·m/m)": given_moments, "Force (kN/m)": best_forces,
+                               "Moment (kN·m/m)": best_moments}).round(2), use_container_width=True)
+    st.caption("Moments are about the excavation level of each stage.")
+    st.dataframe(format_table(result.ordering, coefficients), use_container_width=True)
+
+# ------------------- Seismic Scenarios -------------------
+KV_CHOICES = [-0.1, -0.05, 0.0, 0.05, 0.1, 0.15]
+
+
+def show_seismic(layers, order, gwt_depth, surcharge=0.0, coefficients=None, water=False):
+    st.markdown('<h3 class="sub-header">🌋 Seismic Scenarios</h3>', unsafe_allow_html=True)
+    if not st.toggle("Find the best arrangement over a grid of seismic coefficients (Mononobe–Okabe)"):
+        return
+
+    col1, col2, col3 = st.columns(3)
+    kh_max = col1.number_input("Largest kh:", min_value=0.05, max_value=0.6, value=0.3, step=0.05)
+    steps = int(col2.number_input("kh steps:", min_value=2, max_value=41, value=13))
+    kv = col3.multiselect("kv values (up):", KV_CHOICES, default=[0.0]) or [0.0]
+    kh = np.linspace(0.0, kh_max, steps)
+    # The wall of a Coulomb or seismic model; a smooth vertical wall otherwise
+    wall = coefficients if isinstance(coefficients, (Coulomb, MononobeOkabe)) else Coulomb()
+
+    try:
+        with st.spinner(f"Optimizing {steps * len(kv)} scenarios..."):
+            scenarios = SeismicScenarios(layers, gwt_depth, kh, sorted(kv), wall.delta, wall.batter, wall.beta,
+                                         wall.delta_ratio, surcharge, water)
+            optimum = scenarios.optimize()
+            given = scenarios.forces([order])[0]
+            static = scenarios.static_order()
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    colors = colormaps['tab10'].colors
+    for b, value in enumerate(scenarios.kv.tolist()):
+        cells = np.arange(len(kh)) * len(scenarios.kv) + b
+        ax.plot(kh, given[cells], '--', color=colors[b % 10], alpha=0.6, label=f'As given, kv = {value:g}')
+        ax.plot(kh, optimum.forces[cells], 'o-', color=colors[b % 10], label=f'Optimum, kv = {value:g}')
+    ax.set_xlabel('Horizontal Seismic Coefficient kh', fontsize=12)
+    ax.set_ylabel('Total Force (kN/m)', fontsize=12)
+    ax.grid(True)
+    ax.legend(loc='upper left')
+    show_figure(fig)
+
+    names = [" → ".join(str(layers[i].name) for i in ordering) for ordering in optimum.distinct]
+    regions = optimum.regions()
+    optimal_kh = [", ".join(f"{kh[a]:g}" for a in np.unique(np.nonzero(regions == k)[0])) for k in range(len(names))]
+    st.dataframe(pd.DataFrame({"Arrangement": names, "Optimal for kh": optimal_kh}), use_container_width=True)
+    switches = optimum.switches()
+    if not switches:
+        st.success("The same arrangement is optimal in every scenario.")
+    for value, before, after, old, new in switches:
+        st.info(f"kv = {value:g}: the best arrangement changes from {names[old]} to {names[new]} "
+                f"between kh = {before:g} and kh = {after:g}.")
+    regret = optimum.regret(static)
+    st.caption(f"Keeping the static optimum (kh = kv = 0) costs at most {regret.max():.2f} kN/m over these scenarios. "
+               "Coefficients for all layers and scenarios are computed in one array; the seismic thrust is "
+               "distributed like the static pressure.")
+
+# ------------------- Placement Constraints -------------------
+def constraint_inputs(names):
+    # Widgets for pinned / precedence / block constraints, returned as
+    # keyword arguments for LayerConstraints.from_names
+    with st.expander("📌 Placement Constraints"):
+        col1, col2 = st.columns(2)
+        top = col1.selectbox("Keep at the surface:", ["(none)"] + names)
+        bottom = col2.selectbox("Keep at the bottom:", ["(none)"] + names)
+        precedences = col1.text_area("Must lie above (one `Upper > Lower` per line):", value="")
+        blocks = col2.text_area("Keep together (one comma-separated group per line):", value="")
+
+    pinned = {}
+    if top != "(none)":
+        pinned[top] = 0
+    if bottom != "(none)":
+        pinned[bottom] = -1
+
+    above = []
+    for line in precedences.splitlines():
+        if line.strip():
+            if ">" not in line:
+                raise ValueError(f"Precedence '{line.strip()}' must look like 'Upper > Lower'")
+            upper, lower = line.split(">", 1)
+            above.append((upper.strip(), lower.strip()))
+
+    groups = [[name.strip() for name in line.split(",") if name.strip()]
+              for line in blocks.splitlines() if line.strip()]
+
+    return {"pinned": pinned, "above": above, "blocks": groups}
+
+# ------------------- Background Optimization -------------------
+@st.cache_resource
+def get_job_pool():
+    # Shared by every session on this server
+    return JobPool(max_workers=2)
+
+def job_key(layers, gwt_depth, **options):
+    return (tuple((layer.name, layer.phi, layer.gamma, layer.thickness, layer.cohesion) for layer in layers),
+            gwt_depth, tuple(sorted(options.items())))
+
+@st.fragment(run_every=0.5)
+def show_job_progress(job):
+    # Only this fragment reruns while the job is working; the worker thread
+    # does the search, so the page (and every other session) stays responsive.
+    if job.done():
+        st.rerun()
+
+    evaluated, best_layers, best_force = job.snapshot()
+    st.progress(job.fraction(), text=f"⏳ Optimizing... {job.fraction():.1%} of {job.total:,} arrangements "
+                                     f"searched ({evaluated:,} evaluated)")
+
+    if best_force is not None:
+        st.metric("Best Force So Far", f"{best_force:.2f} kN/m")
+        st.caption("Best arrangement so far: " + " → ".join(str(layer.name) for layer in best_layers))
+
+    if st.button("⏹️ Cancel Optimization"):
+        job.cancel()
+        st.rerun()
+
+def run_background_optimization(layers, gwt_depth, original_force, options):
+    # Submit a new background job whenever the inputs change
+    key = job_key(layers, gwt_depth, **options)
+    job = st.session_state.get("optimization_job")
+    if job is None or st.session_state.get("optimization_key") != key:
+        if job is not None:
+            job.cancel()
+        job = get_job_pool().submit(layers, gwt_depth, **options)
+        st.session_state["optimization_job"] = job
+        st.session_state["optimization_key"] = key
+
+    if not job.done():
+        show_job_progress(job)
+        return
+    if job.error is not None:
+        raise job.error
+
+    evaluated, optimized_layers, optimized_force = job.snapshot()
+    if job.cancelled:
+        st.warning(f"Optimization cancelled after {evaluated:,} of {job.total:,} arrangements. "
+                   "Showing the best arrangement found so far.")
+        if st.button("🔄 Restart Optimization"):
+            del st.session_state["optimization_key"]
+            st.rerun()
+
+    result = job.result
+    if result is not None and result.interrupted and not job.cancelled:
+        st.warning(f"Time limit reached after {evaluated:,} arrangements. "
+                   "Showing the best arrangement found so far.")
+    if result is not None and result.gap is not None and not result.optimal:
+        st.info(f"Lower bound {result.lower_bound:.2f} kN/m — the arrangement shown is "
+                f"within {result.gap:.2%} of the optimum.")
+
+    if optimized_layers is not None:
+        # The job may have been submitted on an earlier rerun; its ordering
+        # holds the layer objects it was given, not this rerun's copies
+        show_results(job.layers, optimized_layers, gwt_depth, original_force, optimized_force,
+                     options.get("surcharge", 0.0), options.get("coefficients"), options.get("water", False))
+
+# ------------------- Incremental Optimization -------------------
+def run_incremental_optimization(layers, order, gwt_depth, constraints=None, surcharge=0.0, coefficients=None,
+                                 water=False):
+    # The DP tables live in the session; editing one layer only recomputes
+    # the subsets that contain it, and reordering only the profile below the
+    # first moved layer.
+    optimizer = st.session_state.get("incremental_optimizer")
+    if optimizer is None:
+        optimizer = IncrementalOptimizer(layers, gwt_depth, order, constraints, surcharge, coefficients, water)
+        st.session_state["incremental_optimizer"] = optimizer
+    else:
+        changed = optimizer.sync(layers, gwt_depth, order, constraints, surcharge, coefficients, water)
+        if changed:
+            st.caption(f"♻️ Re-optimized incrementally after editing "
+                       f"{optimizer.model.layers[changed[0]].name} "
+                       f"({optimizer.dp.size // 2:,} of {optimizer.dp.size:,} DP states updated)")
+
+    optimized_layers, optimized_force = optimizer.best()
+    show_results(optimizer.model.layers_for(optimizer.order), optimized_layers, gwt_depth,
+                 optimizer.order_force(), optimized_force, surcharge, coefficients, water)
 
 # ------------------- Streamlit App -------------------
 st.markdown('<h1 class="main-header">🧱 Soil Layer Optimizer</h1>', unsafe_allow_html=True)
@@ -1074,15 +1573,16 @@ with tabs[0]:
     with col1:
         st.markdown('<div class="info-box">', unsafe_allow_html=True)
         st.markdown("""
-        Upload a CSV file with the following columns:
+        Upload a CSV or Parquet file with the following columns:
         - `phi`: Internal friction angle (degrees)
         - `gamma`: Unit weight (kN/m³)
         - `thickness`: Layer thickness (m)
         - `name`: Name of the layer
+        - `cohesion` (optional): Effective cohesion c' (kPa)
         """)
         st.markdown('</div>', unsafe_allow_html=True)
         
-        uploaded_file = st.file_uploader("📄 Upload CSV File", type="csv")
+        uploaded_file = st.file_uploader("📄 Upload CSV or Parquet File", type=["csv", "parquet"])
     
     with col2:
         st.markdown('<div class="info-box">', unsafe_allow_html=True)
@@ -1090,169 +1590,94 @@ with tabs[0]:
         gwt_depth_input = st.text_input("🌊 Groundwater Table Depth (m):", value="")
         gwt_depth = float(gwt_depth_input) if gwt_depth_input.strip() else None
         
+        water = False
         if gwt_depth is not None:
             st.info(f"GWT set at {gwt_depth} m depth")
+            water = st.toggle("💧 Include water pressure (total thrust)")
         else:
             st.info("No groundwater table defined")
+        surcharge = st.number_input("🏗️ Surcharge q (kPa):", min_value=0.0, value=0.0, step=5.0)
+        coefficients = coefficient_inputs()
+
+        engine_labels = {
+            "Dynamic programming (exact)": "dynamic_programming",
+            "Branch & bound (exact)": "branch_and_bound",
+            "Exhaustive search (exact)": "exhaustive",
+            "Local search (fast)": "local",
+        }
+        engine = engine_labels[st.selectbox("🔍 Search Engine:", list(engine_labels))]
+        time_limit = st.number_input("⏱️ Time Limit (s, 0 = none):", min_value=0.0, value=0.0, step=0.5)
+        merge_sublayers = st.toggle("🧩 Merge similar sublayers (CPT logs)")
+        if merge_sublayers:
+            phi_tol = st.number_input("φ tolerance (°):", min_value=0.0, value=1.0, step=0.5)
+            gamma_tol = st.number_input("γ tolerance (kN/m³):", min_value=0.0, value=0.5, step=0.1)
         st.markdown('</div>', unsafe_allow_html=True)
 
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
+            df = read_table(uploaded_file)
 
             required_columns = ['phi', 'gamma', 'thickness', 'name']
             if not all(col in df.columns for col in required_columns):
                 st.error("CSV file must contain columns: phi, gamma, thickness, name")
             else:
-                layers = [SoilLayer(row['phi'], row['gamma'], row['thickness'], row['name']) for _, row in df.iterrows()]
-
-                original_force = total_force(layers, gwt_depth)
-                optimized_layers, optimized_force = optimize_layers(layers, gwt_depth)
-                reduction_percentage = ((original_force - optimized_force) / original_force) * 100
-
-                def format_table(layers):
-                    return pd.DataFrame({
-                        'Name': [layer.name for layer in layers],
-                        'φ (°)': [layer.phi for layer in layers],
-                        'γ (kN/m³)': [layer.gamma for layer in layers],
-                        'Thickness (m)': [layer.thickness for layer in layers],
-                        'Ka': [round(layer.ka(), 4) for layer in layers]
+                if merge_sublayers:
+                    sublayers = layers_from_frame(df, gwt_depth)
+                    reduced = reduce_layers(sublayers, gwt_depth, phi_tol, gamma_tol, surcharge, coefficients, water)
+                    df = pd.DataFrame([{'name': layer.name, 'phi': layer.phi, 'gamma': layer.gamma,
+                                        'thickness': layer.thickness, 'cohesion': layer.cohesion}
+                                       for layer in reduced.layers])
+                    st.info(f"Merged {len(sublayers)} sublayers into {len(reduced.layers)} composite layers; "
+                            f"any arrangement's force is within ±{reduced.error_bound:.2f} kN/m of the "
+                            f"same arrangement of the original sublayers.")
+
+                # Editable layer table; `position` sets the arrangement to compare against
+                table = df[['name', 'phi', 'gamma', 'thickness']].copy()
+                table['cohesion'] = df['cohesion'] if 'cohesion' in df.columns else 0.0
+                table.insert(0, 'position', range(1, len(table) + 1))
+                st.markdown('<h3 class="sub-header">✏️ Layer Table</h3>', unsafe_allow_html=True)
+                table = st.data_editor(
+                    table, num_rows="fixed", use_container_width=True, hide_index=True,
+                    key=f"layer_table_{pd.util.hash_pandas_object(df).sum()}",
+                    column_config={
+                        'position': st.column_config.NumberColumn("Position", min_value=1, step=1),
+                        'name': st.column_config.TextColumn("Name"),
+                        'phi': st.column_config.NumberColumn("φ (°)", min_value=0.0, max_value=90.0),
+                        'gamma': st.column_config.NumberColumn("γ (kN/m³)", min_value=0.0),
+                        'thickness': st.column_config.NumberColumn("Thickness (m)", min_value=0.0),
+                        'cohesion': st.column_config.NumberColumn("c' (kPa)", min_value=0.0),
                     })
 
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown('<h3 class="sub-header">🔹 Original Layer Order</h3>', unsafe_allow_html=True)
-                    st.dataframe(format_table(layers), use_container_width=True)
-                
-                with col2:
-                    st.markdown('<h3 class="sub-header">✅ Optimized Layer Order</h3>', unsafe_allow_html=True)
-                    st.dataframe(format_table(optimized_layers), use_container_width=True)
-
-                st.markdown('<div class="result-box">', unsafe_allow_html=True)
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Original Force", f"{original_force:.2f} kN/m")
-                col2.metric("Optimized Force", f"{optimized_force:.2f} kN/m")
-                col3.metric("Reduction", f"{reduction_percentage:.2f}%", f"-{reduction_percentage:.2f}%")
-                st.markdown('</div>', unsafe_allow_html=True)
-
-                # Plot
-                fig, axs = plt.subplots(1, 2, figsize=(12, 10))
-                fig.suptitle("Rankine Active Earth Pressure with Groundwater Table", fontsize=16)
-
-                for ax, set_layers, title in zip(axs, [layers, optimized_layers], ["Original", "Optimized"]):
-                    colors = ['blue', 'green', 'red', 'purple', 'orange']
-                    
-                    cumulative_depth = 0
-                    cumulative_vertical_stress = 0
-                    sigma_prev = 0
-                    
-                    mid_x = -5  # Where to draw vertical thickness annotations
-                    gamma_w = 9.81  # Unit weight of water
-                    
-                    # Set x-limits to include the mid_x for annotations
-                    ax.set_xlim(mid_x - 5, None)
-                    
-                    for i, layer in enumerate(set_layers):
-                        h = layer.thickness
-                        gamma = layer.gamma
-                        phi = layer.phi
-                        name = layer.name
-                        
-                        Ka = layer.ka()
-                        
-                        # Calculate points for this layer
-                        z_local = np.linspace(0, h, 100)
-                        z_absolute = cumulative_depth + z_local
-                        
-                        vertical_stress = np.zeros_like(z_local)
-                        for j, depth in enumerate(z_absolute):
-                            if gwt_depth is None or depth <= gwt_depth:
-                                vertical_stress[j] = gamma * z_local[j] + cumulative_vertical_stress
-                            else:
-                                # Below groundwater table, use submerged unit weight
-                                if cumulative_depth >= gwt_depth:
-                                    # Layer entirely below GWT
-                                    vertical_stress[j] = (gamma - gamma_w) * z_local[j] + cumulative_vertical_stress
-                                else:
-                                    # Layer intersects GWT
-                                    above_gwt = gwt_depth - cumulative_depth
-                                    below_gwt = z_local[j] - above_gwt
-                                    
-                                    if below_gwt <= 0:
-                                        # This point is above GWT
-                                        vertical_stress[j] = gamma * z_local[j] + cumulative_vertical_stress
-                                    else:
-                                        # This point is below GWT
-                                        vertical_stress[j] = (gamma * above_gwt + 
-                                                            (gamma - gamma_w) * below_gwt + 
-                                                            cumulative_vertical_stress)
-                        
-                        sigma_a = Ka * vertical_stress
-                        
-                        # Plot the lateral pressure curve
-                        ax.plot(sigma_a, z_absolute, color=colors[i % len(colors)], 
-                               label=f"{name} (ϕ={phi}°, γ={gamma} kN/m³)")
-                        
-                        # Horizontal dashed connector at layer boundary
-                        if i > 0:
-                            ax.hlines(cumulative_depth, sigma_prev, sigma_a[0], 
-                                    colors='black', linestyles='dashed', linewidth=1)
-                        
-                        # Horizontal extension to show pressure value
-                        sigma_end = sigma_a[-1]
-                        z_end = z_absolute[-1]
-                        ax.hlines(z_end, 0, sigma_end, colors='gray', linestyles='dotted', linewidth=1)
-                        
-                        # Horizontal stress label
-                        ax.text(sigma_end / 2, z_end + 0.2, f"{sigma_end:.1f} kPa", 
-                               fontsize=10, ha='center', color=colors[i % len(colors)])
-                        
-                        # Vertical depth marker (thickness label)
-                        z_mid = cumulative_depth + h / 2
-                        ax.vlines(mid_x, cumulative_depth, cumulative_depth + h, 
-                                colors='black', linestyles='solid')
-                        ax.text(mid_x - 1, z_mid, f"{h} m", va='center', ha='center', 
-                               fontsize=10, rotation=90, 
-                               bbox=dict(facecolor='white', edgecolor='gray', boxstyle='round'))
-                        
-                        # Update values for next layer
-                        sigma_prev = sigma_end
-                        if gwt_depth is not None and z_end > gwt_depth:
-                            if cumulative_depth >= gwt_depth:
-                                # Entire layer below GWT
-                                cumulative_vertical_stress += (gamma - gamma_w) * h
-                            else:
-                                # Layer intersects GWT
-                                above_gwt = gwt_depth - cumulative_depth
-                                below_gwt = h - above_gwt
-                                cumulative_vertical_stress += (gamma * above_gwt + 
-                                                             (gamma - gamma_w) * below_gwt)
-                        else:
-                            cumulative_vertical_stress += gamma * h
-                        
-                        cumulative_depth += h
-                    
-                    # Add groundwater table if exists
-                    if gwt_depth is not None:
-                        ax.axhline(y=gwt_depth, color='cyan', linestyle='--', 
-                                  linewidth=2, label='Groundwater Table')
-                        # Add GWT label
-                        ax.text(mid_x - 1, gwt_depth, "GWT", va='bottom', ha='center',
-                               color='cyan', fontsize=10,
-                               bbox=dict(facecolor='white', alpha=0.7, boxstyle='round'))
-                    
-                    # Plot settings
-                    ax.invert_yaxis()
-                    ax.set_xlabel('Lateral Earth Pressure σₐ (kPa)', fontsize=12)
-                    ax.set_ylabel('Depth (m)', fontsize=12)
-                    ax.set_title(f"{title} Layer Arrangement", fontsize=14)
-                    ax.grid(True)
-                    ax.legend(loc='upper right')
+                layers = layers_from_frame(table, gwt_depth)
+                order = sorted(range(len(layers)), key=lambda i: (table['position'].iloc[i], i))
 
-                plt.tight_layout(rect=[0, 0, 1, 0.95])
-                st.pyplot(fig)
+                constraint_options = constraint_inputs([str(layer.name) for layer in layers])
 
+                if engine == "dynamic_programming" and len(layers) <= DP_MAX_LAYERS:
+                    constraints = LayerConstraints.from_names(layers, **constraint_options)
+                    arrangement = order
+                    release_session_state("optimization_job", "optimization_key")
+                    run_incremental_optimization(layers, order, gwt_depth, constraints, surcharge, coefficients,
+                                                 water)
+                else:
+                    layers = [layers[i] for i in order]
+                    constraints = LayerConstraints.from_names(layers, **constraint_options)
+                    arrangement = list(range(len(layers)))
+                    release_session_state("incremental_optimizer")
+                    run_background_optimization(layers, gwt_depth,
+                                                total_force(layers, gwt_depth, surcharge, coefficients, water),
+                                                {"engine": engine, "deadline": time_limit or None,
+                                                 "constraints": constraints, "surcharge": surcharge,
+                                                 "coefficients": coefficients, "water": water})
+
+                show_pareto_front(layers, gwt_depth, constraints, surcharge, coefficients, water)
+                show_embedment(layers, arrangement, gwt_depth, constraints, surcharge, coefficients, water)
+                show_staging(layers, arrangement, gwt_depth, constraints, surcharge, coefficients, water)
+                show_seismic(layers, arrangement, gwt_depth, surcharge, coefficients, water)
+
+        except LayerTableError as e:
+            st.error(f"Please fix {len(e.problems)} invalid value(s) in the layer table:\n\n"
+                     + "\n".join(f"- Row {row}: {message}" for row, message in e.problems))
         except Exception as e:
             st.error(f"Error processing file: {e}")
             st.error(f"Details: {str(e)}")
@@ -1313,7 +1738,40 @@ with tabs[1]:
     When a groundwater table is present:
     1. Above the water table, use the total unit weight (γ)
     2. Below the water table, use the submerged unit weight (γ' = γ - γw)
-    3. Water pressure must be added separately if considering total pressure
+    3. Water pressure acts in addition to the earth pressure. With **Include water pressure** it is
+       added below the table:
+
+       u = γw × (z − zw),  Pw = (1/2) × γw × (H − zw)²  acting at (H − zw)/3 above the base
+
+       Pw depends only on the wall height, so it does not change which arrangement is best, but the
+       forces, moments and resultant heights shown are then the total thrust on the wall.
+
+    ### Other Pressure Coefficients
+    The same layered calculation works with any coefficient K that depends only on a layer's φ; K is
+    computed once per layer and reused for every arrangement.
+    - **Coulomb (active):** accounts for wall friction δ, a battered wall back (θ from vertical) and a
+      backfill sloping at β:
+
+      Ka = cos²(φ − θ) / [cos²θ · cos(δ + θ) · (1 + √(sin(φ + δ) · sin(φ − β) / (cos(δ + θ) · cos(θ − β))))²]
+
+      With δ = θ = β = 0 this is the Rankine value. The resulting force acts at δ to the wall normal.
+    - **At rest:** for walls that cannot yield, K0 = (1 − sin φ) · OCR^sin φ (Jaky).
+    - **Mononobe–Okabe (seismic):** pseudo-static inertia kh·W horizontally and kv·W upwards tilts
+      gravity by ψ = atan(kh / (1 − kv)):
+
+      KAE = cos²(φ − θ − ψ) / [cos ψ · cos²θ · cos(δ + θ + ψ) · (1 + √(sin(φ + δ) · sin(φ − β − ψ) / (cos(δ + θ + ψ) · cos(β − θ))))²]
+
+      and the pressure is (1 − kv) · KAE · σv. It needs φ ≥ β + ψ in every layer.
+
+    ### Cohesion, Surcharge and Tension Cracks
+    A uniform surcharge q on the backfill adds q to the vertical stress at every depth. For a soil
+    with effective cohesion c' the active pressure becomes:
+
+    σa = Ka × σv − 2c'√Ka
+
+    Where this is negative the soil is in tension and pulls away from the wall, so σa is taken as zero
+    over that tension-crack zone. In a uniform cohesive backfill the crack reaches a depth of
+    zc = (2c'/√Ka − q) / γ.
     """)
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -1321,17 +1779,25 @@ with tabs[2]:
     st.markdown('<div class="info-box">', unsafe_allow_html=True)
     st.markdown("## How to Use This Tool")
     st.markdown("""
-    1. **Prepare your CSV file** with the following columns:
+    1. **Prepare a CSV or Parquet file** with the following columns:
        - `phi`: Internal friction angle in degrees
        - `gamma`: Unit weight in kN/m³
        - `thickness`: Layer thickness in meters
        - `name`: Name of the soil layer
+       - `cohesion` (optional): Effective cohesion c' in kPa; blank or missing means a cohesionless layer
     
-    2. **Upload the CSV file** using the file uploader.
+    2. **Upload the file** using the file uploader. Every invalid value (e.g. φ outside 0–90°,
+       a non-positive thickness, or γ not above γw = 9.81 kN/m³ with a water table) is listed at once.
+       You can then tweak any layer, or change the `Position` column to try your own arrangement,
+       directly in the layer table.
+       Use **Placement Constraints** to keep a layer at the surface or bottom, keep one layer above
+       another, or keep a group of layers together.
     
     3. **Enter the groundwater table depth** (optional):
        - Leave blank if there is no groundwater
        - Enter the depth in meters from the top surface
+
+       A **surcharge** q (kPa) on the backfill surface can be set in the same panel.
     
     4. **View the results**:
        - Original vs. optimized layer arrangement
@@ -1360,7 +1826,16 @@ with tabs[2]:
     2. Finding the arrangement that produces the minimum total force
     3. Comparing the original and optimized arrangements
     
-    **Note**: The optimization considers all possible permutations of layers, so it may take longer for a large number of layers.
+    Four search engines are available:
+    - **Dynamic programming** (default) finds the best arrangement of every subset of layers once, which is much
+      faster than trying every permutation. Editing a single layer in the layer table only recomputes the subsets
+      that contain it. From 21 to 28 layers its tables are kept in temporary files on disk.
+    - **Branch & bound** skips arrangements that provably cannot beat the best one found so far
+    - **Exhaustive search** evaluates every permutation of the layers
+    - **Local search** improves a good starting arrangement by moving single layers; it is fast but not guaranteed optimal
+    
+    **Note**: Set a time limit to get the best arrangement found within that time. When the search is stopped early,
+    a lower bound on the optimum shows how far the result can be from the best arrangement.
     """)
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from soil_optimizer import ForceModel, SoilLayer
+from soil_optimizer.allocation import _project, allocate_thickness
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_projection_is_feasible_and_nearest(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 9))
+    lower = rng.uniform(0.0, 1.0, n)
+    upper = lower + rng.uniform(0.0, 3.0, n)
+    total = rng.uniform(lower.sum(), upper.sum())
+    x = rng.normal(0.0, 3.0, n)
+    h = _project(x, lower, upper, total)
+    assert h.sum() == pytest.approx(total, abs=1e-9)
+    assert np.all(h >= lower - 1e-12) and np.all(h <= upper + 1e-12)
+    # No feasible point is closer to x
+    for _ in range(20):
+        other = _project(x + rng.normal(0.0, 0.5, n), lower, upper, total)
+        assert np.sum((h - x) ** 2) <= np.sum((other - x) ** 2) + 1e-9
+
+
+def test_allocation_respects_height_and_bounds():
+    layers = [SoilLayer(30, 18, 1.0, "Fill"), SoilLayer(36, 20, 2.0, "Gravel"), SoilLayer(25, 17, 1.5, "Clay", 8)]
+    model = ForceModel(layers, 2.0, surcharge=10.0)
+    allocation = allocate_thickness(model, height=6.0, lower=0.5, upper=4.0)
+    assert allocation.thickness.sum() == pytest.approx(6.0)
+    assert np.all(allocation.thickness >= 0.5 - 1e-9) and np.all(allocation.thickness <= 4.0 + 1e-9)
+    # The reported force is that of the allocated profile
+    allocated = allocation.layers_for(layers)
+    assert ForceModel(allocated, 2.0, surcharge=10.0).force(range(len(allocated))) == pytest.approx(allocation.force)
@@ -0,0 +1,51 @@
+import io
+import os
+import time
+
+import pytest
+
+st = pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+CSV = """name,phi,gamma,thickness,cohesion
+Fill,30,18,1.5,0
+Sand,34,19,2.0,0
+Clay,22,17.5,1.0,12
+Gravel,38,20.5,1.5,0
+Silt,27,18,1.0,4
+"""
+
+
+class _Upload(io.StringIO):
+    name = "layers.csv"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # AppTest cannot upload files, so the uploader returns the sample table
+    monkeypatch.setattr(st, "file_uploader", lambda *args, **kwargs: _Upload(CSV))
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    return at
+
+
+def _failures(at):
+    return [element.value for element in list(at.exception) + list(at.error)]
+
+
+@pytest.mark.parametrize("engine", ["Branch & bound (exact)", "Local search (fast)"])
+def test_finished_background_job_shows_results(app, engine):
+    # A finished job is reused on later reruns, whose layer lists are new objects
+    next(box for box in app.selectbox if "Search Engine" in box.label).select(engine)
+    app.run()
+    job = app.session_state["optimization_job"]
+    stop = time.monotonic() + 60
+    while not job.done() and time.monotonic() < stop:
+        time.sleep(0.05)
+    assert job.done()
+    for _ in range(2):
+        app.run()
+        assert _failures(app) == []
+        assert any(metric.label == "Optimized Force" for metric in app.metric)
+        assert len(app.get("download_button")) == 2
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from soil_optimizer import DiskSubsetDP, ForceModel, SoilLayer, SubsetDP, search_layers
+from soil_optimizer.fuzz import check_case, random_case
+
+
+def random_layers(seed, n, gwt_depth=None):
+    rng = random.Random(seed)
+    gamma_min = 12.0 if gwt_depth is None else 10.5
+    return [SoilLayer(rng.uniform(20, 42), rng.uniform(gamma_min, 21), rng.uniform(0.5, 2.5), f"L{i}",
+                      rng.choice((0.0, 0.0, rng.uniform(0, 10)))) for i in range(n)]
+
+
+@pytest.mark.parametrize("k", range(40))
+def test_engines_match_reference(k):
+    # The same cases as `python -m soil_optimizer.fuzz --seed 0`
+    case = random_case(random.Random(f"0:{k}"))
+    assert check_case(case, random.Random(k)) == []
+
+
+@pytest.mark.parametrize("seed,gwt_depth", [(0, None), (1, 2.0), (2, 0.0), (3, 5.0)])
+def test_disk_dp_matches_subset_dp(seed, gwt_depth):
+    model = ForceModel(random_layers(seed, 11, gwt_depth), gwt_depth, surcharge=10.0)
+    memory = SubsetDP(model)
+    memory.solve()
+    with DiskSubsetDP(model, block_bits=6) as disk:
+        # Interrupted after every block, then resumed
+        while not disk.solve(should_stop=lambda: True):
+            pass
+        assert disk.best_force() == pytest.approx(model.force(memory.best_order()), rel=1e-12)
+        assert model.force(disk.best_order()) == pytest.approx(disk.best_force(), rel=1e-12)
+
+
+def test_exhaustive_ties_ignore_warm_start():
+    # Equal layers give many orderings of the same force; the exhaustive
+    # engine returns the first in lexicographic order whatever it starts from
+    layers = [SoilLayer(30, 18, 1.0, f"L{i}") for i in range(3)] + [SoilLayer(34, 19, 2.0, "M")]
+    index = {id(layer): i for i, layer in enumerate(layers)}
+    plain = search_layers(layers, None, engine="exhaustive")
+    for initial in ([3, 2, 1, 0], [2, 0, 1, 3]):
+        warm = search_layers(layers, None, engine="exhaustive", initial=initial)
+        assert [index[id(layer)] for layer in warm.ordering] == [index[id(layer)] for layer in plain.ordering]
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from soil_optimizer import SoilLayer, search_layers
+from soil_optimizer.shards import merge_shards, rank_permutation, run_shard, shard_ranges, unrank_permutation
+
+
+def tie_prone_layers(seed):
+    # Few distinct materials, so many orderings share the least force
+    rng = random.Random(seed)
+    materials = [(rng.choice((28, 30, 34)), rng.choice((18, 19)), rng.choice((1.0, 2.0)), rng.choice((0, 0, 5)))
+                 for _ in range(3)]
+    layers = []
+    for i in range(rng.randint(4, 7)):
+        phi, gamma, thickness, cohesion = rng.choice(materials)
+        layers.append(SoilLayer(phi, gamma, thickness, f"L{i}", cohesion))
+    return layers, rng.choice((None, 2.0))
+
+
+def test_rank_round_trip():
+    for rank in range(120):
+        assert rank_permutation(unrank_permutation(rank, 5)) == rank
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_merged_shards_match_exhaustive(seed):
+    layers, gwt_depth = tie_prone_layers(seed)
+    shards = [run_shard(layers, gwt_depth, start, stop, top_k=3) for start, stop in shard_ranges(len(layers), 3)]
+    best = merge_shards(shards)["top"][0]
+    result = search_layers(layers, gwt_depth, engine="exhaustive")
+    index = {id(layer): i for i, layer in enumerate(layers)}
+    assert best["order"] == [index[id(layer)] for layer in result.ordering]
+    assert best["force"] == result.force
+
+
+def test_merge_rejects_gaps():
+    layers, gwt_depth = tie_prone_layers(0)
+    ranges = shard_ranges(len(layers), 3)
+    shards = [run_shard(layers, gwt_depth, start, stop) for start, stop in ranges[:1] + ranges[2:]]
+    with pytest.raises(ValueError):
+        merge_shards(shards)
@@ -0,0 +1,20 @@
+from soil_optimizer import Coulomb, SoilLayer, SolutionIndex
+
+
+def test_index_round_trip(tmp_path):
+    layers = [SoilLayer(30, 18, 1.0, "A"), SoilLayer(36, 20, 2.0, "B"), SoilLayer(25, 17, 1.5, "C", 5)]
+    index = SolutionIndex()
+    result = index.solve(layers, 2.0)
+    index.add(layers, None, [2, 0, 1], 42.0, surcharge=5.0, coefficients=Coulomb(10.0), water=True)
+    path = tmp_path / "index.npz"
+    index.save(path)
+    loaded = SolutionIndex.load(path)
+
+    assert len(loaded) == len(index) == 2
+    for site, gwt_depth, options in ((layers, 2.0, {}),
+                                     (layers, None, {"surcharge": 5.0, "coefficients": Coulomb(10.0), "water": True})):
+        assert loaded.nearest(site, gwt_depth, **options) == index.nearest(site, gwt_depth, **options)
+    # Orderings carry over whatever order the layers are listed in
+    order, force, distance = loaded.nearest(layers[::-1], 2.0)
+    assert [layers[::-1][i] for i in order] == list(result.ordering)
+    assert force == result.force and distance == 0.0